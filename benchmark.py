@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+点点点基准测试脚本
+在内存中的记录后端上运行连点引擎（不需要Tk和Windows），测量：
+实际点击速率、点击间隔抖动分布（p50/p99/最大值）、停止到线程退出的延迟、每次点击的CPU时间。
+结果以JSON输出，方便对比不同版本。
+
+用法：
+    python benchmark.py
+    python benchmark.py --intervals 0.001,0.01 --positions 1,100 --duration 1 --output bench.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+import 点点点 as clicker
+
+DEFAULT_INTERVALS = [0.001, 0.01, 0.1, 1.0]
+DEFAULT_POSITIONS = [1, 10, 100, 1000, 10000]
+
+def percentile(values, fraction):
+    """取已排序列表的百分位数（最近秩法）"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+def seconds(value):
+    """秒数保留到微秒以下一位"""
+    return None if value is None else round(value, 7)
+
+def make_backend(name):
+    """创建基准测试用的输入后端，返回 (后端, 记录调用时间的对象)"""
+    if name == "recording":
+        backend = clicker.RecordingBackend(record_events=False)
+        return backend, backend
+    # 默认走完整的SendInput路径（INPUT数组），只把user32替换为记录调用时间的替身
+    api = clicker.FakeUser32(record_events=False)
+    return clicker.SendInputBackend(api), api
+
+def make_config(interval, position_count, backend, burst_mode=False, precision=False):
+    """生成基准测试用的配置快照"""
+    positions = [(i % 1920, (i // 1920) % 1080) for i in range(position_count)]
+    plan = clicker.ClickPlan(positions, 'left', backend)
+    return clicker.RunConfig(
+        interval=interval,
+        button='left',
+        positions=plan.points,
+        names=tuple(f"位置{i+1}" for i in range(position_count)),
+        plan=plan,
+        catch_up_policy="skip",
+        burst_mode=burst_mode,
+        burst_chunk_size=0,
+        motion_mode="teleport",
+        motion_duration=0.0,
+        motion_steps=1,
+        precision_mode=precision,
+        cpu_budget=1.0,
+        target_cps=0.0,
+    )
+
+def run_case(interval, position_count, duration, burst_mode=False, backend_name="sendinput",
+             precision=False):
+    """运行一个测试组合，返回统计结果"""
+    backend, api = make_backend(backend_name)
+    config = make_config(interval, position_count, backend, burst_mode, precision)
+
+    # 与程序中一样经过日志汇聚器，但不刷新到界面
+    sink = clicker.LogSink()
+    engine = clicker.ClickEngine(on_log=sink.post, backend=backend)
+
+    run_time = max(duration, interval * 3)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    engine.start(config)
+    time.sleep(run_time)
+
+    stop = time.perf_counter()
+    engine.stop()
+    engine.join()
+    halted = time.perf_counter()
+    cpu_time = time.process_time() - cpu_start
+
+    send_times = [t for t in api.send_times if t <= stop]
+    clicks = engine.clicks
+    gaps = [b - a for a, b in zip(send_times, send_times[1:])]
+    jitter = sorted(abs(gap - interval) for gap in gaps)
+    sorted_gaps = sorted(gaps)
+
+    return {
+        "interval_s": interval,
+        "positions": position_count,
+        "burst_mode": burst_mode,
+        "backend": backend_name,
+        "precision_mode": precision,
+        "duration_s": round(stop - start, 6),
+        "clicks": clicks,
+        "send_calls": len(api.send_times),
+        "clicks_per_second": round(clicks / (stop - start), 3),
+        "target_clicks_per_second": round((position_count if burst_mode else 1) / interval, 3),
+        "interval_p50_s": seconds(percentile(sorted_gaps, 0.50)),
+        "interval_p99_s": seconds(percentile(sorted_gaps, 0.99)),
+        "jitter_p50_s": seconds(percentile(jitter, 0.50)),
+        "jitter_p99_s": seconds(percentile(jitter, 0.99)),
+        "jitter_max_s": seconds(jitter[-1]) if jitter else None,
+        "missed_deadlines": engine.scheduler.missed if engine.scheduler else 0,
+        "stop_to_halt_s": round(halted - stop, 6),
+        "sends_after_stop": len(api.send_times) - len(send_times),
+        "cpu_time_per_click_s": seconds(cpu_time / clicks) if clicks else None,
+    }
+
+def parse_list(text, convert):
+    return [convert(item) for item in text.split(',') if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="点点点连点引擎基准测试")
+    parser.add_argument("--intervals", default=",".join(str(i) for i in DEFAULT_INTERVALS),
+                        help="点击间隔（秒），逗号分隔")
+    parser.add_argument("--positions", default=",".join(str(p) for p in DEFAULT_POSITIONS),
+                        help="位置数量，逗号分隔")
+    parser.add_argument("--duration", type=float, default=2.0,
+                        help="每个组合的运行时间（秒），至少为3个间隔")
+    parser.add_argument("--burst", action="store_true",
+                        help="同时测试连发模式")
+    parser.add_argument("--backend", choices=["sendinput", "recording"], default="sendinput",
+                        help="sendinput: 完整的SendInput路径（user32替身）; recording: 记录后端")
+    parser.add_argument("--precision", action="store_true",
+                        help="使用高精度模式（睡眠+自旋等待，CPU预算100%%）")
+    parser.add_argument("--output", help="结果JSON文件路径（默认输出到标准输出）")
+    args = parser.parse_args()
+
+    intervals = parse_list(args.intervals, float)
+    position_counts = parse_list(args.positions, int)
+    modes = [False, True] if args.burst else [False]
+
+    results = []
+    for burst_mode in modes:
+        for interval in intervals:
+            for position_count in position_counts:
+                result = run_case(interval, position_count, args.duration, burst_mode, args.backend,
+                                  args.precision)
+                results.append(result)
+                # 进度信息输出到标准错误，标准输出只保留JSON
+                print(f"✓ 间隔 {interval}s, {position_count}个位置"
+                      f"{', 连发' if burst_mode else ''}: "
+                      f"{result['clicks_per_second']} 次/秒, "
+                      f"抖动p99 {result['jitter_p99_s']}", file=sys.stderr)
+
+    report = {
+        "version": clicker.VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+点点点宏转换脚本
+在 presets.json 中的预设位置列表和二进制宏文件（.ddm）之间互相转换，并查看宏文件信息。
+
+用法：
+    python macro_convert.py to-macro presets.json 预设名 out.ddm [--raw]
+    python macro_convert.py to-preset in.ddm presets.json 新预设名
+    python macro_convert.py simplify in.ddm out.ddm --tolerance 1.0
+    python macro_convert.py info in.ddm
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import 点点点 as clicker
+
+def load_presets(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def to_macro(args):
+    """预设位置列表 -> 宏文件"""
+    presets = load_presets(args.presets)
+    if args.name not in presets:
+        print(f"❌ 找不到预设: {args.name}", file=sys.stderr)
+        return 1
+
+    preset = presets[args.name]
+    macro = clicker.positions_to_macro(clicker.preset_positions(preset),
+                                       clicker.preset_interval(preset),
+                                       preset.get("mouse_button", "left"))
+    count = clicker.save_macro_file(args.output, macro, packed=not args.raw)
+    print(f"✓ 已生成宏: {args.output} ({count}个事件, {macro.duration():.3f}秒)")
+    return 0
+
+def to_preset(args):
+    """宏文件 -> 预设位置列表（写入presets.json，同名预设会被覆盖）"""
+    macro = clicker.MacroFile(args.macro)
+    try:
+        positions, interval, button = clicker.macro_to_positions(macro)
+    finally:
+        macro.close()
+
+    if not positions:
+        print("❌ 宏中没有点击事件", file=sys.stderr)
+        return 1
+
+    # 小于0.1秒的间隔用毫秒/次保存，与界面的频率范围一致
+    if interval < 0.1:
+        frequency, unit = round(interval * 1000, 1), "毫秒/次"
+    else:
+        frequency, unit = round(interval, 3), "秒/次"
+
+    presets = load_presets(args.presets)
+    preset = {
+        "name": args.name,
+        "frequency": frequency,
+        "frequency_unit": unit,
+        "mouse_button": button,
+    }
+    if len(positions) >= clicker.PACK_POSITIONS_THRESHOLD:
+        preset["positions_packed"] = clicker.pack_positions(positions)
+    else:
+        preset["positions"] = positions
+    presets[args.name] = preset
+    with open(args.presets, 'w', encoding='utf-8') as f:
+        json.dump(presets, f, ensure_ascii=False, indent=2)
+    print(f"✓ 已保存预设: {args.name} ({len(positions)}个位置, 间隔 {frequency}{unit})")
+    return 0
+
+def simplify(args):
+    """简化宏文件中的鼠标移动路径"""
+    macro = clicker.MacroFile(args.macro)
+    try:
+        recorded = len(macro)
+        started = time.perf_counter()
+        result = clicker.simplify_macro(macro, args.tolerance, args.max_interval / 1000.0)
+        elapsed = time.perf_counter() - started
+    finally:
+        macro.close()
+
+    count = clicker.save_macro_file(args.output, result, packed=not args.raw)
+    print(f"✓ 已简化: {recorded} → {count} 个事件（{elapsed:.3f}秒，"
+          f"{'numpy' if clicker.np is not None else '纯Python'}）")
+    return 0
+
+def info(args):
+    """显示宏文件信息"""
+    macro = clicker.MacroFile(args.macro)
+    try:
+        counts = {}
+        for _, kind, _, _, _ in macro:
+            counts[kind] = counts.get(kind, 0) + 1
+        names = {
+            clicker.MACRO_MOVE: "移动", clicker.MACRO_DOWN: "按下", clicker.MACRO_UP: "松开",
+            clicker.MACRO_SCROLL: "滚轮", clicker.MACRO_KEY_DOWN: "按键按下", clicker.MACRO_KEY_UP: "按键松开",
+        }
+        print(f"文件: {args.macro}")
+        print(f"事件数: {len(macro)}")
+        print(f"时长: {macro.duration():.3f}秒")
+        print(f"格式: {'压缩编码' if macro.packed else '定长记录'}")
+        print(f"大小: {macro.nbytes() / 1024:.1f}KB")
+        for kind, count in sorted(counts.items()):
+            print(f"  {names.get(kind, kind)}: {count}")
+    finally:
+        macro.close()
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="点点点宏转换")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_macro = commands.add_parser("to-macro", help="把预设的位置列表转换为宏文件")
+    parser_macro.add_argument("presets", help="预设文件（presets.json）")
+    parser_macro.add_argument("name", help="预设名称")
+    parser_macro.add_argument("output", help=f"输出的宏文件（{clicker.MACRO_FILE_EXT}）")
+    parser_macro.add_argument("--raw", action="store_true",
+                              help="使用定长记录格式（默认使用压缩编码）")
+    parser_macro.set_defaults(func=to_macro)
+
+    parser_preset = commands.add_parser("to-preset", help="把宏文件转换为预设的位置列表")
+    parser_preset.add_argument("macro", help="宏文件")
+    parser_preset.add_argument("presets", help="预设文件（presets.json），不存在时新建")
+    parser_preset.add_argument("name", help="新预设名称")
+    parser_preset.set_defaults(func=to_preset)
+
+    parser_simplify = commands.add_parser("simplify", help="简化宏文件中的鼠标移动路径")
+    parser_simplify.add_argument("macro", help="宏文件")
+    parser_simplify.add_argument("output", help="输出的宏文件")
+    parser_simplify.add_argument("--tolerance", type=float, default=clicker.SIMPLIFY_TOLERANCE,
+                                 help="允许偏离原路径的像素数")
+    parser_simplify.add_argument("--max-interval", type=float, default=clicker.SIMPLIFY_MAX_INTERVAL * 1000,
+                                 help="保留的相邻移动事件最多相隔的毫秒数（0为不限制）")
+    parser_simplify.add_argument("--raw", action="store_true",
+                                 help="使用定长记录格式（默认使用压缩编码）")
+    parser_simplify.set_defaults(func=simplify)
+
+    parser_info = commands.add_parser("info", help="显示宏文件信息")
+    parser_info.add_argument("macro", help="宏文件")
+    parser_info.set_defaults(func=info)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""动作脚本的编译错误、循环、跳转和执行（用记录后端，不需要Windows）"""
+
+import pytest
+
+import 点点点 as clicker
+
+def run(source, positions=(), backend=None):
+    backend = backend or clicker.RecordingBackend()
+    script = clicker.ActionScript(source, backend, positions)
+    engine = clicker.ClickEngine(backend=backend)
+    engine.is_running = True
+    engine.run_script(script)
+    return engine, backend
+
+def clicks(backend):
+    return [(x, y, button) for _, kind, x, y, button in backend.events if kind == "click"]
+
+@pytest.mark.parametrize("source, message", [
+    ("click 1 2\nfoo 3", "第2行: 无法识别的指令"),
+    ("repeat 2\nclick 1 2", "第1行: repeat缺少end"),
+    ("click 1 2\nend", "第2行: end没有对应的repeat"),
+    ("repeat 0\nend", "第1行: repeat的次数至少为1"),
+    ("repeat x\nend", "第1行: 不是整数"),
+    ("goto nowhere", "第1行: 找不到标签"),
+    ("label a\nlabel a", "第2行: 标签重复"),
+    ("wait soon", "第1行: 无法识别的时间"),
+    ("wait -5", "第1行: 无法识别的时间"),
+    ("key nosuchkey", "第1行: 无法识别的按键"),
+    ("click 1 2 side", "第1行: 无法识别的按键"),
+    ("click 不存在", "第1行: 找不到位置"),
+    ("if-pixel 1 2 #GGGGGG goto a\nlabel a", "第1行: 无法识别的颜色"),
+    ("if-pixel 1 2 goto a\nlabel a", "第1行: 用法"),
+])
+def test_compile_errors_report_line(source, message):
+    with pytest.raises(ValueError) as error:
+        clicker.ActionScript(source, clicker.RecordingBackend())
+    assert str(error.value).startswith(message)
+
+def test_comments_and_blank_lines_ignored():
+    script = clicker.ActionScript("# 注释\n\n   \nclick 1 2\n", clicker.RecordingBackend())
+    assert len(script) == 1
+
+def test_nested_repeat():
+    engine, backend = run("repeat 2\nclick 1 1\nrepeat 3\nclick 2 2\nend\nend\nclick 3 3")
+    assert clicks(backend) == ([(1, 1, "left")] + [(2, 2, "left")] * 3) * 2 + [(3, 3, "left")]
+    assert engine.clicks == 9
+
+def test_goto_skips_and_loops_with_counter():
+    source = """
+    repeat 4
+    goto skip
+    click 9 9
+    label skip
+    click 1 1
+    end
+    goto done
+    click 8 8
+    label done
+    """
+    _, backend = run("\n".join(line.strip() for line in source.splitlines()))
+    assert clicks(backend) == [(1, 1, "left")] * 4
+
+def test_buttons_and_keys():
+    _, backend = run("click 1 2 middle\nclick 3 4 right\nclick 5 6\nkey enter\nkey a")
+    assert clicks(backend) == [(1, 2, "middle"), (3, 4, "right"), (5, 6, "left")]
+    keys = [(kind, code) for _, kind, code, _, _ in backend.events if kind.startswith("key")]
+    assert keys == [("key_down", 0x0D), ("key_up", 0x0D), ("key_down", 0x41), ("key_up", 0x41)]
+
+def test_coordinate_clicks_share_one_plan_per_button():
+    script = clicker.ActionScript("click 1 2\nclick 3 4 middle\nclick 5 6\nclick 7 8 middle",
+                                  clicker.RecordingBackend())
+    plans = [a for op, a, b in script.code]
+    assert plans[0] is plans[2] and plans[1] is plans[3] and plans[0] is not plans[1]
+    assert plans[1].button == "middle"
+    assert [b for op, a, b in script.code] == [0, 0, 1, 1]
+
+def test_click_named_position():
+    positions = [{"name": "开始", "x": 10, "y": 20}, {"name": "确定", "x": 30, "y": 40, "clicks": 2}]
+    engine, backend = run("click 确定\nclick 开始", positions)
+    assert clicks(backend) == [(30, 40, "left"), (30, 40, "left"), (10, 20, "left")]
+    assert engine.clicks == 2
+
+def test_if_pixel_jumps_when_color_matches():
+    screen = clicker.FakeScreen(10, 10)
+    screen.fill(0, 0, 10, 10, (255, 0, 0))
+    backend = clicker.RecordingBackend()
+    source = "if-pixel 5 5 #FF0000 goto red\nclick 1 1\nlabel red\nif-pixel 5 5 0,0,255 goto blue\nclick 2 2\nlabel blue"
+    script = clicker.ActionScript(source, backend, capture=screen)
+    engine = clicker.ClickEngine(backend=backend)
+    engine.is_running = True
+    engine.run_script(script)
+    assert clicks(backend) == [(2, 2, "left")]
+
+def test_wait_is_interrupted_by_stop():
+    backend = clicker.RecordingBackend()
+    engine = clicker.ClickEngine(backend=backend)
+    engine.start_script(clicker.ActionScript("click 1 1\nwait 10s\nclick 2 2", backend))
+    engine.join(0.1)
+    engine.stop()
+    engine.join(1)
+    assert not engine.thread.is_alive()
+    assert clicks(backend) == [(1, 1, "left")]
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""点击计划的编译、复用和INPUT内容（用FakeUser32替身，不需要Windows）"""
+
+import time
+
+import pytest
+
+import 点点点 as clicker
+
+VA = clicker.MOUSEEVENTF_VIRTUAL_ABSOLUTE
+MOVE = clicker.MOUSEEVENTF_MOVE
+
+def make_backend(**kwargs):
+    api = clicker.FakeUser32(**kwargs)
+    return clicker.SendInputBackend(api), api
+
+def test_plan_matches_same_config():
+    backend, _ = make_backend()
+    positions = [(100, 200), {"name": "a", "x": 300, "y": 400}]
+    plan = clicker.ClickPlan(positions, 'left', backend)
+    assert plan.matches(positions, 'left', backend)
+    assert plan.matches([(100, 200), {"name": "改名", "x": 300, "y": 400}], 'left', backend)
+
+def test_plan_reuses_compiled_inputs():
+    backend, api = make_backend()
+    plan = clicker.ClickPlan([(10, 20), (30, 40)], 'left', backend)
+    view = plan.batch.views[(1, 1)]
+    plan.click(1)
+    plan.click(1)
+    assert plan.batch.views[(1, 1)] is view
+    assert api.sent[0] == api.sent[1]
+    assert api.metrics_calls == 5  # 只在编译时读取一次显示器校验值
+
+@pytest.mark.parametrize("positions, button", [
+    ([(100, 200), (301, 400)], 'left'),
+    ([(100, 200)], 'left'),
+    ([(100, 200), (300, 400)], 'right'),
+    ([(100, 200), {"name": "a", "x": 300, "y": 400, "clicks": 2}], 'left'),
+])
+def test_plan_rebuilt_when_config_changes(positions, button):
+    backend, _ = make_backend()
+    plan = clicker.ClickPlan([(100, 200), (300, 400)], 'left', backend)
+    assert not plan.matches(positions, button, backend)
+
+def test_plan_rebuilt_for_other_backend():
+    backend, _ = make_backend()
+    other, _ = make_backend()
+    plan = clicker.ClickPlan([(100, 200)], 'left', backend)
+    assert not plan.matches([(100, 200)], 'left', other)
+
+def test_plan_rebuilt_when_screen_geometry_changes():
+    api = clicker.FakeUser32()
+    backend = clicker.SendInputBackend(api, clicker.DisplayGeometry(api, check_interval=0))
+    plan = clicker.ClickPlan([(100, 200)], 'left', backend)
+    api.monitors = [(0, 0, 2560, 1440, 96)]
+    assert not plan.matches([(100, 200)], 'left', backend)
+
+@pytest.mark.parametrize("button, down, up", [
+    ('left', clicker.MOUSEEVENTF_LEFTDOWN, clicker.MOUSEEVENTF_LEFTUP),
+    ('right', clicker.MOUSEEVENTF_RIGHTDOWN, clicker.MOUSEEVENTF_RIGHTUP),
+    ('middle', clicker.MOUSEEVENTF_MIDDLEDOWN, clicker.MOUSEEVENTF_MIDDLEUP),
+])
+def test_click_inputs(button, down, up):
+    backend, api = make_backend()
+    plan = clicker.ClickPlan([(0, 0), (1919, 1079), (960, 540)], button, backend)
+    for index in range(3):
+        assert plan.click(index)
+    
+    for events, (x, y) in zip(api.sent, plan.points):
+        ax = clicker.normalize_coordinate(x, 1920)
+        ay = clicker.normalize_coordinate(y, 1080)
+        assert events == [(MOVE | VA, ax, ay), (down | VA, ax, ay), (up | VA, ax, ay)]
+        # 系统还原后准确落在原像素上
+        assert (ax * 1920 // 65536, ay * 1080 // 65536) == (x, y)
+
+def test_path_uses_button_flags():
+    backend, api = make_backend()
+    batch = backend.compile_path([(1, 1), (2, 2), (3, 3)], 'middle')
+    assert backend.path_send(batch, 0, 5)
+    flags = [event[0] & ~VA for event in api.sent[0]]
+    assert flags == [MOVE, clicker.MOUSEEVENTF_MIDDLEDOWN, MOVE, MOVE, clicker.MOUSEEVENTF_MIDDLEUP]
+
+def test_repeat_clicks_compiled_in_one_send():
+    backend, api = make_backend()
+    plan = clicker.ClickPlan([{"name": "a", "x": 5, "y": 6, "clicks": 3}], 'left', backend)
+    plan.click(0)
+    flags = [event[0] & ~VA for event in api.sent[0]]
+    assert flags == [MOVE] + [clicker.MOUSEEVENTF_LEFTDOWN, clicker.MOUSEEVENTF_LEFTUP] * 3
+
+def test_cycle_sent_in_one_call():
+    backend, api = make_backend()
+    plan = clicker.ClickPlan([(i, i) for i in range(50)], 'left', backend)
+    assert backend.click_batch(plan.batch, 0, 50)
+    assert len(api.sent) == 1 and len(api.sent[0]) == 150
+
+@pytest.mark.skipif(clicker.np is None, reason="需要numpy")
+def test_numpy_fill_matches_loop(monkeypatch):
+    positions = [(i * 37 % 1920, i * 11 % 1080) for i in range(100)]
+    repeats = tuple(1 + i % 3 for i in range(100))
+    backend, _ = make_backend()
+    for button in ('left', 'right', 'middle'):
+        monkeypatch.undo()
+        vectorized = backend.compile_clicks(positions, button, repeats)
+        monkeypatch.setattr(clicker, "np", None)
+        looped = backend.compile_clicks(positions, button, repeats)
+        assert bytes(vectorized.cycle) == bytes(looped.cycle)
+
+@pytest.mark.parametrize("size, origin", [(1920, 0), (1366, 0), (2560, -2560), (1080, -200), (7, 3)])
+def test_bulk_normalization_lands_on_every_pixel(size, origin, monkeypatch):
+    pixels = list(range(origin - 2, origin + size + 2))
+    expected = [clicker.normalize_coordinate(value, size, origin) for value in pixels]
+    assert list(clicker.normalize_coordinates(pixels, size, origin)) == expected
+    # 系统还原出的像素与原坐标一致，屏幕外的坐标限制在边缘
+    assert [origin + value * size // 65536 for value in expected[2:-2]] == pixels[2:-2]
+    assert expected[:2] == [0, 0] and expected[-2:] == [65535, 65535]
+    monkeypatch.setattr(clicker, "np", None)
+    assert list(clicker.normalize_coordinates(pixels, size, origin)) == expected
+
+def test_engine_reuses_plan_across_clicks():
+    backend = clicker.RecordingBackend()
+    plan = clicker.ClickPlan([(1, 2), (3, 4)], 'left', backend)
+    config = clicker.RunConfig(
+        interval=0.001, button='left', positions=plan.points, names=("a", "b"), plan=plan,
+        catch_up_policy="skip", burst_mode=False, burst_chunk_size=0, motion_mode="teleport",
+        motion_duration=0.0, motion_steps=1, precision_mode=False, cpu_budget=1.0, target_cps=0.0)
+    engine = clicker.ClickEngine(backend=backend)
+    engine.start(config)
+    deadline = time.perf_counter() + 5
+    while backend.click_count < 10 and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    engine.stop()
+    engine.join()
+    assert engine.config.plan is plan
+    assert [event[2:4] for event in backend.events[:4]] == [(1, 2), (3, 4), (1, 2), (3, 4)]
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+def make_running_config(plan):
+    return clicker.RunConfig(
+        interval=0.002, button='left', positions=plan.points, names=("a",), plan=plan,
+        catch_up_policy="skip", burst_mode=False, burst_chunk_size=0, motion_mode="teleport",
+        motion_duration=0.0, motion_steps=1, precision_mode=False, cpu_budget=1.0, target_cps=0.0)
+
+def test_engine_recompiles_plan_when_monitors_change():
+    api = clicker.FakeUser32()
+    backend = clicker.SendInputBackend(api, clicker.DisplayGeometry(api, check_interval=0))
+    plan = clicker.ClickPlan([(100, 200)], 'left', backend)
+    engine = clicker.ClickEngine(backend=backend)
+    engine.start(make_running_config(plan))
+    try:
+        assert wait_for(lambda: len(api.sent) >= 2)
+        # 在主显示器左侧接入第二个显示器：虚拟桌面原点变为(-1920, 0)
+        api.monitors = [(0, 0, 1920, 1080, 96), (-1920, 0, 0, 1080, 96)]
+        assert wait_for(lambda: engine.config.plan is not plan)
+        sent = len(api.sent)
+        assert wait_for(lambda: len(api.sent) >= sent + 2)
+    finally:
+        engine.stop()
+        engine.join()
+    assert engine.config.plan.geometry == (-1920, 0, 3840, 1080)
+    assert api.cursor == (100, 200)
+
+def test_sequence_recompiles_plan_when_monitors_change():
+    api = clicker.FakeUser32()
+    backend = clicker.SendInputBackend(api, clicker.DisplayGeometry(api, check_interval=0))
+    sequence = clicker.ClickSequence("a", clicker.ClickPlan([(100, 200)], 'left', backend), 0.002)
+    engine = clicker.MultiSequenceEngine()
+    engine.add_sequence(sequence)
+    engine.start_sequence(sequence)
+    try:
+        assert wait_for(lambda: len(api.sent) >= 2)
+        api.monitors = [(0, -1080, 1920, 0, 96), (0, 0, 1920, 1080, 96)]
+        assert wait_for(lambda: sequence.plan.geometry == (0, -1080, 1920, 2160))
+        sent = len(api.sent)
+        assert wait_for(lambda: len(api.sent) >= sent + 2)
+    finally:
+        engine.shutdown()
+    assert api.cursor == (100, 200)
+
+def test_invalidate_forces_requery():
+    api = clicker.FakeUser32()
+    display = clicker.DisplayGeometry(api)
+    assert display.rect() == (0, 0, 1920, 1080)
+    api.monitors = [(0, 0, 2560, 1440, 96)]
+    assert display.rect() == (0, 0, 1920, 1080)  # 校验间隔内读取缓存
+    display.invalidate()
+    assert display.rect() == (0, 0, 2560, 1440)
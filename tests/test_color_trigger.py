@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""颜色触发位置的轮询（用FakeScreen，不需要Windows）"""
+
+import threading
+import time
+
+import 点点点 as clicker
+
+def make_trigger(timeout=0.0, capture=None):
+    return clicker.ColorTrigger(10, 10, (200, 30, 30), tolerance=16, poll_hz=200,
+                                timeout=timeout, capture=capture)
+
+def test_waits_until_color_appears():
+    screen = clicker.FakeScreen(100, 100)
+    trigger = make_trigger(capture=screen)
+    threading.Timer(0.05, screen.fill, (0, 0, 100, 100, (205, 25, 40))).start()
+    assert trigger.wait() is True
+    assert trigger.polls > 1
+
+def test_times_out():
+    trigger = make_trigger(timeout=0.05, capture=clicker.FakeScreen(100, 100))
+    assert trigger.wait() is False
+
+def test_stop_event_interrupts():
+    stop_event = threading.Event()
+    threading.Timer(0.05, stop_event.set).start()
+    assert make_trigger(capture=clicker.FakeScreen(100, 100)).wait(stop_event) is False
+
+def test_no_capture_fails_immediately(monkeypatch):
+    monkeypatch.setattr(clicker, "default_screen_capture", lambda: None)
+    trigger = make_trigger()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(trigger.wait()), daemon=True)
+    started = time.perf_counter()
+    thread.start()
+    thread.join(1.0)
+    assert result == [None]
+    assert time.perf_counter() - started < 0.5
+
+def test_plan_skips_color_position_without_capture(monkeypatch):
+    monkeypatch.setattr(clicker, "default_screen_capture", lambda: None)
+    backend = clicker.RecordingBackend()
+    plan = clicker.ClickPlan([{"name": "c", "x": 10, "y": 10, "action": "color", "color": [200, 30, 30]}],
+                             'left', backend)
+    assert plan.click(0) is None
+    assert backend.click_count == 0
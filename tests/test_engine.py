@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""连点引擎的单次点击、日志和等待（用记录后端，不需要Windows）"""
+
+import time
+
+import 点点点 as clicker
+
+def make_config(plan, burst_mode=False):
+    return clicker.RunConfig(
+        interval=0.001, button=plan.button, positions=plan.points,
+        names=tuple(f"位置{i+1}" for i in range(len(plan))), plan=plan,
+        catch_up_policy="skip", burst_mode=burst_mode, burst_chunk_size=0, motion_mode="teleport",
+        motion_duration=0.0, motion_steps=1, precision_mode=False, cpu_budget=1.0, target_cps=0.0)
+
+class FailingBackend(clicker.RecordingBackend):
+    def click_batch(self, batch, start, count):
+        return False
+
+def run_tick(backend, burst_mode=False):
+    logs = []
+    plan = clicker.ClickPlan([(1, 2), (3, 4)], 'left', backend)
+    engine = clicker.ClickEngine(on_log=lambda message, key, summary: logs.append(message), backend=backend)
+    engine.is_running = True
+    engine.click_tick(make_config(plan, burst_mode), 0)
+    return engine, logs
+
+def test_click_logged_with_backend_name():
+    engine, logs = run_tick(clicker.RecordingBackend())
+    assert engine.clicks == 1
+    assert "方法: recording" in logs[-1]
+
+def test_failed_click_logged_as_failure():
+    engine, logs = run_tick(FailingBackend())
+    assert engine.clicks == 0
+    assert logs[-1].startswith("点击失败")
+
+def test_failed_burst_logged_as_failure():
+    engine, logs = run_tick(FailingBackend(), burst_mode=True)
+    assert engine.clicks == 0
+    assert logs[-1].startswith("连发失败")
+
+def cpu_time_of(function, *args):
+    start = time.process_time()
+    function(*args)
+    return time.process_time() - start
+
+def test_wait_precise_sleeps_without_cpu_budget():
+    assert cpu_time_of(clicker.wait_precise, 0.05) < 0.01
+
+def test_wait_precise_spins_within_cpu_budget():
+    assert cpu_time_of(clicker.wait_precise, 0.05, None, 1.0) >= 0.01
+
+def test_click_gaps_follow_cpu_budget():
+    backend = clicker.RecordingBackend()
+    plan = clicker.ClickPlan([{"name": "a", "x": 1, "y": 2, "clicks": 3, "click_gap_ms": 20}], 'left', backend)
+    assert cpu_time_of(plan.click, 0) < 0.01
+    assert backend.click_count == 3
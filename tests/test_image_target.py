@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""点击图像位置的定位和区域哈希缓存（用FakeScreen，不需要Windows）"""
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import 点点点 as clicker
+
+pytestmark = pytest.mark.skipif(clicker.np is None, reason="需要numpy")
+
+def bgra(rgb):
+    np = clicker.np
+    alpha = np.full(rgb.shape[:2], 255, np.uint8)
+    return np.dstack([rgb[..., 2], rgb[..., 1], rgb[..., 0], alpha]).tobytes()
+
+def make_icon(seed=1):
+    np = clicker.np
+    rng = np.random.default_rng(seed)
+    # 8×8像素的色块组成的图标，金字塔缩小后仍有结构
+    return (rng.random((8, 8, 3)) * 255).astype(np.uint8).repeat(8, 0).repeat(8, 1)
+
+def make_target(width=400, height=300):
+    screen = clicker.FakeScreen(width, height)
+    screen.fill(0, 0, width, height, (40, 40, 40))
+    icon = make_icon()
+    screen.paste(200, 100, bgra(icon), 64, 64)
+    template = clicker.ImageTemplate.from_bgra(bgra(icon), 64, 64)
+    target = clicker.ImageTarget([template], (0, 0, width, height), capture=screen)
+    return target, screen
+
+def test_locate_finds_template_center():
+    target, _ = make_target()
+    assert target.locate() == (232, 132)
+
+def test_unchanged_region_reuses_result():
+    target, _ = make_target()
+    target.locate()
+    assert target.locate() == (232, 132)
+    assert (target.matches, target.cache_hits) == (1, 1)
+
+@pytest.mark.parametrize("row", [1, 2, 3, 5, 299])
+def test_one_pixel_row_change_rematches(row):
+    target, screen = make_target()
+    target.locate()
+    screen.fill(0, row, 400, 1, (250, 250, 250))
+    target.locate()
+    assert (target.matches, target.cache_hits) == (2, 0)
+
+class SlowPool:
+    """第一次匹配超时（没有结果），之后正常返回"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def start_in_background(self):
+        pass
+    
+    def match(self, frame, templates, budget, key=None):
+        self.calls += 1
+        if self.calls == 1:
+            return None, False
+        return (1, 200, 100, 0.99), True
+
+def test_timed_out_match_is_not_cached():
+    _, screen = make_target()
+    templates = [clicker.ImageTemplate.from_bgra(bgra(make_icon(seed)), 64, 64) for seed in (2, 1)]
+    pool = SlowPool()
+    target = clicker.ImageTarget(templates, (0, 0, 400, 300), capture=screen, pool=pool)
+    assert target.locate() is None
+    assert target.locate() == (232, 132)
+    assert target.locate() == (232, 132)
+    assert (pool.calls, target.cache_hits) == (2, 1)
+
+@pytest.mark.skipif(clicker.shared_memory is None, reason="需要多进程共享内存")
+def test_pool_reports_incomplete_match():
+    _, screen = make_target()
+    frame = clicker.np.frombuffer(screen.grab(0, 0, 400, 300), clicker.np.uint8).reshape(300, 400, 4)
+    templates = [(i, clicker.ImageTemplate.from_bgra(bgra(make_icon(seed)), 64, 64).to_dict())
+                 for i, seed in enumerate((3, 1))]
+    pool = clicker.TemplateMatchPool(workers=1)
+    try:
+        _, complete = pool.match(frame, templates, budget=0)
+        assert not complete
+        clicker.wait(pool.pending[None])
+        best, complete = pool.match(frame, templates, budget=30)
+        assert complete
+        assert best[:3] == (1, 200, 100)
+    finally:
+        pool.close()
+
+@pytest.mark.skipif(clicker.shared_memory is None, reason="需要多进程共享内存")
+def test_pool_skips_target_with_unfinished_batch():
+    frame = clicker.np.zeros((100, 100, 4), clicker.np.uint8)
+    pool = clicker.TemplateMatchPool(workers=1)
+    try:
+        pool.start()
+        pool.pending["a"] = [Future()]  # 仍在运行、无法取消的任务
+        assert pool.match(frame, [], budget=30, key="a") == (None, False)
+        assert (pool.skipped, pool.blocks) == (1, [])
+        # 其他目标不受影响
+        assert pool.match(frame, [], budget=30, key="b") == (None, True)
+    finally:
+        pool.close()
+
+@pytest.mark.skipif(clicker.shared_memory is None, reason="需要多进程共享内存")
+def test_pool_caps_shared_memory_blocks():
+    pool = clicker.TemplateMatchPool(workers=1)
+    try:
+        with pool.lock:
+            for _ in range(clicker.MATCH_MAX_BLOCKS):
+                pool.acquire_block(1024)[1] = [Future()]
+            assert pool.acquire_block(1024) is None
+            # 空闲但太小的块被换成新块，总数不变
+            pool.blocks[0][1] = []
+            entry = pool.acquire_block(4096)
+        assert entry[0].size >= 4096
+        assert len(pool.blocks) == clicker.MATCH_MAX_BLOCKS
+    finally:
+        pool.close()
+
+class BlockingStartPool(clicker.TemplateMatchPool):
+    """启动进程池要等到released被设置"""
+    
+    def __init__(self):
+        super().__init__(workers=1)
+        self.released = threading.Event()
+        self.started = threading.Event()
+    
+    def start(self):
+        self.released.wait(5)
+        self.started.set()
+
+def test_target_creation_does_not_wait_for_pool_start():
+    _, screen = make_target()
+    templates = [clicker.ImageTemplate.from_bgra(bgra(make_icon(seed)), 64, 64) for seed in (2, 1)]
+    pool = BlockingStartPool()
+    clicker.ImageTarget(templates, (0, 0, 400, 300), capture=screen, pool=pool)
+    assert not pool.started.is_set()
+    pool.released.set()
+    assert pool.started.wait(5)
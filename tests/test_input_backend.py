@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""输入后端的选择和光标位置读取（用替身，不需要Windows）"""
+
+from types import SimpleNamespace
+
+import 点点点 as clicker
+
+def test_unavailable_backends_fall_back_to_null(monkeypatch):
+    monkeypatch.setattr(clicker, "user32", None)
+    monkeypatch.setattr(clicker, "pyautogui", None)
+    assert clicker.create_input_backend("auto").name == "null"
+    assert clicker.create_input_backend("sendinput").name == "null"
+    assert clicker.create_input_backend("recording").name == "recording"
+
+def test_sendinput_backend_probes_api():
+    assert clicker.SendInputBackend(clicker.FakeUser32()).probe()
+    assert not clicker.SendInputBackend(clicker.FakeUser32(screen_width=0)).probe()
+
+def test_cursor_read_from_user32(monkeypatch):
+    api = clicker.FakeUser32()
+    api.cursor = (-100, 250)
+    monkeypatch.setattr(clicker, "user32", api)
+    assert clicker.read_cursor_position() == (-100, 250)
+
+def test_cursor_read_without_sendinput(monkeypatch):
+    # 空后端总是返回(0, 0)，记录位置时不能用后端读取光标
+    monkeypatch.setattr(clicker, "user32", None)
+    monkeypatch.setattr(clicker, "pyautogui", SimpleNamespace(position=lambda: (12, 34)))
+    assert clicker.read_cursor_position() == (12, 34)
+    monkeypatch.setattr(clicker, "pyautogui", None)
+    controller = SimpleNamespace(position=(56.0, 78.0))
+    monkeypatch.setattr(clicker, "mouse", SimpleNamespace(Controller=lambda: controller))
+    assert clicker.read_cursor_position() == (56, 78)
+
+def test_cursor_unreadable(monkeypatch):
+    for name in ("user32", "pyautogui", "mouse"):
+        monkeypatch.setattr(clicker, name, None)
+    assert clicker.read_cursor_position() is None
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""状态日志的合并和限速刷新（用Text控件的替身，不需要显示器）"""
+
+import 点点点 as clicker
+
+class FakeRoot:
+    """记录after()的调用，由测试手动触发"""
+    
+    def __init__(self):
+        self.scheduled = []
+    
+    def after(self, delay_ms, callback):
+        self.scheduled.append((delay_ms, callback))
+
+class FakeText:
+    """按行保存内容，支持LogSink用到的几种索引"""
+    
+    def __init__(self):
+        self.lines = []
+        self.inserts = 0
+    
+    def config(self, **kwargs):
+        pass
+    
+    def see(self, index):
+        pass
+    
+    def insert(self, index, text):
+        self.inserts += 1
+        if index == clicker.tk.END:
+            self.lines.extend(text.rstrip("\n").split("\n"))
+        else:
+            line = int(index.split(".")[0])
+            self.lines[line - 1] = text
+    
+    def delete(self, first, last):
+        first_line = int(first.split(".")[0])
+        if last.endswith(".end"):
+            self.lines[first_line - 1] = ""
+        else:
+            del self.lines[first_line - 1:int(last.split(".")[0]) - 1]
+
+def shown(text):
+    """去掉时间戳后的显示内容"""
+    return [line.split("] ", 1)[1] for line in text.lines]
+
+def make_sink(**kwargs):
+    sink = clicker.LogSink(**kwargs)
+    root, text = FakeRoot(), FakeText()
+    sink.start(root, text)
+    return sink, root, text
+
+def test_repeated_messages_fold_into_one_line():
+    sink, _, text = make_sink()
+    for _ in range(3):
+        sink.post("已点击位置: A (1, 2), 方法: recording", key=("click", 0), summary="已点击 A (1, 2)")
+    sink.post("已点击位置: B (3, 4)", key=("click", 1), summary="已点击 B (3, 4)")
+    sink.flush()
+    assert shown(text) == ["已点击 A (1, 2) ×3", "已点击位置: B (3, 4)"]
+
+def test_folded_line_rewritten_in_place():
+    sink, _, text = make_sink()
+    sink.post("开始", key=None)
+    sink.post("点击 A", key="a", summary="已点击 A")
+    sink.flush()
+    sink.post("点击 A", key="a", summary="已点击 A")
+    sink.flush()
+    assert shown(text) == ["开始", "已点击 A ×2"]
+
+def test_messages_without_key_never_fold():
+    sink, _, text = make_sink()
+    sink.post("错误")
+    sink.post("错误")
+    sink.flush()
+    assert shown(text) == ["错误", "错误"]
+
+def test_only_recent_messages_fold():
+    sink, _, text = make_sink()
+    sink.post("点击 A", key="a", summary="已点击 A")
+    for i in range(clicker.LogSink.FOLD_WINDOW):
+        sink.post(f"消息{i}")
+    sink.post("点击 A", key="a", summary="已点击 A")
+    sink.flush()
+    assert shown(text).count("点击 A") == 2
+
+def test_flush_rate_is_limited():
+    sink, root, text = make_sink(max_messages=20, flushes_per_second=10)
+    assert [delay for delay, _ in root.scheduled] == [100]
+    # 两次刷新之间的大量消息只产生一次控件更新
+    for i in range(1000):
+        sink.post(f"消息{i}")
+    assert text.inserts == 0
+    delay, callback = root.scheduled.pop()
+    callback()
+    assert text.inserts == 1
+    assert shown(text) == [f"消息{i}" for i in range(980, 1000)]
+    assert [delay for delay, _ in root.scheduled] == [100]  # 继续定时刷新
+
+def test_flush_without_changes_does_nothing():
+    sink, _, text = make_sink()
+    sink.post("一条")
+    sink.flush()
+    sink.flush()
+    assert text.inserts == 1
+
+def test_old_lines_trimmed_to_limit():
+    sink, _, text = make_sink(max_messages=5)
+    for i in range(4):
+        sink.post(f"消息{i}")
+    sink.flush()
+    for i in range(4, 8):
+        sink.post(f"消息{i}")
+    sink.flush()
+    assert shown(text) == [f"消息{i}" for i in range(3, 8)]
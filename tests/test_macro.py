@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""宏的录制、回放、二进制文件格式和路径简化（用记录后端，不需要Windows）"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import 点点点 as clicker
+
+def make_macro(events):
+    macro = clicker.MacroBuffer()
+    for event in events:
+        macro.append(*event)
+    return macro
+
+EVENTS = [
+    (0.0, clicker.MACRO_MOVE, 10, 20, 0),
+    (0.001, clicker.MACRO_DOWN, 10, 20, 1),
+    (0.002, clicker.MACRO_UP, 12, 22, 1),
+    (0.003, clicker.MACRO_SCROLL, 0, -3, 0),
+    (0.004, clicker.MACRO_KEY_DOWN, 0, 0, 0x41),
+    (0.005, clicker.MACRO_KEY_UP, 0, 0, 0x41),
+]
+
+# 录制和回放
+
+def test_recorder_drops_stop_button_click():
+    recorder = clicker.MacroRecorder()
+    recorder.start_time = time.perf_counter()
+    recorder.is_recording = True
+    recorder.on_move(1, 2)
+    recorder.on_click(1, 2, SimpleNamespace(name="right"), True)
+    recorder.on_click(1, 2, SimpleNamespace(name="right"), False)
+    recorder.on_move(50, 60)
+    recorder.on_click(50, 60, SimpleNamespace(name="left"), True)
+    recorder.on_click(50, 60, SimpleNamespace(name="left"), False)
+    macro = recorder.stop(drop_last_click=True)
+    assert [(kind, x, y, data) for _, kind, x, y, data in macro] == [
+        (clicker.MACRO_MOVE, 1, 2, 0), (clicker.MACRO_DOWN, 1, 2, 1),
+        (clicker.MACRO_UP, 1, 2, 1), (clicker.MACRO_MOVE, 50, 60, 0)]
+    recorder.on_move(7, 7)  # 停止后不再录制
+    assert len(macro) == 4
+
+def test_replay_sends_events_in_order():
+    backend = clicker.RecordingBackend()
+    done = []
+    engine = clicker.ClickEngine(backend=backend, on_done=lambda: done.append(True))
+    engine.is_running = True
+    engine.run_macro(make_macro(EVENTS), speed=10.0, loops=2)
+    kinds = [(kind, x, y, button) for _, kind, x, y, button in backend.events]
+    assert kinds[:8] == [
+        ("move", 10, 20, None), ("move", 10, 20, None), ("down", 10, 20, "right"),
+        ("move", 12, 22, None), ("up", 12, 22, "right"),
+        ("scroll", 0, -3, None), ("key_down", 0x41, 0, None), ("key_up", 0x41, 0, None)]
+    assert len(kinds) == 16
+    assert engine.clicks == 2
+    assert done == [True]
+
+def test_replay_keeps_recorded_timing():
+    backend = clicker.RecordingBackend()
+    engine = clicker.ClickEngine(backend=backend)
+    engine.is_running = True
+    macro = make_macro([(0.0, clicker.MACRO_MOVE, 0, 0, 0), (0.05, clicker.MACRO_MOVE, 1, 1, 0)])
+    engine.run_macro(macro)
+    assert backend.events[1][0] - backend.events[0][0] >= 0.045
+
+def test_stopped_replay_releases_held_buttons_and_keys():
+    backend = clicker.RecordingBackend()
+    engine = clicker.ClickEngine(backend=backend)
+    macro = make_macro([(0.0, clicker.MACRO_DOWN, 5, 5, 0), (0.0, clicker.MACRO_KEY_DOWN, 0, 0, 0x10),
+                        (10.0, clicker.MACRO_UP, 5, 5, 0)])
+    engine.start_macro(macro)
+    time.sleep(0.05)
+    engine.stop()
+    engine.join(1)
+    assert not engine.thread.is_alive()
+    kinds = [kind for _, kind, _, _, _ in backend.events]
+    assert kinds[-2:] in (["up", "key_up"], ["key_up", "up"])
+
+# 二进制宏文件
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_macro_file_round_trip(tmp_path, packed):
+    events = EVENTS + [(1.5, clicker.MACRO_MOVE, -1920, -5, 0), (3600.25, clicker.MACRO_MOVE, 3839, 2159, 0)]
+    path = tmp_path / "a.ddm"
+    assert clicker.save_macro_file(path, make_macro(events), packed=packed) == len(events)
+    macro = clicker.MacroFile(path)
+    try:
+        assert macro.packed == packed
+        assert len(macro) == len(events)
+        assert list(macro) == events
+        assert macro.duration() == 3600.25
+    finally:
+        macro.close()
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_empty_macro_file(tmp_path, packed):
+    path = tmp_path / "empty.ddm"
+    clicker.save_macro_file(path, clicker.MacroBuffer(), packed=packed)
+    macro = clicker.MacroFile(path)
+    assert (len(macro), list(macro), macro.duration()) == (0, [], 0.0)
+    macro.close()
+
+def test_packed_file_is_smaller(tmp_path):
+    events = [(i * 0.008, clicker.MACRO_MOVE, 100 + i % 7, 200 + i // 3, 0) for i in range(10000)]
+    clicker.save_macro_file(tmp_path / "v1.ddm", events)
+    clicker.save_macro_file(tmp_path / "v2.ddm", events, packed=True)
+    assert (tmp_path / "v2.ddm").stat().st_size * 4 < (tmp_path / "v1.ddm").stat().st_size
+    macro = clicker.MacroFile(tmp_path / "v2.ddm")
+    assert [(kind, x, y) for _, kind, x, y, _ in macro] == [(kind, x, y) for _, kind, x, y, _ in events]
+    macro.close()
+
+class Interrupted(Exception):
+    pass
+
+def interrupted_events(events, after):
+    """产生after个事件后抛出异常，模拟写入中断（如磁盘已满、进程退出）"""
+    for index, event in enumerate(events):
+        if index == after:
+            raise Interrupted()
+        yield event
+
+def test_interrupted_fixed_write_keeps_written_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(clicker, "MACRO_WRITE_CHUNK", 4)
+    events = [(i * 0.01, clicker.MACRO_MOVE, i, -i, 0) for i in range(20)]
+    path = tmp_path / "cut.ddm"
+    with pytest.raises(Interrupted):
+        clicker.save_macro_file(path, interrupted_events(events, 10))
+    macro = clicker.MacroFile(path)
+    assert list(macro) == events[:8]  # 已经写出的两批
+    macro.close()
+
+def test_interrupted_packed_write_reads_as_empty(tmp_path):
+    events = [(i * 0.01, clicker.MACRO_MOVE, i, -i, 0) for i in range(20)]
+    path = tmp_path / "cut.ddm"
+    with pytest.raises(Interrupted):
+        clicker.save_macro_file(path, interrupted_events(events, 10), packed=True)
+    macro = clicker.MacroFile(path)
+    assert list(macro) == []
+    macro.close()
+
+def test_truncated_header_rejected(tmp_path):
+    path = tmp_path / "bad.ddm"
+    path.write_bytes(clicker.MACRO_FILE_MAGIC)
+    with pytest.raises(ValueError):
+        clicker.MacroFile(path)
+    path.write_bytes(b"NOTMACRO" + bytes(clicker.MACRO_HEADER.size))
+    with pytest.raises(ValueError):
+        clicker.MacroFile(path)
+
+# 路径简化
+
+def move_run(xs, step=0.001):
+    return make_macro([(i * step, clicker.MACRO_MOVE, x, 0, 0) for i, x in enumerate(xs)])
+
+def simplified_xs(macro, tolerance=1.0, max_interval=0.05):
+    return list(clicker.simplify_macro(macro, tolerance, max_interval).xs)
+
+def test_straight_run_reduced_to_endpoints():
+    assert simplified_xs(move_run(range(0, 101, 5))) == [0, 100]
+
+def test_backtrack_keeps_turnaround():
+    assert simplified_xs(move_run([0, 25, 50, 75, 100, 75, 50])) == [0, 100, 50]
+
+def test_backtrack_kept_without_numpy(monkeypatch):
+    monkeypatch.setattr(clicker, "np", None)
+    assert simplified_xs(move_run([0, 25, 50, 75, 100, 75, 50])) == [0, 100, 50]
+
+def test_clicks_and_timing_anchors_kept():
+    macro = make_macro([(0.0, clicker.MACRO_MOVE, 0, 0, 0), (0.001, clicker.MACRO_MOVE, 1, 0, 0),
+                        (0.002, clicker.MACRO_DOWN, 2, 0, 0), (0.003, clicker.MACRO_MOVE, 3, 0, 0),
+                        (0.004, clicker.MACRO_MOVE, 4, 0, 0), (0.005, clicker.MACRO_MOVE, 5, 0, 0),
+                        (0.2, clicker.MACRO_MOVE, 6, 0, 0), (0.201, clicker.MACRO_UP, 6, 0, 0)])
+    result = clicker.simplify_macro(macro)
+    # 按下前后、停顿前后的点保留，其余共线的点删除
+    assert list(result.xs) == [0, 1, 2, 3, 5, 6, 6]
+    assert list(result.times) == [0.0, 0.001, 0.002, 0.003, 0.005, 0.2, 0.201]
+
+@pytest.mark.skipif(clicker.np is None, reason="需要numpy")
+@pytest.mark.parametrize("seed", range(5))
+def test_numpy_mask_matches_python(seed):
+    np = clicker.np
+    rng = np.random.default_rng(seed)
+    count = 2000
+    # 随机游走（包括折返和原地停留）
+    xs = np.cumsum(rng.integers(-6, 7, count)).tolist()
+    ys = np.cumsum(rng.integers(-6, 7, count)).tolist()
+    anchor = [False] * count
+    for index in rng.choice(count, 30, replace=False):
+        anchor[index] = True
+    anchor[0] = anchor[-1] = True
+    for tolerance in (0.5, 1.0, 3.0, 10.0):
+        expected = clicker.rdp_mask_python(xs, ys, anchor, tolerance)
+        assert clicker.rdp_mask_numpy(xs, ys, anchor, tolerance).tolist() == expected
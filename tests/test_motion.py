@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""点击前的鼠标移动方式（用记录后端，不需要Windows）"""
+
+import threading
+
+import 点点点 as clicker
+
+def moves(backend):
+    return [(x, y) for _, kind, x, y, _ in backend.events if kind == "move"]
+
+def test_teleport_does_not_move_or_query():
+    backend = clicker.RecordingBackend(cursor=(5, 5))
+    clicker.MotionEngine("teleport", backend=backend).move(100, 40)
+    assert backend.events == []
+    assert backend.position_queries == 0
+
+def test_skip_if_there_moves_only_when_elsewhere():
+    backend = clicker.RecordingBackend(cursor=(100, 40))
+    motion = clicker.MotionEngine("skip_if_there", backend=backend)
+    motion.move(100, 40)
+    assert moves(backend) == []
+    motion.move(7, 8)
+    assert moves(backend) == [(7, 8)]
+    assert backend.position_queries == 2
+
+def test_animated_interpolates_to_target():
+    backend = clicker.RecordingBackend(cursor=(0, 0))
+    clicker.MotionEngine("animated", duration=0, steps=4, backend=backend).move(100, 40)
+    assert moves(backend) == [(25, 10), (50, 20), (75, 30), (100, 40)]
+
+def test_animated_takes_configured_duration():
+    backend = clicker.RecordingBackend(cursor=(0, 0))
+    clicker.MotionEngine("animated", duration=0.04, steps=5, backend=backend).move(50, 50)
+    times = [t for t, kind, _, _, _ in backend.events]
+    assert 0.03 <= times[-1] - times[0] < 0.5
+    assert moves(backend)[-1] == (50, 50)
+
+def test_animated_stops_promptly():
+    backend = clicker.RecordingBackend(cursor=(0, 0))
+    stop_event = threading.Event()
+    stop_event.set()
+    clicker.MotionEngine("animated", duration=10, steps=10, backend=backend,
+                         stop_event=stop_event).move(100, 100)
+    assert moves(backend) == [(10, 10)]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""预设中大量位置的差分+zigzag变长编码"""
+
+import json
+
+import pytest
+
+import 点点点 as clicker
+
+@pytest.mark.parametrize("value", [0, 1, -1, 63, -64, 64, 8191, -8192, 2 ** 31 - 1, -2 ** 31])
+def test_zigzag_varint_round_trip(value):
+    out = bytearray()
+    clicker.write_varint(out, clicker.zigzag(value))
+    assert list(clicker.decode_varints(bytes(out), 1)) == [value]
+
+def test_small_values_take_one_byte():
+    out = bytearray()
+    for value in range(-64, 64):
+        clicker.write_varint(out, clicker.zigzag(value))
+    assert len(out) == 128
+
+def test_positions_round_trip_with_negative_coordinates():
+    # 主显示器左侧和上方的显示器坐标为负数
+    positions = [{"name": f"位置{i + 1}", "x": x, "y": y}
+                 for i, (x, y) in enumerate([(0, 0), (-1920, -5), (-1, 1079), (3839, -1080), (5, 5)])]
+    assert clicker.unpack_positions(clicker.pack_positions(positions)) == positions
+
+def test_extra_fields_and_names_kept():
+    positions = [
+        {"name": "位置1", "x": 10, "y": 20},
+        {"name": "按钮", "x": -30, "y": 40, "clicks": 2, "click_gap_ms": 50},
+        (50, 60),
+        {"name": "位置4", "x": 70, "y": 80, "action": "drag", "to": [-90, 100]},
+    ]
+    packed = clicker.pack_positions(positions)
+    assert set(packed["extra"]) == {"1", "3"}  # 默认名称不保存
+    assert clicker.unpack_positions(packed) == [
+        {"name": "位置1", "x": 10, "y": 20},
+        {"name": "按钮", "x": -30, "y": 40, "clicks": 2, "click_gap_ms": 50},
+        {"name": "位置3", "x": 50, "y": 60},
+        {"name": "位置4", "x": 70, "y": 80, "action": "drag", "to": [-90, 100]},
+    ]
+
+def test_large_position_set_round_trip_through_json():
+    count = clicker.PACK_POSITIONS_THRESHOLD * 5
+    positions = [{"name": f"位置{i + 1}", "x": (i * 37) % 3840 - 1920, "y": (i * 91) % 2160 - 1080}
+                 for i in range(count)]
+    preset = {"positions_packed": clicker.pack_positions(positions)}
+    text = json.dumps(preset)
+    assert len(text) < len(json.dumps({"positions": positions})) // 5
+    assert clicker.preset_positions(json.loads(text)) == positions
+
+def test_unpacked_presets_still_load():
+    positions = [{"name": "a", "x": 1, "y": 2}]
+    assert clicker.preset_positions({"positions": positions}) == positions
+    assert clicker.preset_positions({}) == []
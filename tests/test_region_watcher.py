@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""等待画面变化：区域各块的哈希和变化检测（用FakeScreen，不需要Windows）"""
+
+import threading
+
+import pytest
+
+import 点点点 as clicker
+
+@pytest.fixture(params=["numpy", "crc32"])
+def hashing(request, monkeypatch):
+    if request.param == "numpy":
+        if clicker.np is None:
+            pytest.skip("需要numpy")
+    else:
+        monkeypatch.setattr(clicker, "np", None)
+    return request.param
+
+def make_watcher(width, height, timeout=1.0):
+    screen = clicker.FakeScreen(200, 200)
+    screen.fill(0, 0, 200, 200, (30, 30, 30))
+    watcher = clicker.RegionWatcher((50, 60, width, height), timeout, capture=screen)
+    return watcher, screen
+
+@pytest.mark.parametrize("width, height", [(64, 64), (40, 20), (10, 10), (1, 1)])
+def test_change_detected(hashing, width, height):
+    watcher, screen = make_watcher(width, height)
+    before = watcher.snapshot()
+    assert len(before) > 0
+    threading.Timer(0.05, screen.fill, (50, 60, width, height, (250, 250, 250))).start()
+    assert watcher.wait_change(before)
+    assert watcher.timeouts == 0
+
+@pytest.mark.parametrize("width, height", [(64, 64), (10, 10)])
+def test_unchanged_region_times_out(hashing, width, height):
+    watcher, _ = make_watcher(width, height, timeout=0.05)
+    assert not watcher.wait_change(watcher.snapshot())
+    assert watcher.timeouts == 1
+
+def test_tile_size_unchanged_for_large_regions():
+    watcher, _ = make_watcher(64, 96)
+    assert (watcher.downsample, watcher.tile) == (clicker.CHANGE_DOWNSAMPLE, (clicker.CHANGE_TILE, clicker.CHANGE_TILE))
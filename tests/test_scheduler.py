@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""截止时间调度器的追赶策略和次/秒闭环速率控制（用假时钟，不需要真的等待）"""
+
+import pytest
+
+import 点点点 as clicker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(clicker.time, "perf_counter", clock)
+    return clock
+
+def make_scheduler(policy, **kwargs):
+    scheduler = clicker.DeadlineScheduler(0.25, policy, **kwargs)
+    scheduler.start()
+    assert scheduler.wait() == 1  # 第一次点击立即执行
+    return scheduler
+
+def test_on_time_clicks_miss_nothing(clock):
+    scheduler = make_scheduler("skip")
+    for tick in range(1, 5):
+        clock.now = tick * 0.25
+        assert scheduler.wait() == 1
+    assert scheduler.missed == 0
+    assert scheduler.next_deadline == 1.25
+
+@pytest.mark.parametrize("policy, runs, next_deadline", [
+    ("skip", 1, 1.0),     # 只点一次，保持原来的节拍
+    ("burst", 3, 1.0),    # 补发错过的点击
+    ("shift", 1, 1.125),  # 节拍从现在重新开始
+])
+def test_catch_up_after_missed_deadlines(clock, policy, runs, next_deadline):
+    scheduler = make_scheduler(policy)
+    clock.now = 0.875  # 0.25、0.5、0.75三个截止时间都已过去
+    assert scheduler.wait() == runs
+    assert scheduler.missed == 2
+    assert scheduler.next_deadline == next_deadline
+
+def test_burst_catch_up_is_capped(clock):
+    scheduler = make_scheduler("burst", max_catch_up=2)
+    clock.now = 2.0
+    assert scheduler.wait() == 2
+    assert scheduler.missed == 7
+
+@pytest.mark.parametrize("policy", ["skip", "burst", "shift"])
+def test_missed_deadlines_accumulate(clock, policy):
+    scheduler = make_scheduler(policy)
+    clock.now = 0.875
+    scheduler.wait()
+    clock.now = scheduler.next_deadline + 0.5  # 再错过两个
+    scheduler.wait()
+    assert scheduler.missed == 4
+
+def test_stopped_scheduler_does_not_click(clock):
+    scheduler = make_scheduler("skip")
+    scheduler.stop_event.set()
+    assert scheduler.wait() == 0
+    clock.now = 1.0
+    assert scheduler.wait() == 0
+
+def run_controller(controller, achieved_cps, periods=40, missed_per_period=0):
+    """模拟periods个调整周期，achieved_cps(间隔)为后端在该间隔下实际达到的速率"""
+    if controller.last_time is None:
+        controller.observe(0.0, 0, 0)
+    now, clicks, missed = controller.last_time, controller.last_clicks, controller.last_missed
+    for _ in range(periods):
+        now += controller.update_period
+        clicks += achieved_cps(controller.interval()) * controller.update_period
+        missed += missed_per_period
+        controller.observe(now, clicks, missed)
+    return controller
+
+def test_rate_controller_converges_to_target():
+    # 每次点击有额外开销，按标称间隔只能达到目标的80%
+    controller = run_controller(clicker.RateController(100, 0.01), lambda interval: 0.8 / interval)
+    assert abs(controller.error) < 0.02
+    assert controller.interval() == pytest.approx(0.008, rel=0.02)
+    assert not controller.saturated
+
+def test_rate_controller_slows_down_when_too_fast():
+    controller = run_controller(clicker.RateController(50, 0.02), lambda interval: 1.5 / interval)
+    assert abs(controller.error) < 0.02
+    assert controller.interval() > 0.02
+
+def test_rate_controller_saturates_at_backend_limit():
+    controller = run_controller(clicker.RateController(100, 0.01), lambda interval: min(50.0, 1 / interval))
+    assert controller.scale == clicker.RateController.MIN_SCALE
+    assert controller.saturated
+    assert controller.actual_cps == pytest.approx(50.0)
+
+def test_rate_controller_saturates_when_deadlines_missed():
+    controller = run_controller(clicker.RateController(100, 0.01), lambda interval: 60.0,
+                                periods=1, missed_per_period=5)
+    assert controller.scale > clicker.RateController.MIN_SCALE
+    assert controller.saturated
+
+def test_rate_controller_recovers_from_saturation():
+    controller = run_controller(clicker.RateController(100, 0.01), lambda interval: min(50.0, 1 / interval))
+    run_controller(controller, lambda interval: 1 / interval)
+    assert abs(controller.error) < 0.02
+    assert not controller.saturated
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""多序列引擎：可加入的位置类型、点击计数和停止（用记录后端，不需要Windows）"""
+
+import time
+
+import pytest
+
+import 点点点 as clicker
+
+def make_sequence(positions, backend=None, interval=0.002):
+    backend = backend or clicker.RecordingBackend()
+    plan = clicker.ClickPlan(positions, 'left', backend, capture=clicker.FakeScreen(100, 100))
+    return clicker.ClickSequence("a", plan, interval, positions)
+
+@pytest.mark.parametrize("pos", [
+    {"name": "颜色", "x": 1, "y": 1, "action": "color", "color": [255, 0, 0]},
+    {"name": "长按", "x": 1, "y": 1, "action": "hold", "hold_ms": 500},
+    {"name": "拖动", "x": 1, "y": 1, "action": "drag", "to": [50, 50]},
+    {"name": "连击", "x": 1, "y": 1, "clicks": 2, "click_gap_ms": 100},
+    {"name": "变化", "x": 1, "y": 1, "wait_change": {"region": [0, 0, 64, 64]}},
+])
+def test_blocking_positions_rejected(pos):
+    engine = clicker.MultiSequenceEngine()
+    with pytest.raises(ValueError):
+        engine.add_sequence(make_sequence([(5, 5), pos]))
+    assert engine.sequences == []
+
+@pytest.mark.skipif(clicker.np is None, reason="需要numpy")
+def test_image_positions_rejected():
+    pixels = clicker.np.random.default_rng(1).integers(0, 256, (64, 64, 4), clicker.np.uint8).tobytes()
+    template = clicker.ImageTemplate.from_bgra(pixels, 64, 64)
+    pos = {"name": "图像", "x": 1, "y": 1, "action": "image",
+           "template": template.to_dict(), "region": [0, 0, 100, 100]}
+    engine = clicker.MultiSequenceEngine()
+    with pytest.raises(ValueError):
+        engine.add_sequence(make_sequence([(5, 5), pos]))
+    assert engine.sequences == []
+
+def test_plain_positions_accepted():
+    engine = clicker.MultiSequenceEngine()
+    sequence = make_sequence([(5, 5), {"name": "双击", "x": 1, "y": 1, "clicks": 2}])
+    engine.add_sequence(sequence)
+    assert engine.sequences == [sequence]
+
+class FailingBackend(clicker.RecordingBackend):
+    def click_batch(self, batch, start, count):
+        return False
+
+def run_sequence(sequence, duration=0.05):
+    engine = clicker.MultiSequenceEngine()
+    engine.add_sequence(sequence)
+    engine.start_sequence(sequence)
+    time.sleep(duration)
+    started = time.perf_counter()
+    engine.shutdown()
+    return time.perf_counter() - started
+
+def test_only_successful_clicks_counted():
+    sequence = make_sequence([(5, 5)], FailingBackend())
+    run_sequence(sequence)
+    assert sequence.position_index > 0
+    assert sequence.clicks == 0
+
+def test_clicks_counted():
+    backend = clicker.RecordingBackend()
+    sequence = make_sequence([(5, 5)], backend)
+    run_sequence(sequence)
+    assert sequence.clicks == backend.click_count > 0
+
+def test_shutdown_is_prompt():
+    assert run_sequence(make_sequence([(5, 5)], interval=10.0)) < 0.5
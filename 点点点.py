@@ -6,26 +6,161 @@
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import threading
 import time
 import json
+import logging
 import os
 import sys  # 添加sys模块用于获取打包后的资源路径
-from pynput import mouse, keyboard
-from pynput.mouse import Button, Listener
-from pynput.keyboard import Key, KeyCode
-import pyautogui
+import datetime
+import heapq
+import math
+import mmap
+import struct
+import base64
+import zlib
+import itertools
+from array import array
+from collections import deque, namedtuple
 import ctypes
 from ctypes import wintypes, Structure, c_long, c_ulong, c_int, c_uint, POINTER, byref
-from PIL import Image, ImageTk  # 添加PIL库用于处理图片
 
-# 禁用PyAutoGUI的fail-safe功能
-pyautogui.FAILSAFE = False
+# 以下依赖在非Windows环境（如CI）中可能无法导入，缺失时对应功能不可用，
+# 连点引擎、基准测试和测试仍可使用空后端/记录后端运行
+try:
+    from pynput import mouse, keyboard
+    from pynput.mouse import Button, Listener
+    from pynput.keyboard import Key, KeyCode
+except Exception:
+    mouse = keyboard = None
 
-# Windows API 常量和结构体
-user32 = ctypes.windll.user32
-kernel32 = ctypes.windll.kernel32
+try:
+    import pyautogui
+    # 禁用PyAutoGUI的fail-safe功能
+    pyautogui.FAILSAFE = False
+except Exception:
+    pyautogui = None
+
+try:
+    from PIL import Image, ImageTk  # 添加PIL库用于处理图片
+except Exception:
+    Image = ImageTk = None
+
+try:
+    from PIL import ImageGrab  # 可选：非Windows环境下截取屏幕区域
+except Exception:
+    ImageGrab = None
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, wait
+    from multiprocessing import shared_memory, freeze_support
+except Exception:
+    ProcessPoolExecutor = shared_memory = freeze_support = None
+
+try:
+    import numpy as np  # 可选：大批量数据（路径简化等）的向量化计算
+except Exception:
+    np = None
+
+class FakeUser32:
+    """user32的替身，在非Windows环境下记录SendInput调用，便于测试点击计划"""
+    
+    def __init__(self, screen_width=1920, screen_height=1080, record_events=True, monitors=None):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        # 显示器列表 [(left, top, right, bottom, dpi), ...]，第一个为主显示器
+        self.monitors = monitors or [(0, 0, screen_width, screen_height, 96)]
+        self.record_events = record_events  # 为False时只记录调用时间和事件数（基准测试用）
+        self.metrics_calls = 0  # GetSystemMetrics调用次数
+        self.sent = []          # 每次SendInput发送的事件列表 [(dwFlags, dx, dy), ...]
+        self.send_times = []    # 每次SendInput的调用时间（perf_counter）
+        self.event_count = 0    # 累计发送的事件数
+    
+    def virtual_rect(self):
+        left = min(m[0] for m in self.monitors)
+        top = min(m[1] for m in self.monitors)
+        return (left, top, max(m[2] for m in self.monitors) - left, max(m[3] for m in self.monitors) - top)
+    
+    def GetSystemMetrics(self, index):
+        self.metrics_calls += 1
+        if index == 0:
+            return self.screen_width
+        if index == 1:
+            return self.screen_height
+        if SM_XVIRTUALSCREEN <= index <= SM_CYVIRTUALSCREEN:
+            return self.virtual_rect()[index - SM_XVIRTUALSCREEN]
+        if index == SM_CMONITORS:
+            return len(self.monitors)
+        return 0
+    
+    def EnumDisplayMonitors(self, hdc, clip, callback, data):
+        for handle in range(1, len(self.monitors) + 1):
+            if not callback(handle, None, None, data):
+                break
+        return 1
+    
+    def GetMonitorInfoW(self, handle, info_ref):
+        info = getattr(info_ref, '_obj', info_ref)
+        left, top, right, bottom, _ = self.monitors[getattr(handle, 'value', handle) - 1]
+        info.rcMonitor.left, info.rcMonitor.top, info.rcMonitor.right, info.rcMonitor.bottom = left, top, right, bottom
+        info.rcWork = info.rcMonitor
+        info.dwFlags = MONITORINFOF_PRIMARY if getattr(handle, 'value', handle) == 1 else 0
+        return 1
+    
+    def GetDpiForMonitor(self, handle, dpi_type, dpi_x_ref, dpi_y_ref):
+        dpi = self.monitors[getattr(handle, 'value', handle) - 1][4]
+        getattr(dpi_x_ref, '_obj', dpi_x_ref).value = dpi
+        getattr(dpi_y_ref, '_obj', dpi_y_ref).value = dpi
+        return 0
+    
+    def SendInput(self, count, inputs, size):
+        self.send_times.append(time.perf_counter())
+        self.event_count += count
+        if not self.record_events:
+            return count
+        events = []
+        for i in range(count):
+            mi = inputs[i].ii.mi
+            events.append((mi.dwFlags, mi.dx, mi.dy))
+            if mi.dwFlags & MOUSEEVENTF_VIRTUALDESK:
+                left, top, width, height = self.virtual_rect()
+                self.cursor = (left + mi.dx * width // 65536, top + mi.dy * height // 65536)
+            elif mi.dwFlags & MOUSEEVENTF_ABSOLUTE:
+                self.cursor = (mi.dx * self.screen_width // 65536, mi.dy * self.screen_height // 65536)
+        self.sent.append(events)
+        return count
+    
+    def GetCursorPos(self, point_ref):
+        point = getattr(point_ref, '_obj', point_ref)
+        point.x, point.y = getattr(self, 'cursor', (0, 0))
+        return 1
+
+# Windows API 常量和结构体（非Windows环境下为None，SendInput后端不可用）
+if hasattr(ctypes, 'windll'):
+    user32 = ctypes.windll.user32
+    kernel32 = ctypes.windll.kernel32
+    try:
+        shcore = ctypes.windll.shcore  # Windows 8.1+，用于查询每个显示器的DPI
+    except OSError:
+        shcore = None
+else:
+    user32 = None
+    kernel32 = None
+    shcore = None
+
+# GetSystemMetrics索引
+SM_CXSCREEN = 0
+SM_CYSCREEN = 1
+SM_XVIRTUALSCREEN = 76
+SM_YVIRTUALSCREEN = 77
+SM_CXVIRTUALSCREEN = 78
+SM_CYVIRTUALSCREEN = 79
+SM_CMONITORS = 80
+
+MONITORINFOF_PRIMARY = 0x1
+MDT_EFFECTIVE_DPI = 0
+DISPLAY_CHECK_INTERVAL = 1.0  # 显示器配置的校验间隔（秒）
 
 # 鼠标事件常量
 MOUSEEVENTF_MOVE = 0x0001
@@ -33,12 +168,43 @@ MOUSEEVENTF_LEFTDOWN = 0x0002
 MOUSEEVENTF_LEFTUP = 0x0004
 MOUSEEVENTF_RIGHTDOWN = 0x0008
 MOUSEEVENTF_RIGHTUP = 0x0010
+MOUSEEVENTF_MIDDLEDOWN = 0x0020
+MOUSEEVENTF_MIDDLEUP = 0x0040
+MOUSEEVENTF_WHEEL = 0x0800
+MOUSEEVENTF_HWHEEL = 0x1000
+MOUSEEVENTF_VIRTUALDESK = 0x4000
 MOUSEEVENTF_ABSOLUTE = 0x8000
+# 绝对坐标按整个虚拟桌面（所有显示器）映射，而不是只映射主显示器
+MOUSEEVENTF_VIRTUAL_ABSOLUTE = MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK
+WHEEL_DELTA = 120
+
+# 键盘事件常量
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+
+# 各按键的 (按下, 释放) 标志
+MOUSE_BUTTON_FLAGS = {
+    'left': (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+    'right': (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+    'middle': (MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP),
+}
 
 # INPUT结构体
 class POINT(Structure):
     _fields_ = [("x", c_long), ("y", c_long)]
 
+class RECT(Structure):
+    _fields_ = [("left", c_long), ("top", c_long), ("right", c_long), ("bottom", c_long)]
+
+class MONITORINFO(Structure):
+    _fields_ = [("cbSize", wintypes.DWORD),
+                ("rcMonitor", RECT),
+                ("rcWork", RECT),
+                ("dwFlags", wintypes.DWORD)]
+
+MONITORENUMPROC = getattr(ctypes, 'WINFUNCTYPE', ctypes.CFUNCTYPE)(
+    c_int, wintypes.HMONITOR, wintypes.HDC, POINTER(RECT), wintypes.LPARAM)
+
 class MOUSEINPUT(Structure):
     _fields_ = [("dx", c_long),
                 ("dy", c_long),
@@ -48,8 +214,8 @@ class MOUSEINPUT(Structure):
                 ("dwExtraInfo", POINTER(c_ulong))]
 
 class KEYBDINPUT(Structure):
-    _fields_ = [("wVk", c_uint),
-                ("wScan", c_uint),
+    _fields_ = [("wVk", wintypes.WORD),
+                ("wScan", wintypes.WORD),
                 ("dwFlags", c_ulong),
                 ("time", c_ulong),
                 ("dwExtraInfo", POINTER(c_ulong))]
@@ -59,104 +225,3424 @@ class HARDWAREINPUT(Structure):
                 ("wParamL", c_uint),
                 ("wParamH", c_uint)]
 
-class INPUT(Structure):
-    class _INPUT(ctypes.Union):
-        _fields_ = [("ki", KEYBDINPUT),
-                    ("mi", MOUSEINPUT),
-                    ("hi", HARDWAREINPUT)]
-    _fields_ = [("type", c_ulong),
-                ("ii", _INPUT)]
+class INPUT(Structure):
+    class _INPUT(ctypes.Union):
+        _fields_ = [("ki", KEYBDINPUT),
+                    ("mi", MOUSEINPUT),
+                    ("hi", HARDWAREINPUT)]
+    _fields_ = [("type", c_ulong),
+                ("ii", _INPUT)]
+
+# INPUT类型常量
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+INPUT_HARDWARE = 2
+
+# 版本信息
+VERSION = "1.0"
+VERSION_FILE = "version.txt"
+SETTINGS_FILE = "settings.json"
+
+# 日志：按子系统划分，各子系统的级别可在settings.json的"log_levels"中配置，
+# 例如 {"log_levels": {"engine": "DEBUG", "ui": "OFF"}, "log_file": "点点点.log"}
+LOG_SUBSYSTEMS = ("engine", "hotkeys", "presets", "ui")
+DEFAULT_LOG_LEVELS = {
+    "engine": "WARNING",  # 点击线程，默认关闭逐次点击的调试日志
+    "hotkeys": "INFO",
+    "presets": "INFO",
+    "ui": "INFO",
+}
+
+engine_log = logging.getLogger("clicker.engine")
+hotkeys_log = logging.getLogger("clicker.hotkeys")
+presets_log = logging.getLogger("clicker.presets")
+ui_log = logging.getLogger("clicker.ui")
+
+def setup_logging(settings_file=SETTINGS_FILE):
+    """根据settings.json配置日志级别和输出位置"""
+    settings = {}
+    if os.path.exists(settings_file):
+        try:
+            with open(settings_file, 'r', encoding='utf-8') as f:
+                settings = json.load(f)
+        except Exception:
+            settings = {}
+    
+    root_logger = logging.getLogger("clicker")
+    root_logger.propagate = False
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    
+    # 打包后的窗口程序没有控制台（sys.stderr为None），只在配置了日志文件时输出
+    log_file = settings.get("log_file")
+    if log_file:
+        handler = logging.FileHandler(log_file, encoding='utf-8')
+    elif sys.stderr is not None:
+        handler = logging.StreamHandler()
+    else:
+        handler = logging.NullHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
+    root_logger.addHandler(handler)
+    
+    levels = dict(DEFAULT_LOG_LEVELS)
+    levels.update(settings.get("log_levels", {}))
+    for subsystem in LOG_SUBSYSTEMS:
+        logger = logging.getLogger(f"clicker.{subsystem}")
+        level = str(levels.get(subsystem, "WARNING")).upper()
+        if level == "OFF":
+            logger.disabled = True
+        else:
+            logger.disabled = False
+            logger.setLevel(getattr(logging, level, logging.WARNING))
+
+# Windows API 常量
+WM_COMMAND = 0x0111
+WM_SYSCOMMAND = 0x0112
+SC_TOPMOST = 0xF012  # 自定义系统命令ID
+
+def fill_mouse_input(entry, abs_x, abs_y, flags):
+    """填充一个鼠标INPUT结构体"""
+    entry.type = INPUT_MOUSE
+    entry.ii.mi.dx = abs_x
+    entry.ii.mi.dy = abs_y
+    entry.ii.mi.mouseData = 0
+    entry.ii.mi.dwFlags = flags
+    entry.ii.mi.time = 0
+    entry.ii.mi.dwExtraInfo = None
+
+def fill_key_input(entry, vk, scan, flags):
+    """填充一个键盘INPUT结构体"""
+    entry.type = INPUT_KEYBOARD
+    entry.ii.ki.wVk = vk
+    entry.ii.ki.wScan = scan
+    entry.ii.ki.dwFlags = flags
+    entry.ii.ki.time = 0
+    entry.ii.ki.dwExtraInfo = None
+
+def fill_click_inputs(inputs, offset, abs_x, abs_y, button='left', clicks=1):
+    """在inputs[offset:offset+1+2*clicks]中写入 移动->(按下->释放)×clicks 的事件"""
+    down_flag, up_flag = MOUSE_BUTTON_FLAGS[button]
+    
+    # 1. 移动鼠标到目标位置
+    fill_mouse_input(inputs[offset], abs_x, abs_y, MOUSEEVENTF_MOVE | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+    for k in range(clicks):
+        # 2. 按下鼠标按键
+        fill_mouse_input(inputs[offset + 1 + 2 * k], abs_x, abs_y, down_flag | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+        # 3. 释放鼠标按键
+        fill_mouse_input(inputs[offset + 2 + 2 * k], abs_x, abs_y, up_flag | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+
+def normalize_coordinate(value, size, origin=0):
+    """把像素坐标转换为SendInput的绝对坐标（0-65535）
+    
+    系统按 origin + floor(绝对坐标 × size / 65536) 还原像素，所以取
+    ceil((value - origin) × 65536 / size) 才能准确落在value上（包括右边缘和下边缘）。
+    """
+    return min(65535, max(0, ((value - origin) * 65536 + size - 1) // size))
+
+def normalize_coordinates(values, size, origin=0):
+    """批量转换绝对坐标，返回array('i')；有numpy时向量化计算"""
+    if np is not None:
+        result = ((np.asarray(values, dtype=np.int64) - origin) * 65536 + size - 1) // size
+        return array('i', np.clip(result, 0, 65535).astype(np.int32).tobytes())
+    return array('i', [normalize_coordinate(value, size, origin) for value in values])
+
+def ctypes_field_view(buffer, count, stride, offset, ctype):
+    """把ctypes结构体数组中的一个字段映射为跨步numpy数组（写入即修改原缓冲区）"""
+    # c_long/c_ulong在Windows上是4字节，在Linux上是8字节，按实际大小和符号选择dtype
+    signed = ctype(-1).value < 0
+    dtype = np.dtype(f"{'i' if signed else 'u'}{ctypes.sizeof(ctype)}")
+    return np.ndarray(shape=(count,), dtype=dtype, buffer=buffer, offset=offset, strides=(stride,))
+
+def position_xy(pos):
+    """取出位置的坐标，兼容新格式（字典）和旧格式（元组）"""
+    if isinstance(pos, dict):
+        return pos['x'], pos['y']
+    return pos[0], pos[1]
+
+def position_repeat(pos):
+    """取出位置的连击设置：(每次点击数, 连击间隔秒数)，旧格式为单击"""
+    if isinstance(pos, dict) and pos.get('action', 'click') == 'click':
+        return max(1, int(pos.get('clicks', 1))), max(0.0, pos.get('click_gap_ms', 0) / 1000.0)
+    return 1, 0.0
+
+# 位置的动作类型
+POSITION_ACTIONS = {
+    "click": "点击",
+    "hold": "长按",   # 按下后保持hold_ms毫秒再松开
+    "drag": "拖动",   # 按下后沿路径移动再松开：到to的steps步直线插值，或录制的折线path
+}
+
+def position_action_path(pos):
+    """长按/拖动位置的路径：(路径点, 每步间隔秒数, 松开前保持秒数)，普通点击返回None"""
+    if not isinstance(pos, dict):
+        return None
+    action = pos.get('action', 'click')
+    x, y = pos['x'], pos['y']
+    if action == 'hold':
+        return ((x, y),), 0.0, max(0, pos.get('hold_ms', 500)) / 1000.0
+    if action == 'drag':
+        if pos.get('path'):
+            points = ((x, y),) + tuple((px, py) for px, py in pos['path'])
+        else:
+            x2, y2 = pos.get('to', (x, y))
+            steps = max(1, int(pos.get('steps', 10)))
+            points = tuple((x + (x2 - x) * i // steps, y + (y2 - y) * i // steps) 
+                           for i in range(steps + 1))
+        duration = max(0, pos.get('duration_ms', 200)) / 1000.0
+        step_interval = duration / (len(points) - 1) if len(points) > 1 else 0.0
+        return points, step_interval, 0.0
+    return None
+
+def wait_precise(duration, stop_event=None, cpu_budget=0.0):
+    """等待duration秒，返回是否被停止信号打断
+    
+    与高精度模式的调度器相同：先睡眠，最后 duration×cpu_budget 秒（不超过SPIN_WINDOW_MAX）
+    对perf_counter自旋；cpu_budget为0（普通模式）时只睡眠，不占用CPU。
+    """
+    deadline = time.perf_counter() + duration
+    sleep_time = duration - min(SPIN_WINDOW_MAX, duration * cpu_budget)
+    if stop_event is not None:
+        if sleep_time > 0 and stop_event.wait(sleep_time):
+            return True
+    elif sleep_time > 0:
+        time.sleep(sleep_time)
+    while time.perf_counter() < deadline:
+        if stop_event is not None and stop_event.is_set():
+            return True
+    return False
+
+# 一个显示器：屏幕区域（虚拟桌面坐标，right/bottom不含）、DPI缩放比例、是否为主显示器
+Monitor = namedtuple('Monitor', ['left', 'top', 'right', 'bottom', 'scale', 'primary'])
+
+class DisplayGeometry:
+    """缓存的显示器几何信息：虚拟桌面的原点和大小、每个显示器的区域和DPI缩放
+    
+    第一次使用时查询并缓存。之后最多每隔check_interval秒读取一次虚拟桌面的
+    原点、大小和显示器数量作为校验值，只有校验值变化（插拔显示器、改分辨率或排列）
+    时才重新枚举显示器；invalidate()可以强制下次使用时重新查询。
+    点击时只读缓存，不再每次调用GetSystemMetrics。
+    """
+    
+    def __init__(self, api, dpi_api=None, check_interval=DISPLAY_CHECK_INTERVAL):
+        self.api = api
+        # 真实的user32通过shcore查询DPI；替身自己实现GetDpiForMonitor
+        self.dpi_api = dpi_api if dpi_api is not None else (shcore if api is user32 else api)
+        self.check_interval = check_interval
+        self.checksum = None
+        self.checked_at = 0.0
+        self.virtual = None   # (left, top, width, height)
+        self.monitors = ()
+        self.refreshes = 0    # 重新查询的次数
+    
+    def read_checksum(self):
+        metrics = self.api.GetSystemMetrics
+        return (metrics(SM_XVIRTUALSCREEN), metrics(SM_YVIRTUALSCREEN),
+                metrics(SM_CXVIRTUALSCREEN), metrics(SM_CYVIRTUALSCREEN), metrics(SM_CMONITORS))
+    
+    def refresh(self, checksum=None):
+        """重新查询虚拟桌面和显示器列表"""
+        if checksum is None:
+            checksum = self.read_checksum()
+        left, top, width, height, _ = checksum
+        if width <= 0 or height <= 0:
+            # 不支持虚拟桌面指标时退回主显示器
+            left, top = 0, 0
+            width, height = self.api.GetSystemMetrics(SM_CXSCREEN), self.api.GetSystemMetrics(SM_CYSCREEN)
+        monitors = self.enumerate_monitors()
+        if not monitors:
+            monitors = (Monitor(left, top, left + width, top + height, 1.0, True),)
+        self.monitors = monitors
+        self.virtual = (left, top, width, height)
+        self.checksum = checksum
+        self.refreshes += 1
+        engine_log.debug("显示器配置: 虚拟桌面 %s, 显示器 %s", self.virtual, monitors)
+    
+    def enumerate_monitors(self):
+        enum = getattr(self.api, 'EnumDisplayMonitors', None)
+        if enum is None:
+            return ()
+        monitors = []
+        
+        def callback(handle, hdc, rect, data):
+            info = MONITORINFO()
+            info.cbSize = ctypes.sizeof(MONITORINFO)
+            if self.api.GetMonitorInfoW(wintypes.HMONITOR(handle), byref(info)):
+                r = info.rcMonitor
+                monitors.append(Monitor(r.left, r.top, r.right, r.bottom, self.monitor_scale(handle),
+                                        bool(info.dwFlags & MONITORINFOF_PRIMARY)))
+            return 1
+        
+        try:
+            enum(None, None, MONITORENUMPROC(callback), 0)
+        except Exception as e:
+            engine_log.debug("枚举显示器失败: %s", e)
+        return tuple(monitors)
+    
+    def monitor_scale(self, handle):
+        """显示器的DPI缩放比例（96 DPI为1.0），无法查询时为1.0"""
+        if self.dpi_api is None:
+            return 1.0
+        dpi_x, dpi_y = c_uint(), c_uint()
+        try:
+            if self.dpi_api.GetDpiForMonitor(wintypes.HMONITOR(handle), MDT_EFFECTIVE_DPI,
+                                             byref(dpi_x), byref(dpi_y)) == 0 and dpi_x.value:
+                return dpi_x.value / 96.0
+        except Exception:
+            pass
+        return 1.0
+    
+    def rect(self):
+        """虚拟桌面 (left, top, width, height)，到了校验间隔才检查显示器是否变化"""
+        now = time.perf_counter()
+        if self.virtual is None or now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            checksum = self.read_checksum()
+            if self.virtual is None or checksum != self.checksum:
+                self.refresh(checksum)
+        return self.virtual
+    
+    def invalidate(self):
+        self.virtual = None
+    
+    def monitor_at(self, x, y):
+        """返回包含(x, y)的显示器序号（从0开始）和显示器，不在任何显示器上时返回 (None, None)"""
+        self.rect()
+        for index, monitor in enumerate(self.monitors):
+            if monitor.left <= x < monitor.right and monitor.top <= y < monitor.bottom:
+                return index, monitor
+        return None, None
+
+# 屏幕截取
+
+SRCCOPY = 0x00CC0020
+DIB_RGB_COLORS = 0
+
+class BITMAPINFOHEADER(Structure):
+    _fields_ = [("biSize", wintypes.DWORD),
+                ("biWidth", c_long),
+                ("biHeight", c_long),
+                ("biPlanes", wintypes.WORD),
+                ("biBitCount", wintypes.WORD),
+                ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD),
+                ("biXPelsPerMeter", c_long),
+                ("biYPelsPerMeter", c_long),
+                ("biClrUsed", wintypes.DWORD),
+                ("biClrImportant", wintypes.DWORD)]
+
+class ScreenCapture:
+    """屏幕区域截取接口
+    
+    grab()只截取给定区域（虚拟桌面坐标），返回BGRA像素（每行width*4字节，
+    自上而下），失败时返回None。返回的缓冲区可能在下一次截取同样大小的区域时被覆盖。
+    """
+    
+    name = None
+    
+    def probe(self):
+        return True
+    
+    def grab(self, left, top, width, height):
+        raise NotImplementedError
+
+class GDICapture(ScreenCapture):
+    """用GDI BitBlt截取屏幕区域到复用的DIB位图，不经过PIL"""
+    
+    name = "gdi"
+    
+    def __init__(self):
+        # 使用独立的DLL实例设置参数类型，不影响全局的ctypes.windll
+        self.user32 = ctypes.WinDLL('user32')
+        self.gdi32 = ctypes.WinDLL('gdi32')
+        self.user32.GetDC.restype = wintypes.HDC
+        self.user32.GetDC.argtypes = [wintypes.HWND]
+        self.user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+        self.gdi32.CreateCompatibleDC.restype = wintypes.HDC
+        self.gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+        self.gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+        self.gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.c_void_p, c_uint,
+                                                POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+        self.gdi32.SelectObject.restype = wintypes.HGDIOBJ
+        self.gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+        self.gdi32.BitBlt.argtypes = [wintypes.HDC, c_int, c_int, c_int, c_int,
+                                      wintypes.HDC, c_int, c_int, wintypes.DWORD]
+        self.gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+        self.gdi32.DeleteDC.argtypes = [wintypes.HDC]
+        self.surfaces = {}  # (width, height) -> (内存DC, 位图, 像素缓冲区)
+    
+    def probe(self):
+        return self.grab(0, 0, 1, 1) is not None
+    
+    def surface(self, width, height):
+        surface = self.surfaces.get((width, height))
+        if surface is None:
+            screen_dc = self.user32.GetDC(None)
+            dc = self.gdi32.CreateCompatibleDC(screen_dc)
+            self.user32.ReleaseDC(None, screen_dc)
+            header = BITMAPINFOHEADER()
+            header.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+            header.biWidth = width
+            header.biHeight = -height  # 负数表示自上而下
+            header.biPlanes = 1
+            header.biBitCount = 32
+            bits = ctypes.c_void_p()
+            bitmap = self.gdi32.CreateDIBSection(dc, byref(header), DIB_RGB_COLORS, byref(bits), None, 0)
+            if not bitmap or not bits.value:
+                self.gdi32.DeleteDC(dc)
+                return None
+            self.gdi32.SelectObject(dc, bitmap)
+            surface = (dc, bitmap, (ctypes.c_ubyte * (width * height * 4)).from_address(bits.value))
+            self.surfaces[(width, height)] = surface
+        return surface
+    
+    def grab(self, left, top, width, height):
+        surface = self.surface(width, height)
+        if surface is None:
+            return None
+        dc, bitmap, pixels = surface
+        screen_dc = self.user32.GetDC(None)
+        try:
+            if not self.gdi32.BitBlt(dc, 0, 0, width, height, screen_dc, left, top, SRCCOPY):
+                return None
+        finally:
+            self.user32.ReleaseDC(None, screen_dc)
+        return memoryview(pixels).cast('B')
+    
+    def close(self):
+        for dc, bitmap, pixels in self.surfaces.values():
+            self.gdi32.DeleteObject(bitmap)
+            self.gdi32.DeleteDC(dc)
+        self.surfaces.clear()
+
+class PILCapture(ScreenCapture):
+    """用PIL.ImageGrab截取屏幕区域（非Windows或GDI不可用时使用）"""
+    
+    name = "pil"
+    
+    def probe(self):
+        return ImageGrab is not None and self.grab(0, 0, 1, 1) is not None
+    
+    def grab(self, left, top, width, height):
+        try:
+            image = ImageGrab.grab(bbox=(left, top, left + width, top + height), all_screens=True)
+            return image.convert('RGB').tobytes('raw', 'BGRX')
+        except Exception as e:
+            engine_log.debug("截取屏幕失败: %s", e)
+            return None
+
+class FakeScreen(ScreenCapture):
+    """内存中的屏幕替身，便于在非Windows环境下测试图像定位"""
+    
+    name = "fake"
+    
+    def __init__(self, width=1920, height=1080):
+        self.width = width
+        self.height = height
+        self.frame = bytearray(width * height * 4)
+        self.grabs = 0  # 截取次数
+    
+    def paste(self, left, top, pixels, width, height):
+        """把BGRA像素写到屏幕的(left, top)处"""
+        row = width * 4
+        for y in range(height):
+            start = ((top + y) * self.width + left) * 4
+            self.frame[start:start + row] = pixels[y * row:(y + 1) * row]
+    
+    def fill(self, left, top, width, height, color):
+        """用 (r, g, b) 颜色填充矩形"""
+        r, g, b = color
+        self.paste(left, top, bytes((b, g, r, 255)) * (width * height), width, height)
+    
+    def grab(self, left, top, width, height):
+        self.grabs += 1
+        if left < 0 or top < 0 or left + width > self.width or top + height > self.height:
+            return None
+        row = width * 4
+        out = bytearray(row * height)
+        for y in range(height):
+            start = ((top + y) * self.width + left) * 4
+            out[y * row:(y + 1) * row] = self.frame[start:start + row]
+        return out
+
+_screen_capture = None
+
+def default_screen_capture():
+    """第一次使用时探测可用的截屏方式（优先GDI，其次PIL），都不可用时返回None"""
+    global _screen_capture
+    if _screen_capture is None:
+        candidates = []
+        if sys.platform == "win32":
+            candidates.append(GDICapture)
+        candidates.append(PILCapture)
+        for capture_class in candidates:
+            try:
+                capture = capture_class()
+                if capture.probe():
+                    _screen_capture = capture
+                    engine_log.info("截屏方式: %s", capture.name)
+                    break
+            except Exception as e:
+                engine_log.debug("截屏方式 %s 不可用: %s", capture_class.name, e)
+    return _screen_capture
+
+# 图像定位
+
+TEMPLATE_SIZE = 64            # 记录图像位置时截取的模板边长（像素）
+TEMPLATE_THRESHOLD = 0.8      # 匹配分数（归一化互相关）低于此值视为未找到
+TEMPLATE_REGION_SIZE = (800, 600)  # 记录时默认的搜索区域大小
+PYRAMID_MIN_SIZE = 8          # 金字塔最粗一层模板的最小边长
+PYRAMID_MAX_LEVEL = 4         # 最多缩小到1/16
+PYRAMID_CANDIDATES = 3        # 最粗一层保留的候选位置数
+MATCH_BUDGET = 0.05           # 多模板并行匹配等待结果的最长时间（秒）
+MATCH_MAX_BLOCKS = 4          # 多模板匹配最多同时使用的共享内存块（帧缓冲）数
+IMAGE_CAPTURE_DELAY_MS = 3000 # 点击记录按钮后等待多久截取模板（毫秒）
+
+def bgra_gray(frame, factor=1):
+    """BGRA像素 (h, w, 4) -> 灰度 (B+G+R)/3，按factor×factor块取平均，返回float32"""
+    height, width = frame.shape[0] // factor, frame.shape[1] // factor
+    block = frame[:height * factor, :width * factor]
+    if factor > 1:
+        # 先对每个块的factor行求和（连续内存上的规约最快）
+        block = block.reshape(height, factor, width * factor * 4).sum(axis=1, dtype=np.uint16)
+    # 再用一次矩阵乘法对块内各列的B、G、R求和（跳过Alpha）
+    weights = np.tile(np.array([1, 1, 1, 0], dtype=np.float32), factor) / (3 * factor * factor)
+    return (block.reshape(height * width, factor * 4).astype(np.float32) @ weights).reshape(height, width)
+
+def gray_pool(gray, factor):
+    """灰度图按factor×factor块取平均"""
+    if factor == 1:
+        return gray.astype(np.float32)
+    height, width = gray.shape[0] // factor, gray.shape[1] // factor
+    blocks = gray[:height * factor, :width * factor].reshape(height, factor, width, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+def window_sums(image, height, width):
+    """每个height×width窗口内的像素和（积分图），形状为有效位置数"""
+    integral = np.zeros((image.shape[0] + 1, image.shape[1] + 1))
+    np.cumsum(np.cumsum(image, axis=0, dtype=np.float64), axis=1, out=integral[1:, 1:])
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+def centered_template(template):
+    """去均值的模板及其范数，匹配时反复使用"""
+    t = template - template.mean()
+    return t, math.sqrt(float((t * t).sum()))
+
+def ncc_map(image, t, t_norm):
+    """去均值模板t在图像每个有效位置的归一化互相关分数（-1到1），互相关用FFT计算"""
+    ih, iw = image.shape
+    th, tw = t.shape
+    if t_norm == 0 or ih < th or iw < tw:
+        return None
+    # 循环相关在有效位置（y <= ih-th, x <= iw-tw）上与线性相关相同
+    corr = np.fft.irfft2(np.fft.rfft2(image) * np.conj(np.fft.rfft2(t, (ih, iw))), (ih, iw))
+    corr = corr[:ih - th + 1, :iw - tw + 1]
+    count = th * tw
+    sums = window_sums(image, th, tw)
+    variance = window_sums(image * image, th, tw) - sums * sums / count
+    denom = np.sqrt(np.maximum(variance, 0)) * t_norm
+    return np.where(denom > 1e-6, corr / np.maximum(denom, 1e-6), 0.0)
+
+def ncc_local(patch, t, t_norm):
+    """去均值模板t在小图块每个位置的归一化互相关分数（直接计算，用于逐层细化）"""
+    th, tw = t.shape
+    windows = np.lib.stride_tricks.sliding_window_view(patch, (th, tw))
+    if t_norm == 0:
+        return np.zeros(windows.shape[:2])
+    # 模板已去均值，窗口不必再去均值
+    corr = np.einsum('ijkl,kl->ij', windows, t)
+    sums = window_sums(patch, th, tw)
+    variance = window_sums(patch * patch, th, tw) - sums * sums / (th * tw)
+    denom = np.sqrt(np.maximum(variance, 0)) * t_norm
+    return np.where(denom > 1e-6, corr / np.maximum(denom, 1e-6), 0.0)
+
+class ImageTemplate:
+    """图像模板：灰度像素和各层金字塔，创建时计算一次
+    
+    保存到预设时为 {"width", "height", "gray"}，gray为zlib压缩后base64编码的灰度字节。
+    """
+    
+    def __init__(self, width, height, gray):
+        self.width = width
+        self.height = height
+        self.gray = bytes(gray)
+        self.pixels = np.frombuffer(self.gray, dtype=np.uint8).reshape(height, width).astype(np.float32)
+        # 最粗一层的缩小倍数：模板缩小后最短边不小于PYRAMID_MIN_SIZE
+        level = 0
+        while level < PYRAMID_MAX_LEVEL and min(width, height) >> (level + 1) >= PYRAMID_MIN_SIZE:
+            level += 1
+        # 每层为 (去均值的模板, 范数)
+        self.levels = [centered_template(gray_pool(self.pixels, 1 << l)) for l in range(level + 1)]
+    
+    @classmethod
+    def from_bgra(cls, pixels, width, height):
+        frame = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+        gray = np.rint(bgra_gray(frame)).astype(np.uint8)
+        return cls(width, height, gray.tobytes())
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["width"], data["height"], zlib.decompress(base64.b64decode(data["gray"])))
+    
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "gray": base64.b64encode(zlib.compress(self.gray, 9)).decode('ascii'),
+        }
+
+def match_template(frame, template):
+    """在BGRA帧中由粗到细查找模板，返回 (x, y, 分数)（模板左上角在帧中的坐标）
+    
+    只在最粗一层做全图搜索，保留几个候选位置后逐层放大，
+    每层只在上一层结果附近±2像素内计算，最后在原始分辨率上给出分数。
+    """
+    top_level = len(template.levels) - 1
+    factor = 1 << top_level
+    coarse = bgra_gray(frame, factor)
+    scores = ncc_map(coarse, *template.levels[top_level])
+    if scores is None:
+        return None
+    
+    # 依次取最高分，并抑制其附近的位置，避免几个候选落在同一个峰上
+    candidates = []
+    for _ in range(PYRAMID_CANDIDATES):
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        if candidates and scores[y, x] <= -1:
+            break
+        candidates.append((int(x), int(y)))
+        scores[max(0, y - 2):y + 3, max(0, x - 2):x + 3] = -1
+    
+    best = None
+    for x, y in candidates:
+        score = None
+        for level in range(top_level - 1, -1, -1):
+            t, t_norm = template.levels[level]
+            th, tw = t.shape
+            factor = 1 << level
+            level_height, level_width = frame.shape[0] // factor, frame.shape[1] // factor
+            # 在上一层结果放大2倍后的附近搜索
+            x0, y0 = max(0, min(x * 2 - 2, level_width - tw)), max(0, min(y * 2 - 2, level_height - th))
+            x1, y1 = max(x0, min(x * 2 + 2, level_width - tw)), max(y0, min(y * 2 + 2, level_height - th))
+            block = frame[y0 * factor:(y1 + th) * factor, x0 * factor:(x1 + tw) * factor]
+            local = ncc_local(bgra_gray(block, factor), t, t_norm)
+            dy, dx = np.unravel_index(int(np.argmax(local)), local.shape)
+            x, y, score = x0 + int(dx), y0 + int(dy), float(local[dy, dx])
+        if score is None:
+            # 模板太小，只有一层
+            score = float(ncc_local(bgra_gray(frame[y:y + template.height, x:x + template.width]),
+                                    *template.levels[0])[0, 0])
+        if best is None or score > best[2]:
+            best = (x, y, score)
+    return best
+
+class ImageTarget:
+    """“点击图像”位置：每次访问时只截取搜索区域，找到模板后点击其中心
+    
+    截取后先对整个区域算CRC32（1920×1080只需几毫秒，远少于匹配），
+    与上一次相同时直接复用上一次的结果，不再匹配；1像素的变化也会重新匹配。
+    位置可以有多个备选模板（界面的不同状态），取分数最高的一个；
+    多个模板时交给进程池并行匹配，最多等待budget秒；超时时结果不完整，不缓存。
+    """
+    
+    def __init__(self, templates, region, threshold=TEMPLATE_THRESHOLD, capture=None,
+                 budget=MATCH_BUDGET, pool=None):
+        self.templates = list(templates)
+        self.region = tuple(region)
+        self.threshold = threshold
+        self.capture = capture
+        self.budget = budget
+        self.pool = pool
+        if self.pool is None and len(self.templates) > 1:
+            self.pool = default_match_pool()
+        if self.pool is not None:
+            self.pool.start_in_background()
+        self.template_data = [(i, template.to_dict()) for i, template in enumerate(self.templates)]
+        self.last_hash = None
+        self.last_hit = None
+        self.last_index = None  # 最近一次匹配到的模板序号
+        self.matches = 0      # 实际匹配次数
+        self.cache_hits = 0   # 区域未变化、复用结果的次数
+        self.last_time = 0.0  # 最近一次定位的耗时（秒，含截取）
+    
+    @classmethod
+    def from_position(cls, pos, capture=None, pool=None):
+        templates = [ImageTemplate.from_dict(pos['template'])]
+        templates += [ImageTemplate.from_dict(data) for data in pos.get('alternatives', ())]
+        return cls(templates, pos['region'], pos.get('threshold', TEMPLATE_THRESHOLD), capture,
+                   max(0, pos.get('budget_ms', MATCH_BUDGET * 1000)) / 1000.0, pool)
+    
+    def match(self, frame):
+        """匹配所有模板，返回 ((模板序号, x, y, 分数) 或None, 是否所有模板都匹配完)"""
+        if len(self.templates) > 1 and self.pool is not None:
+            return self.pool.match(frame, self.template_data, self.budget, key=id(self))
+        best = None
+        for index, template in enumerate(self.templates):
+            hit = match_template(frame, template)
+            if hit is not None and (best is None or hit[2] > best[3]):
+                best = (index,) + hit
+        return best, True
+    
+    def locate(self):
+        """返回匹配位置中心的屏幕坐标，未找到时返回None"""
+        if np is None:
+            return None
+        started = time.perf_counter()
+        capture = self.capture or default_screen_capture()
+        left, top, width, height = self.region
+        pixels = capture.grab(left, top, width, height) if capture else None
+        if pixels is None:
+            return None
+        frame = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+        digest = zlib.crc32(frame)
+        if digest == self.last_hash:
+            self.cache_hits += 1
+            self.last_time = time.perf_counter() - started
+            return self.last_hit
+        
+        hit, complete = self.match(frame)
+        self.matches += 1
+        result = index = None
+        if hit is not None and hit[3] >= self.threshold:
+            index, x, y, score = hit
+            template = self.templates[index]
+            result = (left + x + template.width // 2, top + y + template.height // 2)
+        self.last_index = index
+        # 超时时还有模板没匹配完，结果不完整，不缓存：区域不变时下一次重新匹配
+        self.last_hash = digest if complete else None
+        self.last_hit = result
+        self.last_time = time.perf_counter() - started
+        return result
+
+# 多模板并行匹配
+
+_worker_templates = {}  # 进程池工作进程中：模板数据 -> ImageTemplate
+_worker_blocks = {}     # 进程池工作进程中：共享内存名 -> SharedMemory
+
+def match_templates_worker(block_name, shape, templates):
+    """在进程池中执行：从共享内存读取帧，匹配一组模板，返回 [(序号, x, y, 分数), ...]"""
+    block = _worker_blocks.get(block_name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks[block_name] = block
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+    results = []
+    for index, data in templates:
+        template = _worker_templates.get(data['gray'])
+        if template is None:
+            template = _worker_templates[data['gray']] = ImageTemplate.from_dict(data)
+        hit = match_template(frame, template)
+        if hit is not None:
+            results.append((index,) + hit)
+    return results
+
+class TemplateMatchPool:
+    """多模板匹配服务：把模板分组交给进程池并行匹配
+    
+    截取的帧复制到共享内存，工作进程直接映射读取，不经过pickle；
+    共享内存块在使用它的任务全部结束后才复用，超时未完成的任务不会读到下一帧，
+    块数不超过MATCH_MAX_BLOCKS。match()最多等待budget秒，返回已完成的结果中分数最高的一个；
+    已在运行的任务无法取消，同一目标上一批任务还没结束时不提交新任务，排队的任务不会越积越多。
+    """
+    
+    def __init__(self, workers=None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.executor = None
+        self.blocks = []     # [[共享内存块, 读取该块的任务列表], ...]
+        self.pending = {}    # 目标 -> 该目标最近一批任务
+        self.timeouts = 0    # 超过等待时间、有任务未完成的次数
+        self.skipped = 0     # 上一批未结束或共享内存块都在使用中、没有提交任务的次数
+        self.lock = threading.Lock()
+    
+    def start(self):
+        """创建进程池并预先启动工作进程，避免第一次匹配时等待进程启动"""
+        with self.lock:
+            if self.executor is None:
+                if sys.platform != "win32":
+                    # 先启动资源跟踪进程，工作进程与主进程共用它，
+                    # 工作进程退出时不会把主进程的共享内存当作泄漏清理掉
+                    from multiprocessing import resource_tracker
+                    resource_tracker.ensure_running()
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                for _ in range(self.workers):
+                    self.executor.submit(os.getpid)
+    
+    def start_in_background(self):
+        """在后台线程中启动进程池（创建点击计划时调用，不让界面线程等待工作进程启动）"""
+        if self.executor is None:
+            threading.Thread(target=self.start, daemon=True).start()
+    
+    def acquire_block(self, size):
+        """取一个空闲且足够大的共享内存块（调用时持有self.lock），都在使用中且已达上限时返回None"""
+        free = None
+        for entry in self.blocks:
+            block, futures = entry
+            if all(future.done() for future in futures):
+                if block.size >= size:
+                    return entry
+                free = entry
+        if len(self.blocks) >= MATCH_MAX_BLOCKS:
+            if free is None:
+                return None
+            # 空闲的块都太小（搜索区域变大了），换成足够大的新块
+            self.blocks.remove(free)
+            free[0].close()
+            free[0].unlink()
+        entry = [shared_memory.SharedMemory(create=True, size=size), []]
+        self.blocks.append(entry)
+        return entry
+    
+    def match(self, frame, templates, budget=MATCH_BUDGET, key=None):
+        """并行匹配templates [(序号, 模板数据), ...]，key区分不同的目标
+        
+        返回 (最佳结果, 是否全部完成)：最佳结果为 (序号, x, y, 分数)，都没有结果时为None；
+        超过budget秒还有任务未完成时只取已完成的结果，第二项为False。
+        同一key上一批任务还没结束（或共享内存块都在使用中）时不提交，返回 (None, False)。
+        """
+        self.start()
+        with self.lock:
+            if any(not future.done() for future in self.pending.get(key, ())):
+                self.skipped += 1
+                return None, False
+            entry = self.acquire_block(frame.nbytes)
+            if entry is None:
+                self.skipped += 1
+                return None, False
+            block = entry[0]
+            np.ndarray(frame.shape, dtype=np.uint8, buffer=block.buf)[:] = frame
+            
+            groups = [templates[i::self.workers] for i in range(min(self.workers, len(templates)))]
+            futures = [self.executor.submit(match_templates_worker, block.name, frame.shape, group)
+                       for group in groups]
+            entry[1] = self.pending[key] = futures
+        done, pending = wait(futures, timeout=budget)
+        if pending:
+            self.timeouts += 1
+            for future in pending:
+                future.cancel()
+        
+        best = None
+        for future in done:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            for hit in future.result():
+                if best is None or hit[3] > best[3]:
+                    best = hit
+        return best, not pending
+    
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+            for block, futures in self.blocks:
+                block.close()
+                block.unlink()
+            self.blocks = []
+            self.pending = {}
+
+_match_pool = None
+
+def default_match_pool():
+    """共用的多模板匹配进程池；不支持多进程/共享内存，或CPU少于3核（并行没有收益）时返回None"""
+    global _match_pool
+    if (_match_pool is None and shared_memory is not None and ProcessPoolExecutor is not None
+            and (os.cpu_count() or 1) > 2):
+        _match_pool = TemplateMatchPool()
+    return _match_pool
+
+def shutdown_match_pool():
+    global _match_pool
+    if _match_pool is not None:
+        _match_pool.close()
+        _match_pool = None
+
+def position_image_target(pos):
+    """“点击图像”位置的设置：(各模板数据, 搜索区域, 阈值, 等待时间)，其他位置返回None"""
+    if not isinstance(pos, dict) or pos.get('action') != 'image':
+        return None
+    templates = (pos['template'],) + tuple(pos.get('alternatives', ()))
+    return (tuple(template['gray'] for template in templates), tuple(pos['region']),
+            pos.get('threshold', TEMPLATE_THRESHOLD), pos.get('budget_ms'))
+
+# 颜色触发
+
+COLOR_TOLERANCE = 16      # 每个颜色通道允许的差值（0-255）
+COLOR_PATCH_SIZE = 1      # 取色区域边长（像素），大于1时取区域平均色
+COLOR_POLL_HZ = 100       # 默认每秒检查颜色的次数
+COLOR_POLL_MAX_HZ = 1000
+
+def parse_color(text):
+    """'#RRGGBB' 或 'r,g,b' -> (r, g, b)"""
+    text = text.strip()
+    if text.startswith('#') and len(text) == 7:
+        return tuple(int(text[i:i + 2], 16) for i in (1, 3, 5))
+    values = tuple(int(v) for v in text.split(','))
+    if len(values) != 3 or not all(0 <= v <= 255 for v in values):
+        raise ValueError(text)
+    return values
+
+def patch_color(pixels, count):
+    """BGRA像素的平均颜色 (r, g, b)"""
+    if count == 1:
+        return pixels[2], pixels[1], pixels[0]
+    return (sum(pixels[2::4]) // count, sum(pixels[1::4]) // count, sum(pixels[0::4]) // count)
+
+class ColorTrigger:
+    """颜色触发位置：轮到该位置时，按自己的轮询频率检查坐标处的颜色，
+    与目标颜色每个通道相差都不超过tolerance时才点击
+    
+    每次只截取以坐标为中心的patch×patch小块（默认1个像素），不截全屏；
+    轮询按绝对时间排期，频率与点击间隔无关，也不受截取耗时影响。
+    timeout为0时一直等到颜色出现或被停止。
+    """
+    
+    def __init__(self, x, y, color, tolerance=COLOR_TOLERANCE, patch=COLOR_PATCH_SIZE,
+                 poll_hz=COLOR_POLL_HZ, timeout=0.0, capture=None):
+        self.color = tuple(color)
+        self.tolerance = tolerance
+        self.patch = max(1, patch)
+        self.rect = (x - self.patch // 2, y - self.patch // 2, self.patch, self.patch)
+        self.poll_interval = 1.0 / min(max(1, poll_hz), COLOR_POLL_MAX_HZ)
+        self.timeout = timeout
+        self.capture = capture
+        self.polls = 0            # 累计轮询次数（状态栏据此计算每秒轮询数）
+        self.capture_time = 0.0   # 累计截取耗时（秒）
+        self.last_color = None
+    
+    @classmethod
+    def from_position(cls, pos, capture=None):
+        return cls(pos['x'], pos['y'], pos['color'], pos.get('tolerance', COLOR_TOLERANCE),
+                   pos.get('patch', COLOR_PATCH_SIZE), pos.get('poll_hz', COLOR_POLL_HZ),
+                   max(0, pos.get('timeout_ms', 0)) / 1000.0, capture)
+    
+    def sample(self):
+        """截取一次并返回平均颜色，截取失败时返回None"""
+        capture = self.capture or default_screen_capture()
+        if capture is None:
+            return None
+        started = time.perf_counter()
+        pixels = capture.grab(*self.rect)
+        self.capture_time += time.perf_counter() - started
+        self.polls += 1
+        if pixels is None:
+            return None
+        self.last_color = patch_color(pixels, self.patch * self.patch)
+        return self.last_color
+    
+    def matches(self, color):
+        return color is not None and all(abs(a - b) <= self.tolerance for a, b in zip(color, self.color))
+    
+    def wait(self, stop_event=None):
+        """轮询直到颜色匹配（返回True）、超时或被停止（返回False）；
+        没有可用的截屏方式时无法判断颜色，立即返回None"""
+        if self.capture is None and default_screen_capture() is None:
+            return None
+        start = time.perf_counter()
+        polls = 0
+        while True:
+            if self.matches(self.sample()):
+                return True
+            polls += 1
+            now = time.perf_counter()
+            if self.timeout and now - start >= self.timeout:
+                return False
+            remaining = start + polls * self.poll_interval - now
+            if remaining > 0:
+                if stop_event is not None:
+                    if stop_event.wait(remaining):
+                        return False
+                else:
+                    time.sleep(remaining)
+            elif stop_event is not None and stop_event.is_set():
+                return False
+
+def position_color_trigger(pos):
+    """颜色触发位置的设置：(颜色, 容差, 取色边长, 轮询频率, 超时)，其他位置返回None"""
+    if not isinstance(pos, dict) or pos.get('action') != 'color':
+        return None
+    return (tuple(pos['color']), pos.get('tolerance', COLOR_TOLERANCE), pos.get('patch', COLOR_PATCH_SIZE),
+            pos.get('poll_hz', COLOR_POLL_HZ), pos.get('timeout_ms', 0))
+
+# 等待画面变化
+
+CHANGE_TIMEOUT = 1.0      # 默认最多等待画面变化的秒数，超时后照常继续
+CHANGE_POLL_HZ = 200      # 检查画面变化的频率
+CHANGE_DOWNSAMPLE = 4     # 计算哈希前先按4×4块缩小
+CHANGE_TILE = 8           # 缩小后每块（tile）的边长，即原图32×32像素
+CHANGE_QUANT = 8          # 灰度量化步长，忽略细微的噪声
+
+class RegionWatcher:
+    """等待区域变化：点击前记下区域各块的哈希，点击后轮询到任一块变化或超时
+    
+    有numpy时先缩小、量化灰度，再按块与固定的随机权重做点积得到每块的哈希（向量化）；
+    没有numpy时对每块隔CHANGE_DOWNSAMPLE行取样计算CRC32。
+    区域小于一块（32×32像素）时缩小缩放倍数和块边长，保证至少有一块。
+    """
+    
+    def __init__(self, region, timeout=CHANGE_TIMEOUT, poll_hz=CHANGE_POLL_HZ, capture=None):
+        left, top, width, height = region
+        width, height = max(1, width), max(1, height)
+        self.region = (left, top, width, height)
+        self.downsample = max(1, min(CHANGE_DOWNSAMPLE, min(width, height) // CHANGE_TILE))
+        # 缩小后每块的 (行数, 列数)
+        self.tile = (min(CHANGE_TILE, height // self.downsample), min(CHANGE_TILE, width // self.downsample))
+        self.timeout = timeout
+        self.poll_interval = 1.0 / max(1, poll_hz)
+        self.capture = capture
+        self.weights = None
+        self.waits = 0            # 等待次数
+        self.timeouts = 0         # 超时次数
+        self.reaction_time = 0.0  # 累计从点击到画面变化的时间（秒，不含超时）
+        self.last_reaction = None
+    
+    @classmethod
+    def from_position(cls, pos, capture=None):
+        wait = pos['wait_change']
+        return cls(wait['region'], max(0, wait.get('timeout_ms', CHANGE_TIMEOUT * 1000)) / 1000.0,
+                   wait.get('poll_hz', CHANGE_POLL_HZ), capture)
+    
+    def tile_hashes(self):
+        """截取区域并计算每块的哈希，截取失败时返回None"""
+        capture = self.capture or default_screen_capture()
+        left, top, width, height = self.region
+        pixels = capture.grab(left, top, width, height) if capture else None
+        if pixels is None:
+            return None
+        
+        downsample = self.downsample
+        tile_rows, tile_cols = self.tile
+        if np is not None:
+            frame = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+            levels = (bgra_gray(frame, downsample) / CHANGE_QUANT).astype(np.int64)
+            rows, cols = levels.shape[0] // tile_rows, levels.shape[1] // tile_cols
+            tiles = levels[:rows * tile_rows, :cols * tile_cols].reshape(
+                rows, tile_rows, cols, tile_cols).transpose(0, 2, 1, 3).reshape(rows, cols, -1)
+            if self.weights is None:
+                self.weights = np.random.default_rng(0).integers(1, 1 << 31, tile_rows * tile_cols)
+            return tiles @ self.weights
+        
+        tile_height, tile_width = tile_rows * downsample, tile_cols * downsample
+        row_bytes = width * 4
+        hashes = []
+        for tile_top in range(0, height - tile_height + 1, tile_height):
+            for tile_left in range(0, width - tile_width + 1, tile_width):
+                crc = 0
+                for y in range(tile_top, tile_top + tile_height, downsample):
+                    start = y * row_bytes + tile_left * 4
+                    crc = zlib.crc32(pixels[start:start + tile_width * 4], crc)
+                hashes.append(crc)
+        return hashes
+    
+    def snapshot(self):
+        """点击前调用：记下各块的哈希"""
+        return self.tile_hashes()
+    
+    @staticmethod
+    def changed_tiles(before, after):
+        if np is not None and hasattr(before, 'shape'):
+            return int(np.count_nonzero(before != after))
+        return sum(1 for a, b in zip(before, after) if a != b)
+    
+    def wait_change(self, before, stop_event=None):
+        """点击后调用：轮询到有块变化（返回True）、超时或被停止（返回False）"""
+        self.waits += 1
+        if before is None:
+            return False
+        start = time.perf_counter()
+        polls = 0
+        while True:
+            after = self.tile_hashes()
+            now = time.perf_counter()
+            if after is not None and self.changed_tiles(before, after):
+                self.last_reaction = now - start
+                self.reaction_time += self.last_reaction
+                return True
+            if now - start >= self.timeout:
+                self.timeouts += 1
+                return False
+            polls += 1
+            remaining = min(start + polls * self.poll_interval, start + self.timeout) - time.perf_counter()
+            if remaining > 0:
+                if stop_event is not None:
+                    if stop_event.wait(remaining):
+                        return False
+                else:
+                    time.sleep(remaining)
+            elif stop_event is not None and stop_event.is_set():
+                return False
+
+def position_wait_change(pos):
+    """位置的等待画面变化设置：(区域, 超时毫秒, 轮询频率)，未设置时返回None"""
+    if not isinstance(pos, dict) or not pos.get('wait_change'):
+        return None
+    wait = pos['wait_change']
+    return (tuple(wait['region']), wait.get('timeout_ms'), wait.get('poll_hz'))
+
+class InputBackend:
+    """输入后端接口
+    
+    连点引擎只通过后端注入输入：移动、按下、释放、批量点击和查询光标位置。
+    批量点击前先用compile_clicks()把位置编译成后端自己的格式，点击时只传索引范围。
+    每个位置可以连击多次（repeats），click_batch()一次发送整组连击，
+    click_step()只发送其中一次，用于连击之间需要间隔的情况。
+    """
+    
+    name = None
+    
+    def probe(self):
+        """检查后端在当前环境下是否可用（启动时调用一次）"""
+        return True
+    
+    def geometry_token(self):
+        """影响编译结果的屏幕几何信息，变化时需要重新编译"""
+        return None
+    
+    def move(self, x, y):
+        raise NotImplementedError
+    
+    def click_at(self, x, y, button='left'):
+        """在运行时才确定的坐标（如图像定位结果）点击一次"""
+        self.move(x, y)
+        self.press(button)
+        return self.release(button)
+    
+    def press(self, button='left'):
+        raise NotImplementedError
+    
+    def release(self, button='left'):
+        raise NotImplementedError
+    
+    def cursor_position(self):
+        raise NotImplementedError
+    
+    def scroll(self, dx, dy):
+        """滚轮滚动（单位为格）"""
+        raise NotImplementedError
+    
+    def key_down(self, code):
+        """按下按键，code为虚拟键码，或带KEY_CHAR_FLAG的字符码"""
+        raise NotImplementedError
+    
+    def key_up(self, code):
+        raise NotImplementedError
+    
+    def compile_clicks(self, points, button='left', repeats=None):
+        """把位置列表（及每个位置的连击次数）编译成click_batch()使用的格式"""
+        repeats = tuple(repeats) if repeats is not None else (1,) * len(points)
+        return (tuple(points), button, repeats)
+    
+    def click_batch(self, batch, start, count):
+        """点击batch中从start开始的count个位置（含连击），返回是否全部成功"""
+        raise NotImplementedError
+    
+    def click_step(self, batch, index, step):
+        """只发送第index个位置连击中的第step次点击（step为0时包含移动）"""
+        raise NotImplementedError
+    
+    def compile_path(self, points, button='left'):
+        """把长按/拖动路径编译成path_send()使用的格式
+        
+        事件顺序：移动到起点、按下、依次移动到其余路径点、松开，共len(points)+2个。
+        """
+        return (tuple(points), button)
+    
+    def path_send(self, batch, start, count):
+        """发送路径中从start开始的count个事件，默认用move/press/release实现"""
+        points, button = batch
+        last = len(points) + 1
+        for i in range(start, start + count):
+            if i == 1:
+                self.press(button)
+            elif i == last:
+                self.release(button)
+            else:
+                self.move(*points[max(0, i - 1)])
+        return True
+
+class NullBackend(InputBackend):
+    """不产生任何输入的后端"""
+    
+    name = "null"
+    
+    def move(self, x, y):
+        pass
+    
+    def press(self, button='left'):
+        pass
+    
+    def release(self, button='left'):
+        pass
+    
+    def cursor_position(self):
+        return (0, 0)
+    
+    def scroll(self, dx, dy):
+        pass
+    
+    def key_down(self, code):
+        pass
+    
+    def key_up(self, code):
+        pass
+    
+    def click_batch(self, batch, start, count):
+        return True
+    
+    def click_step(self, batch, index, step):
+        return True
+
+class RecordingBackend(NullBackend):
+    """在内存中记录所有输入的后端，用于测试和基准测试"""
+    
+    name = "recording"
+    
+    def __init__(self, cursor=(0, 0), record_events=True):
+        self.cursor = cursor
+        self.record_events = record_events  # 为False时只记录点击时间和次数
+        self.events = []           # [(时间, 类型, x, y, 按键), ...]
+        self.send_times = []       # 每次click_batch的调用时间
+        self.click_count = 0       # 累计点击次数
+        self.position_queries = 0  # cursor_position调用次数
+    
+    def move(self, x, y):
+        self.cursor = (x, y)
+        if self.record_events:
+            self.events.append((time.perf_counter(), "move", x, y, None))
+    
+    def press(self, button='left'):
+        if self.record_events:
+            self.events.append((time.perf_counter(), "down", self.cursor[0], self.cursor[1], button))
+    
+    def release(self, button='left'):
+        if self.record_events:
+            self.events.append((time.perf_counter(), "up", self.cursor[0], self.cursor[1], button))
+    
+    def cursor_position(self):
+        self.position_queries += 1
+        return self.cursor
+    
+    def scroll(self, dx, dy):
+        if self.record_events:
+            self.events.append((time.perf_counter(), "scroll", dx, dy, None))
+    
+    def key_down(self, code):
+        if self.record_events:
+            self.events.append((time.perf_counter(), "key_down", code, 0, None))
+    
+    def key_up(self, code):
+        if self.record_events:
+            self.events.append((time.perf_counter(), "key_up", code, 0, None))
+    
+    def click_batch(self, batch, start, count):
+        points, button, repeats = batch
+        now = time.perf_counter()
+        self.send_times.append(now)
+        self.click_count += sum(repeats[start:start + count])
+        if self.record_events:
+            for (x, y), clicks in zip(points[start:start + count], repeats[start:start + count]):
+                for _ in range(clicks):
+                    self.events.append((now, "click", x, y, button))
+                self.cursor = (x, y)
+        return True
+    
+    def click_step(self, batch, index, step):
+        points, button, repeats = batch
+        now = time.perf_counter()
+        self.send_times.append(now)
+        self.click_count += 1
+        if self.record_events:
+            x, y = points[index]
+            self.events.append((now, "click", x, y, button))
+            self.cursor = (x, y)
+        return True
+
+class SendInputBatch:
+    """SendInput后端的编译结果：所有位置的事件放在一个连续的INPUT数组中"""
+    
+    def __init__(self, cycle, offsets):
+        self.cycle = cycle
+        self.offsets = offsets  # 第i个位置的事件从cycle[offsets[i]]开始，最后一项为总事件数
+        self.views = {}  # (起始位置, 位置数) -> 连续数组上的INPUT视图
+        self.steps = {}  # (位置, 第几次点击) -> 单次点击的INPUT视图
+
+class SendInputBackend(InputBackend):
+    """使用Windows SendInput注入输入，绕过游戏保护"""
+    
+    name = "sendinput"
+    
+    def __init__(self, api=None, display=None):
+        self.api = api if api is not None else user32
+        self.input_size = ctypes.sizeof(INPUT)
+        self.display = display if display is not None else DisplayGeometry(self.api)
+    
+    def probe(self):
+        try:
+            return self.api is not None and self.api.GetSystemMetrics(SM_CXSCREEN) > 0
+        except Exception:
+            return False
+    
+    def geometry_token(self):
+        # 虚拟桌面 (left, top, width, height)，来自缓存
+        return self.display.rect()
+    
+    def to_absolute(self, x, y, virtual):
+        """转换为虚拟桌面上的绝对坐标 (0-65535范围)"""
+        left, top, width, height = virtual
+        return normalize_coordinate(x, width, left), normalize_coordinate(y, height, top)
+    
+    def send_single(self, flags, abs_x=0, abs_y=0, mouse_data=0):
+        inputs = (INPUT * 1)()
+        fill_mouse_input(inputs[0], abs_x, abs_y, flags)
+        inputs[0].ii.mi.mouseData = mouse_data & 0xFFFFFFFF  # 滚轮向下为负数
+        return self.api.SendInput(1, inputs, self.input_size) == 1
+    
+    def move(self, x, y):
+        abs_x, abs_y = self.to_absolute(x, y, self.geometry_token())
+        return self.send_single(MOUSEEVENTF_MOVE | MOUSEEVENTF_VIRTUAL_ABSOLUTE, abs_x, abs_y)
+    
+    def click_at(self, x, y, button='left'):
+        abs_x, abs_y = self.to_absolute(x, y, self.geometry_token())
+        inputs = (INPUT * 3)()
+        fill_click_inputs(inputs, 0, abs_x, abs_y, button)
+        return self.api.SendInput(3, inputs, self.input_size) == 3
+    
+    def press(self, button='left'):
+        return self.send_single(MOUSE_BUTTON_FLAGS[button][0])
+    
+    def release(self, button='left'):
+        return self.send_single(MOUSE_BUTTON_FLAGS[button][1])
+    
+    def scroll(self, dx, dy):
+        if dy:
+            self.send_single(MOUSEEVENTF_WHEEL, mouse_data=dy * WHEEL_DELTA)
+        if dx:
+            self.send_single(MOUSEEVENTF_HWHEEL, mouse_data=dx * WHEEL_DELTA)
+        return True
+    
+    def send_key(self, code, flags):
+        inputs = (INPUT * 1)()
+        if code & KEY_CHAR_FLAG:
+            # 没有虚拟键码的字符按Unicode发送
+            fill_key_input(inputs[0], 0, code & 0xFFFF, flags | KEYEVENTF_UNICODE)
+        else:
+            fill_key_input(inputs[0], code, 0, flags)
+        return self.api.SendInput(1, inputs, self.input_size) == 1
+    
+    def key_down(self, code):
+        return self.send_key(code, 0)
+    
+    def key_up(self, code):
+        return self.send_key(code, KEYEVENTF_KEYUP)
+    
+    def cursor_position(self):
+        point = POINT()
+        self.api.GetCursorPos(byref(point))
+        return point.x, point.y
+    
+    def compile_clicks(self, points, button='left', repeats=None):
+        virtual = self.geometry_token()
+        count = len(points)
+        if repeats is None:
+            repeats = (1,) * count
+        
+        # 每个位置占 1个移动 + 2×连击次数 个事件
+        offsets = [0]
+        for clicks in repeats:
+            offsets.append(offsets[-1] + 1 + 2 * clicks)
+        
+        # 一次性转换所有位置的绝对坐标，结果保存在紧凑数组中
+        left, top, width, height = virtual
+        abs_xs = normalize_coordinates([x for x, y in points], width, left)
+        abs_ys = normalize_coordinates([y for x, y in points], height, top)
+        
+        cycle = (INPUT * offsets[-1])()
+        if np is not None and count:
+            self.fill_clicks_numpy(cycle, offsets, abs_xs, abs_ys, button, repeats)
+        else:
+            for i in range(count):
+                fill_click_inputs(cycle, offsets[i], abs_xs[i], abs_ys[i], button, repeats[i])
+        
+        batch = SendInputBatch(cycle, offsets)
+        batch.abs_xs, batch.abs_ys = abs_xs, abs_ys
+        # 预先生成每个位置的视图，逐个点击时直接取用
+        for i in range(count):
+            batch.views[(i, 1)] = (INPUT * (offsets[i + 1] - offsets[i])).from_buffer(
+                cycle, offsets[i] * self.input_size)
+        return batch
+    
+    def fill_clicks_numpy(self, cycle, offsets, abs_xs, abs_ys, button, repeats):
+        """用numpy向量化填充INPUT数组，结果与逐个调用fill_click_inputs()相同"""
+        down_flag, up_flag = MOUSE_BUTTON_FLAGS[button]
+        total = offsets[-1]
+        sizes = np.asarray(repeats, dtype=np.int64) * 2 + 1
+        position = np.repeat(np.arange(len(sizes)), sizes)                # 每个事件所属的位置
+        step = np.arange(total) - np.repeat(np.asarray(offsets[:-1]), sizes)  # 事件在位置内的序号
+        flags = np.where(step == 0, MOUSEEVENTF_MOVE, 
+                         np.where(step % 2 == 1, down_flag, up_flag)) | MOUSEEVENTF_VIRTUAL_ABSOLUTE
+        
+        stride = self.input_size
+        base = INPUT.ii.offset
+        ctypes_field_view(cycle, total, stride, INPUT.type.offset, c_ulong)[:] = INPUT_MOUSE
+        ctypes_field_view(cycle, total, stride, base + MOUSEINPUT.dx.offset, c_long)[:] = \
+            np.frombuffer(abs_xs, dtype=np.int32)[position]
+        ctypes_field_view(cycle, total, stride, base + MOUSEINPUT.dy.offset, c_long)[:] = \
+            np.frombuffer(abs_ys, dtype=np.int32)[position]
+        ctypes_field_view(cycle, total, stride, base + MOUSEINPUT.dwFlags.offset, c_ulong)[:] = flags
+    
+    def send_view(self, view):
+        try:
+            return self.api.SendInput(len(view), view, self.input_size) == len(view)
+        except Exception as e:
+            engine_log.warning("Windows API点击失败: %s", e)
+            return False
+    
+    def click_batch(self, batch, start, count):
+        view = batch.views.get((start, count))
+        if view is None:
+            offsets = batch.offsets
+            view = (INPUT * (offsets[start + count] - offsets[start])).from_buffer(
+                batch.cycle, offsets[start] * self.input_size)
+            batch.views[(start, count)] = view
+        return self.send_view(view)
+    
+    def compile_path(self, points, button='left'):
+        virtual = self.geometry_token()
+        down_flag, up_flag = MOUSE_BUTTON_FLAGS[button]
+        
+        count = len(points)
+        absolute = [self.to_absolute(x, y, virtual) for x, y in points]
+        events = (INPUT * (count + 2))()
+        fill_mouse_input(events[0], absolute[0][0], absolute[0][1], MOUSEEVENTF_MOVE | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+        fill_mouse_input(events[1], absolute[0][0], absolute[0][1], down_flag | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+        for k in range(1, count):
+            fill_mouse_input(events[k + 1], absolute[k][0], absolute[k][1], 
+                             MOUSEEVENTF_MOVE | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+        fill_mouse_input(events[count + 1], absolute[-1][0], absolute[-1][1], up_flag | MOUSEEVENTF_VIRTUAL_ABSOLUTE)
+        
+        batch = SendInputBatch(events, None)
+        # 预先生成按下段和每个单独事件的视图
+        batch.views[(0, 2)] = (INPUT * 2).from_buffer(events, 0)
+        for i in range(count + 2):
+            batch.views[(i, 1)] = (INPUT * 1).from_buffer(events, i * self.input_size)
+        return batch
+    
+    def path_send(self, batch, start, count):
+        view = batch.views.get((start, count))
+        if view is None:
+            view = (INPUT * count).from_buffer(batch.cycle, start * self.input_size)
+            batch.views[(start, count)] = view
+        return self.send_view(view)
+    
+    def click_step(self, batch, index, step):
+        view = batch.steps.get((index, step))
+        if view is None:
+            # 第0次包含移动事件，之后每次只有按下和释放
+            first = batch.offsets[index] + (0 if step == 0 else 1 + 2 * step)
+            view = (INPUT * (3 if step == 0 else 2)).from_buffer(batch.cycle, first * self.input_size)
+            batch.steps[(index, step)] = view
+        return self.send_view(view)
+
+class PyAutoGUIBackend(InputBackend):
+    """使用pyautogui注入输入（跨平台，速度较慢）"""
+    
+    name = "pyautogui"
+    
+    def probe(self):
+        if pyautogui is None:
+            return False
+        try:
+            pyautogui.size()
+            return True
+        except Exception:
+            return False
+    
+    # _pause=False 跳过pyautogui每次调用后的默认停顿
+    def move(self, x, y):
+        pyautogui.moveTo(x, y, _pause=False)
+    
+    def press(self, button='left'):
+        pyautogui.mouseDown(button=button, _pause=False)
+    
+    def release(self, button='left'):
+        pyautogui.mouseUp(button=button, _pause=False)
+    
+    def cursor_position(self):
+        x, y = pyautogui.position()
+        return x, y
+    
+    def scroll(self, dx, dy):
+        if dy:
+            pyautogui.scroll(dy, _pause=False)
+        if dx:
+            pyautogui.hscroll(dx, _pause=False)
+    
+    def key_name(self, code):
+        """把键码转换为pyautogui的按键名，无法转换时返回None"""
+        if code & KEY_CHAR_FLAG:
+            return chr(code & 0xFFFF)
+        if 0x30 <= code <= 0x39 or 0x41 <= code <= 0x5A:
+            return chr(code).lower()
+        return VK_KEY_NAMES.get(code)
+    
+    def key_down(self, code):
+        name = self.key_name(code)
+        if name:
+            pyautogui.keyDown(name, _pause=False)
+        else:
+            engine_log.debug("pyautogui无法发送键码: %#x", code)
+    
+    def key_up(self, code):
+        name = self.key_name(code)
+        if name:
+            pyautogui.keyUp(name, _pause=False)
+    
+    def click_batch(self, batch, start, count):
+        points, button, repeats = batch
+        try:
+            for (x, y), clicks in zip(points[start:start + count], repeats[start:start + count]):
+                pyautogui.click(x, y, clicks=clicks, interval=0, button=button, _pause=False)
+            return True
+        except Exception as e:
+            engine_log.warning("pyautogui点击失败: %s", e)
+            return False
+    
+    def click_step(self, batch, index, step):
+        points, button, repeats = batch
+        x, y = points[index]
+        try:
+            pyautogui.click(x, y, button=button, _pause=False)
+            return True
+        except Exception as e:
+            engine_log.warning("pyautogui点击失败: %s", e)
+            return False
+
+# 没有虚拟键码的字符在宏中记为 ord(字符) | KEY_CHAR_FLAG
+KEY_CHAR_FLAG = 0x10000
+
+# 常用虚拟键码对应的pyautogui按键名
+VK_KEY_NAMES = {
+    0x08: 'backspace', 0x09: 'tab', 0x0D: 'enter', 0x10: 'shift', 0x11: 'ctrl',
+    0x12: 'alt', 0x1B: 'esc', 0x20: 'space', 0x25: 'left', 0x26: 'up',
+    0x27: 'right', 0x28: 'down', 0x2E: 'delete',
+}
+
+# 可在设置中选择的输入后端
+INPUT_BACKENDS = {
+    "auto": "自动",
+    "sendinput": "SendInput",
+    "pyautogui": "pyautogui",
+    "null": "无（不产生输入）",
+}
+
+INPUT_BACKEND_CLASSES = {
+    "sendinput": SendInputBackend,
+    "pyautogui": PyAutoGUIBackend,
+    "null": NullBackend,
+    "recording": RecordingBackend,
+}
+
+def create_input_backend(name="auto"):
+    """创建输入后端；auto按 SendInput -> pyautogui 的顺序选择第一个可用的后端"""
+    candidates = ["sendinput", "pyautogui"] if name == "auto" else [name]
+    for candidate in candidates:
+        backend_class = INPUT_BACKEND_CLASSES.get(candidate)
+        if backend_class is None:
+            continue
+        backend = backend_class()
+        if backend.probe():
+            return backend
+        engine_log.info("输入后端不可用: %s", candidate)
+    
+    engine_log.warning("没有可用的输入后端，使用空后端")
+    return NullBackend()
+
+def read_cursor_position():
+    """读取系统光标位置，与所选的输入后端无关（空后端总是返回(0, 0)），无法读取时返回None"""
+    if user32 is not None:
+        point = POINT()
+        if user32.GetCursorPos(byref(point)):
+            return point.x, point.y
+    if pyautogui is not None:
+        try:
+            x, y = pyautogui.position()
+            return int(x), int(y)
+        except Exception:
+            pass
+    if mouse is not None:
+        try:
+            x, y = mouse.Controller().position
+            return int(x), int(y)
+        except Exception:
+            pass
+    return None
+
+class ClickPlan:
+    """预编译的点击计划
+    
+    开始连点时由输入后端把位置列表一次性编译好（SendInput后端为连续的INPUT数组），
+    点击时只需调用一次后端。只有位置、按键、连击设置、后端或屏幕分辨率变化时才需要重建。
+    每个位置的连击（双击/三击/N击）编译在同一段事件中：连击间隔为0时一次发送，
+    否则逐次发送并在两次之间精确等待（SendInput本身不支持事件间的延迟）。
+    长按和拖动位置的路径同样预先编译成事件数组和时间表，执行时只按时间表发送。
+    “点击图像”位置每次访问时才定位，找到后在匹配位置点击。
+    """
+    
+    def __init__(self, positions, button, backend, capture=None):
+        self.backend = backend
+        self.button = button
+        self.capture = capture
+        self.positions = tuple(positions)  # 屏幕几何变化时按原位置重新编译
+        self.points = tuple(position_xy(pos) for pos in positions)
+        repeat = [position_repeat(pos) for pos in positions]
+        self.repeats = tuple(clicks for clicks, gap in repeat)  # 每个位置每次访问的点击数
+        self.gaps = tuple(gap for clicks, gap in repeat)        # 连击之间的间隔（秒）
+        self.total_clicks = sum(self.repeats)                   # 一整轮的点击数
+        self.has_gaps = any(gap > 0 and clicks > 1 for clicks, gap in repeat)
+        self.actions = tuple(position_action_path(pos) for pos in positions)
+        self.geometry = backend.geometry_token()
+        self.batch = backend.compile_clicks(self.points, button, self.repeats)
+        self.cycle_chunks = {}
+        
+        # 长按/拖动：第index个位置 -> (编译后的路径, ((相对开始的秒数, 起始事件, 事件数), ...))
+        self.paths = {}
+        for index, action in enumerate(self.actions):
+            if action:
+                self.paths[index] = self.compile_path(*action)
+        
+        # 颜色触发：第index个位置 -> ColorTrigger，颜色出现后按预编译的点击发送
+        self.colors = tuple(position_color_trigger(pos) for pos in positions)
+        self.triggers = {index: ColorTrigger.from_position(pos, capture)
+                         for index, pos in enumerate(positions) if self.colors[index]}
+        
+        # 等待画面变化：第index个位置 -> RegionWatcher，点击后等到区域变化再继续
+        self.change_waits = tuple(position_wait_change(pos) for pos in positions)
+        self.watchers = {index: RegionWatcher.from_position(pos, capture)
+                         for index, pos in enumerate(positions) if self.change_waits[index]}
+        
+        # 点击图像：第index个位置 -> ImageTarget（没有numpy时无法匹配，为None）
+        self.images = tuple(position_image_target(pos) for pos in positions)
+        self.targets = {}
+        for index, pos in enumerate(positions):
+            if self.images[index]:
+                self.targets[index] = ImageTarget.from_position(pos, capture) if np is not None else None
+    
+    def compile_path(self, points, step_interval, hold_time):
+        """编译一条长按/拖动路径及其发送时间表"""
+        count = len(points)
+        segments = [(0.0, 0, 2)]  # 移动到起点并按下
+        for k in range(1, count):
+            segments.append((k * step_interval, k + 1, 1))
+        segments.append(((count - 1) * step_interval + hold_time, count + 1, 1))  # 松开
+        return self.backend.compile_path(points, self.button), tuple(segments)
+    
+    def run_path(self, index, stop_event=None, cpu_budget=0.0):
+        """按时间表发送长按/拖动路径；被停止时仍然松开按键"""
+        batch, segments = self.paths[index]
+        backend = self.backend
+        start = time.perf_counter()
+        all_sent = True
+        for offset, first, count in segments:
+            remaining = start + offset - time.perf_counter()
+            if remaining > 0 and wait_precise(remaining, stop_event, cpu_budget):
+                _, release_event, release_count = segments[-1]
+                backend.path_send(batch, release_event, release_count)
+                return False
+            if not backend.path_send(batch, first, count):
+                all_sent = False
+        return all_sent
+    
+    def matches(self, positions, button, backend):
+        """检查计划是否仍适用于给定的位置、按键、后端和当前屏幕分辨率"""
+        if button != self.button or backend is not self.backend:
+            return False
+        if len(positions) != len(self.points):
+            return False
+        for i, pos in enumerate(positions):
+            if position_xy(pos) != self.points[i]:
+                return False
+            if position_repeat(pos) != (self.repeats[i], self.gaps[i]):
+                return False
+            if position_action_path(pos) != self.actions[i]:
+                return False
+            if position_image_target(pos) != self.images[i]:
+                return False
+            if position_color_trigger(pos) != self.colors[i]:
+                return False
+            if position_wait_change(pos) != self.change_waits[i]:
+                return False
+        return backend.geometry_token() == self.geometry
+    
+    def blocking_indices(self):
+        """点击时需要等待的位置序号：点击图像、颜色触发、等待画面变化、长按/拖动和带间隔的连击"""
+        gaps = {index for index, (clicks, gap) in enumerate(zip(self.repeats, self.gaps))
+                if gap > 0 and clicks > 1}
+        return sorted(set(self.targets) | set(self.triggers) | set(self.watchers) | set(self.paths) | gaps)
+    
+    def geometry_changed(self):
+        """屏幕几何是否与编译时不同（后端读取缓存的显示器信息，最多每秒校验一次，开销很小）"""
+        return self.backend.geometry_token() != self.geometry
+    
+    def rebuild(self):
+        """按当前的屏幕几何重新编译同样的位置"""
+        return ClickPlan(self.positions, self.button, self.backend, self.capture)
+    
+    def __len__(self):
+        return len(self.points)
+    
+    def click(self, index, stop_event=None, cpu_budget=0.0):
+        """执行第index个位置的点击（含连击、长按和拖动），返回是否成功；
+        没找到图像或颜色没有出现时不点击，返回None。
+        设置了等待画面变化的位置，点击后等到区域变化（或超时）才返回。
+        cpu_budget为连击间隔和路径等待中允许自旋的比例（见wait_precise）。"""
+        watcher = self.watchers.get(index)
+        if watcher is None:
+            return self.click_position(index, stop_event, cpu_budget)
+        before = watcher.snapshot()
+        result = self.click_position(index, stop_event, cpu_budget)
+        if result is not None:
+            watcher.wait_change(before, stop_event)
+        return result
+    
+    def click_position(self, index, stop_event=None, cpu_budget=0.0):
+        if index in self.triggers:
+            if not self.triggers[index].wait(stop_event):
+                return None
+            return self.backend.click_batch(self.batch, index, 1)
+        if index in self.targets:
+            target = self.targets[index]
+            hit = target.locate() if target is not None else None
+            if hit is None:
+                return None
+            return self.backend.click_at(hit[0], hit[1], self.button)
+        if index in self.paths:
+            return self.run_path(index, stop_event, cpu_budget)
+        gap = self.gaps[index]
+        clicks = self.repeats[index]
+        if gap <= 0 or clicks == 1:
+            return self.backend.click_batch(self.batch, index, 1)
+        
+        all_sent = True
+        for step in range(clicks):
+            if step and wait_precise(gap, stop_event, cpu_budget):
+                break
+            if not self.backend.click_step(self.batch, index, step):
+                all_sent = False
+        return all_sent
+    
+    def get_cycle_chunks(self, chunk_size=0):
+        """按每批位置数切分整轮点击，返回 [(起始位置, 位置数), ...]"""
+        count = len(self.points)
+        if chunk_size <= 0 or chunk_size > count:
+            chunk_size = count
+        
+        chunks = self.cycle_chunks.get(chunk_size)
+        if chunks is None:
+            chunks = [(start, min(chunk_size, count - start)) for start in range(0, count, chunk_size)]
+            self.cycle_chunks[chunk_size] = chunks
+        return chunks
+    
+    def click_cycle(self, chunk_size=0, stop_event=None, cpu_budget=0.0):
+        """连发模式：一次（或分批）发送所有位置的点击事件，返回是否全部成功"""
+        all_sent = True
+        if self.has_gaps or self.paths or self.targets or self.triggers or self.watchers:
+            # 有连击间隔、长按/拖动、图像、颜色触发或等待画面变化的位置时只能逐个位置发送
+            for index in range(len(self.points)):
+                if self.click(index, stop_event, cpu_budget) is False:
+                    all_sent = False
+            return all_sent
+        for start, size in self.get_cycle_chunks(chunk_size):
+            if not self.backend.click_batch(self.batch, start, size):
+                all_sent = False
+        return all_sent
+
+# 错过截止时间后的追赶策略
+CATCH_UP_POLICIES = {
+    "skip": "跳过",   # 丢弃错过的点击，按原节拍继续
+    "burst": "补发",  # 立即补上错过的点击（有上限）
+    "shift": "顺延",  # 从当前时间重新计算节拍
+}
+
+# 高精度模式的自旋窗口上限（秒）：覆盖Windows默认约15.6毫秒的计时器精度
+SPIN_WINDOW_MAX = 0.02
+# 高精度模式允许的最小点击间隔（秒）
+MIN_PRECISION_INTERVAL = 0.0001
+
+class JitterStats:
+    """记录最近若干次唤醒相对截止时间的延迟，用于实时显示抖动"""
+    
+    def __init__(self, max_samples=1000):
+        self.samples = deque(maxlen=max_samples)
+    
+    def record(self, lateness):
+        self.samples.append(lateness)
+    
+    def clear(self):
+        self.samples.clear()
+    
+    def summary(self):
+        """返回 (p50, p99, 最大值)，单位秒；没有样本时返回None"""
+        values = sorted(self.samples)  # 复制后排序，点击线程可以继续写入
+        if not values:
+            return None
+        last = len(values) - 1
+        return (values[last // 2], values[min(last, int(len(values) * 0.99))], values[last])
+
+def set_timer_resolution(enable):
+    """在Windows上申请/释放1毫秒的系统计时器精度，缩短高精度模式的自旋时间"""
+    if sys.platform != "win32":
+        return
+    try:
+        if enable:
+            ctypes.windll.winmm.timeBeginPeriod(1)
+        else:
+            ctypes.windll.winmm.timeEndPeriod(1)
+    except Exception as e:
+        engine_log.debug("设置计时器精度失败: %s", e)
+
+class DeadlineScheduler:
+    """基于绝对截止时间的调度器
+    
+    截止时间由time.perf_counter()累加计算，不会因点击耗时而产生累计漂移；
+    等待使用threading.Event，停止时立即返回。
+    高精度模式下先睡眠到截止时间前的自旋窗口，再对perf_counter自旋等待，
+    自旋窗口为间隔乘以CPU预算（不超过SPIN_WINDOW_MAX）。
+    """
+    
+    def __init__(self, interval, policy="skip", stop_event=None, max_catch_up=10,
+                 precision=False, cpu_budget=0.5):
+        self.interval = interval
+        self.policy = policy
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.max_catch_up = max_catch_up  # 补发策略下单次最多补发的点击数
+        self.precision = precision        # 是否使用睡眠+自旋的高精度等待
+        self.cpu_budget = cpu_budget      # 每个间隔中允许自旋的比例（0-1）
+        self.next_deadline = None
+        self.missed = 0  # 累计错过的截止时间数
+        self.jitter = JitterStats()
+    
+    def start(self):
+        """从当前时间开始计时，第一次点击立即执行"""
+        self.next_deadline = time.perf_counter()
+        self.missed = 0
+        self.jitter.clear()
+    
+    def set_interval(self, interval):
+        """更新点击间隔，从下一个截止时间开始生效"""
+        self.interval = interval
+    
+    def resume_now(self):
+        """下一个截止时间改为现在（上一次点击已经等待过画面变化），不计为错过"""
+        self.next_deadline = time.perf_counter()
+    
+    def set_precision(self, precision, cpu_budget):
+        """切换高精度模式和CPU预算，从下一次等待开始生效"""
+        if precision != self.precision:
+            self.jitter.clear()
+        self.precision = precision
+        self.cpu_budget = min(1.0, max(0.0, cpu_budget))
+    
+    def spin_window(self):
+        """高精度模式下在截止时间前自旋的时长（秒）"""
+        return min(SPIN_WINDOW_MAX, self.interval * self.cpu_budget)
+    
+    def wait(self):
+        """等待到下一个截止时间，返回本次应执行的点击次数（0表示已停止）"""
+        if self.next_deadline is None:
+            self.start()
+        
+        deadline = self.next_deadline
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            if self.precision:
+                # 先睡眠到自旋窗口开始，再自旋到截止时间
+                sleep_time = remaining - self.spin_window()
+                if sleep_time > 0 and self.stop_event.wait(sleep_time):
+                    return 0
+                stop_event = self.stop_event
+                perf_counter = time.perf_counter
+                while perf_counter() < deadline:
+                    if stop_event.is_set():
+                        return 0
+            elif self.stop_event.wait(remaining):
+                return 0
+        if self.stop_event.is_set():
+            return 0
+        
+        now = time.perf_counter()
+        self.jitter.record(now - deadline)
+        interval = self.interval
+        # 已经过去的截止时间数（包括本次）
+        due = 1 + int((now - self.next_deadline) // interval) if interval > 0 else 1
+        self.missed += due - 1
+        
+        if self.policy == "shift":
+            self.next_deadline = now + interval
+            return 1
+        
+        self.next_deadline += due * interval
+        if self.policy == "burst":
+            return min(due, self.max_catch_up)
+        return 1
+
+class RateController:
+    """次/秒目标的闭环速率控制器
+    
+    每隔update_period秒用实际点击数计算实际速率，按实际/目标之比乘性调整
+    间隔缩放系数，使持续速率收敛到目标。缩放系数到达下限、或仍有错过的
+    截止时间且速率低于目标时视为饱和（后端无法更快）。
+    """
+    
+    MIN_SCALE = 0.05       # 间隔最多缩短到标称值的5%
+    MAX_SCALE = 2.0
+    GAIN = 0.5             # 每次调整使用误差比的平方根，避免振荡
+    SATURATION_ERROR = 0.02
+    
+    def __init__(self, target_cps, base_interval, update_period=0.25):
+        self.target_cps = target_cps
+        self.base_interval = base_interval  # 无误差时的标称间隔（秒）
+        self.update_period = update_period
+        self.scale = 1.0
+        self.actual_cps = 0.0
+        self.error = 0.0       # 相对误差：(实际-目标)/目标
+        self.saturated = False
+        self.last_time = None
+        self.last_clicks = 0
+        self.last_missed = 0
+    
+    def interval(self):
+        """当前应使用的调度间隔（秒）"""
+        return self.base_interval * self.scale
+    
+    def observe(self, now, clicks, missed):
+        """记录累计点击数，到达调整周期时返回新的间隔，否则返回None"""
+        if self.last_time is None:
+            self.last_time, self.last_clicks, self.last_missed = now, clicks, missed
+            return None
+        elapsed = now - self.last_time
+        if elapsed < self.update_period:
+            return None
+        
+        self.actual_cps = (clicks - self.last_clicks) / elapsed
+        self.error = self.actual_cps / self.target_cps - 1.0
+        missed_now = missed != self.last_missed
+        self.last_time, self.last_clicks, self.last_missed = now, clicks, missed
+        
+        if self.actual_cps > 0:
+            ratio = (self.actual_cps / self.target_cps) ** self.GAIN
+            self.scale = min(self.MAX_SCALE, max(self.MIN_SCALE, self.scale * ratio))
+        self.saturated = self.error < -self.SATURATION_ERROR and (
+            self.scale <= self.MIN_SCALE or missed_now)
+        return self.interval()
+
+# 点击前的鼠标移动方式
+MOTION_MODES = {
+    "teleport": "瞬移",             # 不单独移动，由点击事件中的绝对移动完成
+    "skip_if_there": "不在位置才移动",  # 先检查光标位置，已在目标位置则不移动
+    "animated": "动画移动",          # 按设定时长和步数平滑移动
+}
+
+class MotionEngine:
+    """点击前的鼠标移动策略"""
+    
+    def __init__(self, mode="teleport", duration=0.1, steps=10, backend=None, stop_event=None):
+        self.mode = mode
+        self.duration = duration  # 动画移动总时长（秒）
+        self.steps = steps        # 动画移动步数
+        self.backend = backend if backend is not None else NullBackend()
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+    
+    def move(self, x, y):
+        """按当前策略把鼠标移动到(x, y)"""
+        if self.mode == "teleport":
+            # 点击事件本身带有绝对移动，无需额外操作
+            return
+        
+        if self.mode == "skip_if_there":
+            if self.backend.cursor_position() != (x, y):
+                self.backend.move(x, y)
+            return
+        
+        # 动画移动：从当前位置线性插值到目标位置
+        start_x, start_y = self.backend.cursor_position()
+        steps = max(1, int(self.steps))
+        step_wait = max(0.0, self.duration) / steps
+        for i in range(1, steps + 1):
+            self.backend.move(start_x + (x - start_x) * i // steps,
+                                 start_y + (y - start_y) * i // steps)
+            if i < steps and step_wait > 0 and self.stop_event.wait(step_wait):
+                return
+
+class LogSink:
+    """状态日志汇聚器
+    
+    任意线程都可以调用post()，消息先进入有界环形缓冲区，再由主线程按固定频率
+    批量刷新到Text控件：只追加新行、只改写被合并的行。带相同合并键的消息
+    （例如同一位置的点击）会合并为一行"已点击 X ×N"。
+    """
+    
+    FOLD_WINDOW = 8  # 在最近多少条消息中查找可合并的消息
+    
+    def __init__(self, max_messages=20, flushes_per_second=10):
+        self.max_messages = max_messages
+        self.flush_interval_ms = max(1, int(1000 / flushes_per_second))
+        # 每条消息: [时间, 原始消息, 合并键, 次数, 合并摘要, 是否需要改写]
+        self.entries = deque(maxlen=max_messages)
+        self.new_count = 0   # 尚未显示的新消息数
+        self.displayed = 0   # Text控件中当前显示的行数
+        self.lock = threading.Lock()
+        self.root = None
+        self.text = None
+    
+    def post(self, message, key=None, summary=None):
+        """添加消息（线程安全），key相同的消息会合并为一行 summary ×N"""
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        with self.lock:
+            if key is not None:
+                # 在最近的消息中查找可合并的同类消息
+                for i in range(len(self.entries) - 1, max(-1, len(self.entries) - 1 - self.FOLD_WINDOW), -1):
+                    entry = self.entries[i]
+                    if entry[2] == key:
+                        entry[0] = timestamp
+                        entry[3] += 1
+                        entry[5] = True
+                        return
+            self.entries.append([timestamp, message, key, 1, summary, False])
+            self.new_count = min(self.new_count + 1, self.max_messages)
+    
+    @staticmethod
+    def format_entry(entry):
+        timestamp, message, key, count, summary, dirty = entry
+        if count > 1:
+            return f"[{timestamp}] {summary or message} ×{count}"
+        return f"[{timestamp}] {message}"
+    
+    def start(self, root, text):
+        """绑定Text控件并开始定时刷新（在主线程中调用）"""
+        self.root = root
+        self.text = text
+        self.root.after(self.flush_interval_ms, self.periodic_flush)
+    
+    def periodic_flush(self):
+        self.flush()
+        try:
+            self.root.after(self.flush_interval_ms, self.periodic_flush)
+        except tk.TclError:
+            pass  # 窗口已关闭
+    
+    def flush(self):
+        """把缓冲区中的变化刷新到Text控件（在主线程中调用）"""
+        with self.lock:
+            new_count = self.new_count
+            if not new_count and not any(entry[5] for entry in self.entries):
+                return
+            
+            entries = list(self.entries)
+            old_entries = entries[:len(entries) - new_count]
+            # 已显示的消息位于Text控件的最后几行
+            first_line = self.displayed - len(old_entries) + 1
+            rewrites = []
+            for i, entry in enumerate(old_entries):
+                if entry[5]:
+                    rewrites.append((first_line + i, self.format_entry(entry)))
+            new_lines = [self.format_entry(entry) for entry in entries[len(old_entries):]]
+            for entry in entries:
+                entry[5] = False
+            self.new_count = 0
+        
+        try:
+            text = self.text
+            text.config(state=tk.NORMAL)
+            
+            # 改写被合并的行
+            for line, content in rewrites:
+                if line >= 1:
+                    text.delete(f"{line}.0", f"{line}.end")
+                    text.insert(f"{line}.0", content)
+            
+            # 只追加新行
+            if new_lines:
+                text.insert(tk.END, "\n".join(new_lines) + "\n")
+                self.displayed += len(new_lines)
+            
+            # 删除超出数量的旧行
+            if self.displayed > self.max_messages:
+                excess = self.displayed - self.max_messages
+                text.delete("1.0", f"{excess + 1}.0")
+                self.displayed = self.max_messages
+            
+            # 自动滚动到底部
+            text.see(tk.END)
+            text.config(state=tk.DISABLED)
+        except Exception as e:
+            ui_log.warning("更新日志显示失败: %s", e)
+
+# 连点运行配置快照：开始连点时由界面生成，连点线程只读取快照，不再访问Tk控件。
+# 界面修改设置时生成新的快照整体替换，连点线程在下一次点击时生效。
+RunConfig = namedtuple('RunConfig', [
+    'interval',           # 点击间隔（秒）
+    'button',             # 'left'、'right' 或 'middle'
+    'positions',          # ((x, y), ...)
+    'names',              # 与positions对应的位置名称
+    'plan',               # 与positions和button对应的ClickPlan
+    'catch_up_policy',    # 追赶策略
+    'burst_mode',         # 是否连发模式
+    'burst_chunk_size',   # 连发模式每批位置数
+    'motion_mode',        # 移动方式
+    'motion_duration',    # 动画移动时长（秒）
+    'motion_steps',       # 动画移动步数
+    'precision_mode',     # 是否使用高精度等待（睡眠+自旋）
+    'cpu_budget',         # 高精度模式下的CPU预算（0-1）
+    'target_cps',         # 次/秒目标（0表示不使用闭环速率控制）
+])
+
+def wait_cpu_budget(config):
+    """连击间隔、长按/拖动等点击内部的等待允许自旋的比例：只有高精度模式按CPU预算自旋"""
+    return config.cpu_budget if config.precision_mode else 0.0
+
+# 动作脚本：一行一条指令，以 # 开头的行为注释
+#   click x y [left|right|middle] 在坐标处点击
+#   click 位置名                   点击位置列表中的同名位置（图像、颜色触发等位置照常生效）
+#   key 按键名                     按下并松开一个键（a、5、enter、esc、f5 ...）
+#   wait 时间                      等待，如 100、100ms、1.5s（不带单位为毫秒）
+#   repeat N ... end               重复N遍，可以嵌套
+#   label 名称 / goto 名称         标签和跳转
+#   if-pixel x y 颜色 [容差] goto 名称   该像素颜色匹配时跳转
+#   if-image 位置名 goto 名称      在“点击图像”位置的搜索区域找到模板时跳转
+# 脚本只解析一次，编译为扁平的指令列表 (操作码, a, b)：repeat展开为计数器和回跳，
+# 标签换成指令序号，点击预编译为ClickPlan，执行时不再解析文本或查字典。
+
+OP_CLICK = 0      # a=ClickPlan, b=位置序号
+OP_KEY = 1        # a=键码
+OP_WAIT = 2       # a=秒数
+OP_JUMP = 3       # a=目标指令序号
+OP_SET = 4        # a=计数器序号, b=次数
+OP_LOOP = 5       # a=计数器序号, b=循环体起点：计数器减1，仍大于0时跳回
+OP_IF_PIXEL = 6   # a=ColorTrigger, b=目标指令序号
+OP_IF_IMAGE = 7   # a=ImageTarget, b=目标指令序号
 
-# INPUT类型常量
-INPUT_MOUSE = 0
-INPUT_KEYBOARD = 1
-INPUT_HARDWARE = 2
+# 脚本中可用的按键名 -> 虚拟键码
+SCRIPT_KEY_CODES = {name: code for code, name in VK_KEY_NAMES.items()}
+SCRIPT_KEY_CODES.update({'return': 0x0D, 'escape': 0x1B, 'del': 0x2E, 'control': 0x11})
+SCRIPT_KEY_CODES.update({f'f{i}': 0x6F + i for i in range(1, 13)})
 
-# 版本信息
-VERSION = "1.0"
-VERSION_FILE = "version.txt"
+def script_key_code(name):
+    """脚本中的按键名 -> 键码，无法识别时返回None"""
+    code = SCRIPT_KEY_CODES.get(name.lower())
+    if code is not None:
+        return code
+    if len(name) == 1:
+        if name.isascii() and name.isalnum():
+            return ord(name.upper())
+        return ord(name) | KEY_CHAR_FLAG
+    return None
 
-# Windows API 常量
-WM_COMMAND = 0x0111
-WM_SYSCOMMAND = 0x0112
-SC_TOPMOST = 0xF012  # 自定义系统命令ID
+def parse_script_duration(text):
+    """'100' / '100ms' / '1.5s' -> 秒数"""
+    lower = text.lower()
+    try:
+        if lower.endswith('ms'):
+            value = float(lower[:-2]) / 1000.0
+        elif lower.endswith('s'):
+            value = float(lower[:-1])
+        else:
+            value = float(lower) / 1000.0
+    except ValueError:
+        value = -1
+    if not value >= 0:
+        raise ValueError(f"无法识别的时间: {text}")
+    return value
 
-def windows_api_click(x, y, button='left'):
-    """使用Windows API进行鼠标点击，绕过游戏保护"""
+def parse_script_int(text):
     try:
-        # 获取屏幕分辨率
-        screen_width = user32.GetSystemMetrics(0)
-        screen_height = user32.GetSystemMetrics(1)
-        
-        # 转换为绝对坐标 (0-65535范围)
-        abs_x = int(x * 65535 / screen_width)
-        abs_y = int(y * 65535 / screen_height)
-        
-        # 创建INPUT结构体数组
-        inputs = (INPUT * 3)()
-        
-        # 1. 移动鼠标到目标位置
-        inputs[0].type = INPUT_MOUSE
-        inputs[0].ii.mi.dx = abs_x
-        inputs[0].ii.mi.dy = abs_y
-        inputs[0].ii.mi.mouseData = 0
-        inputs[0].ii.mi.dwFlags = MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE
-        inputs[0].ii.mi.time = 0
-        inputs[0].ii.mi.dwExtraInfo = None
+        return int(text)
+    except ValueError:
+        raise ValueError(f"不是整数: {text}") from None
+
+SCRIPT_EXAMPLE = """# 示例：点击3遍，每遍之间等待0.5秒，然后按回车
+repeat 3
+click 100 200
+wait 500ms
+end
+key enter
+"""
+
+class ActionScript:
+    """编译后的动作脚本
+    
+    positions/button为“click 位置名”和“if-image 位置名”引用的位置列表和按键，
+    编译时按名称找到位置并预编译，之后修改位置列表不影响已编译的脚本。
+    语法错误抛出ValueError，信息中带有行号。
+    """
+    
+    def __init__(self, source, backend, positions=(), button='left', capture=None):
+        self.source = source
+        self.code = []        # [(操作码, a, b), ...]
+        self.counters = 0     # repeat计数器个数
+        self.clicks = 0       # 点击指令条数
+        
+        self.backend = backend
+        self.capture = capture
+        self.positions = list(positions)
+        self.button = button
+        self.names = {}
+        for index, pos in enumerate(self.positions):
+            self.names.setdefault(pos['name'] if isinstance(pos, dict) else f"位置{index+1}", index)
+        self.position_plan = None
+        self.coordinates = {button: [] for button in MOUSE_BUTTON_FLAGS}  # 坐标点击，编译结束后每种按键一个ClickPlan
+        self.image_targets = {}
+        
+        self.compile()
+    
+    def compile(self):
+        labels = {}
+        jumps = []      # (指令序号, 标签, 行号)：全部解析后再填入目标序号
+        repeats = []    # [(计数器序号, 循环体起点, 行号), ...]
+        code = self.code
+        
+        for line_no, line in enumerate(self.source.splitlines(), 1):
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+            command, args = words[0].lower(), words[1:]
+            try:
+                if command == 'label' and len(args) == 1:
+                    if args[0] in labels:
+                        raise ValueError(f"标签重复: {args[0]}")
+                    labels[args[0]] = len(code)
+                elif command == 'goto' and len(args) == 1:
+                    jumps.append((len(code), args[0], line_no))
+                    code.append((OP_JUMP, None, None))
+                elif command == 'click' and args:
+                    code.append(self.compile_click(args))
+                elif command == 'key' and len(args) == 1:
+                    key_code = script_key_code(args[0])
+                    if key_code is None:
+                        raise ValueError(f"无法识别的按键: {args[0]}")
+                    code.append((OP_KEY, key_code, None))
+                elif command == 'wait' and len(args) == 1:
+                    code.append((OP_WAIT, parse_script_duration(args[0]), None))
+                elif command == 'repeat' and len(args) == 1:
+                    count = parse_script_int(args[0])
+                    if count < 1:
+                        raise ValueError("repeat的次数至少为1")
+                    code.append((OP_SET, self.counters, count))
+                    repeats.append((self.counters, len(code), line_no))
+                    self.counters += 1
+                elif command == 'end' and not args:
+                    if not repeats:
+                        raise ValueError("end没有对应的repeat")
+                    counter, body, _ = repeats.pop()
+                    code.append((OP_LOOP, counter, body))
+                elif command in ('if-pixel', 'if-image') and len(args) >= 3 and args[-2].lower() == 'goto':
+                    jumps.append((len(code), args[-1], line_no))
+                    if command == 'if-pixel':
+                        code.append(self.compile_if_pixel(args[:-2]))
+                    else:
+                        code.append(self.compile_if_image(args[:-2]))
+                else:
+                    raise ValueError(f"无法识别的指令: {line.strip()}")
+            except ValueError as e:
+                raise ValueError(f"第{line_no}行: {e}") from None
+        
+        if repeats:
+            raise ValueError(f"第{repeats[-1][2]}行: repeat缺少end")
+        for index, label, line_no in jumps:
+            if label not in labels:
+                raise ValueError(f"第{line_no}行: 找不到标签 {label}")
+            op, a, _ = code[index]
+            if op == OP_JUMP:
+                code[index] = (OP_JUMP, labels[label], None)
+            else:
+                code[index] = (op, a, labels[label])
+        
+        # 坐标点击按按键各编译为一个ClickPlan，指令直接引用计划和序号
+        plans = {button: ClickPlan(points, button, self.backend, self.capture)
+                 for button, points in self.coordinates.items() if points}
+        for index, (op, a, b) in enumerate(code):
+            if op == OP_CLICK and isinstance(a, str):
+                code[index] = (OP_CLICK, plans[a], b)
+        self.code = tuple(code)
+    
+    def compile_click(self, args):
+        self.clicks += 1
+        if len(args) in (2, 3) and args[0].lstrip('-').isdigit():
+            button = args[2].lower() if len(args) == 3 else 'left'
+            if button not in self.coordinates:
+                raise ValueError(f"无法识别的按键: {args[2]}")
+            points = self.coordinates[button]
+            points.append((parse_script_int(args[0]), parse_script_int(args[1])))
+            return (OP_CLICK, button, len(points) - 1)
+        index = self.position_index(' '.join(args))
+        if self.position_plan is None:
+            self.position_plan = ClickPlan(self.positions, self.button, self.backend, self.capture)
+        return (OP_CLICK, self.position_plan, index)
+    
+    def compile_if_pixel(self, args):
+        if len(args) not in (3, 4):
+            raise ValueError("用法: if-pixel x y 颜色 [容差] goto 标签")
+        try:
+            color = parse_color(args[2])
+        except ValueError:
+            raise ValueError(f"无法识别的颜色: {args[2]}") from None
+        tolerance = parse_script_int(args[3]) if len(args) == 4 else COLOR_TOLERANCE
+        trigger = ColorTrigger(parse_script_int(args[0]), parse_script_int(args[1]), color, tolerance,
+                               capture=self.capture)
+        return (OP_IF_PIXEL, trigger, None)
+    
+    def compile_if_image(self, args):
+        name = ' '.join(args)
+        index = self.position_index(name)
+        pos = self.positions[index]
+        if position_image_target(pos) is None:
+            raise ValueError(f"'{name}' 不是点击图像位置")
+        if np is None:
+            raise ValueError("图像匹配需要numpy")
+        if index not in self.image_targets:
+            self.image_targets[index] = ImageTarget.from_position(pos, self.capture)
+        return (OP_IF_IMAGE, self.image_targets[index], None)
+    
+    def position_index(self, name):
+        if name not in self.names:
+            raise ValueError(f"找不到位置: {name}")
+        return self.names[name]
+    
+    def __len__(self):
+        return len(self.code)
+
+class ClickEngine:
+    """连点引擎：按配置快照在单独线程中执行点击，不依赖Tk
+    
+    界面通过回调接收日志、点击和错误通知：
+    on_log(message, key, summary)、on_click(points)、on_error(exception)、on_done()。
+    除按配置连点外，也可以按录制的时间回放宏（start_macro），或执行动作脚本（start_script）。
+    """
+    
+    def __init__(self, on_log=None, on_click=None, on_error=None, backend=None, on_done=None):
+        self.on_log = on_log
+        self.on_click = on_click
+        self.on_error = on_error
+        self.on_done = on_done     # 宏回放或动作脚本正常结束时的回调
+        self.config = None         # 当前配置快照，可在运行中整体替换
+        self.is_running = False
+        self.stop_event = threading.Event()  # 停止信号，调度等待时立即唤醒
+        self.motion = MotionEngine(backend=backend, stop_event=self.stop_event)  # 点击前的移动策略
+        self.scheduler = None
+        self.rate_controller = None  # 次/秒模式下的闭环速率控制器
+        self.thread = None
+        self.clicks = 0            # 本次运行已点击的位置数
+    
+    def start(self, config):
+        """使用配置快照启动点击线程"""
+        self.config = config
+        self.rate_controller = None
+        self.clicks = 0
+        self.is_running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def start_macro(self, macro, speed=1.0, loops=1, cpu_budget=0.0):
+        """在单独线程中按录制的时间回放宏，loops为0时循环到停止；
+        cpu_budget为等待事件时间时允许自旋的比例（见wait_precise）"""
+        self.scheduler = None
+        self.rate_controller = None
+        self.clicks = 0
+        self.is_running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_macro, args=(macro, speed, loops, cpu_budget), daemon=True)
+        self.thread.start()
+    
+    def run_macro(self, macro, speed=1.0, loops=1, cpu_budget=0.0):
+        """宏回放循环（在单独线程中运行）：每个事件在 开始时间+t/speed 时发送"""
+        backend = self.motion.backend
+        pressed_buttons = set()
+        pressed_keys = set()
+        loop = 0
+        try:
+            while self.is_running and (loops <= 0 or loop < loops):
+                start = time.perf_counter()
+                for t, kind, x, y, data in macro:
+                    remaining = start + t / speed - time.perf_counter()
+                    if remaining > 0 and wait_precise(remaining, self.stop_event, cpu_budget):
+                        break
+                    if not self.is_running:
+                        break
+                    
+                    if kind == MACRO_MOVE:
+                        backend.move(x, y)
+                    elif kind == MACRO_DOWN:
+                        button = MACRO_BUTTONS[data]
+                        backend.move(x, y)
+                        backend.press(button)
+                        pressed_buttons.add(button)
+                        self.clicks += 1
+                    elif kind == MACRO_UP:
+                        button = MACRO_BUTTONS[data]
+                        backend.move(x, y)
+                        backend.release(button)
+                        pressed_buttons.discard(button)
+                    elif kind == MACRO_SCROLL:
+                        backend.scroll(x, y)
+                    elif kind == MACRO_KEY_DOWN:
+                        backend.key_down(data)
+                        pressed_keys.add(data)
+                    elif kind == MACRO_KEY_UP:
+                        backend.key_up(data)
+                        pressed_keys.discard(data)
+                loop += 1
+                if self.is_running:
+                    self.log(f"宏回放完成第 {loop} 遍（{len(macro)}个事件）", key="macro_loop")
+        except Exception as e:
+            engine_log.exception("宏回放过程中发生错误: %s", e)
+            self.is_running = False
+            self.log(f"宏回放过程中发生错误: {e}")
+            if self.on_error:
+                self.on_error(e)
+            return
+        finally:
+            # 中途停止时松开仍按住的按键
+            for button in pressed_buttons:
+                backend.release(button)
+            for code in pressed_keys:
+                backend.key_up(code)
+        
+        if self.is_running:
+            self.is_running = False
+            if self.on_done:
+                self.on_done()
+    
+    def start_script(self, script, cpu_budget=0.0):
+        """在单独线程中执行编译好的动作脚本（ActionScript），cpu_budget见wait_precise"""
+        self.scheduler = None
+        self.rate_controller = None
+        self.clicks = 0
+        self.is_running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_script, args=(script, cpu_budget), daemon=True)
+        self.thread.start()
+    
+    def run_script(self, script, cpu_budget=0.0):
+        """动作脚本解释循环（在单独线程中运行）：按指令序号依次执行，跳转只改序号"""
+        backend = self.motion.backend
+        stop_event = self.stop_event
+        stopped = stop_event.is_set
+        code = script.code
+        end = len(code)
+        counters = [0] * script.counters
+        pc = 0
+        steps = 0
+        try:
+            while pc < end and not stopped():
+                op, a, b = code[pc]
+                pc += 1
+                steps += 1
+                if op == OP_CLICK:
+                    if a.click(b, stop_event, cpu_budget):
+                        self.clicks += 1
+                elif op == OP_WAIT:
+                    if wait_precise(a, stop_event, cpu_budget):
+                        break
+                elif op == OP_LOOP:
+                    counters[a] -= 1
+                    if counters[a] > 0:
+                        pc = b
+                elif op == OP_SET:
+                    counters[a] = b
+                elif op == OP_JUMP:
+                    pc = a
+                elif op == OP_KEY:
+                    backend.key_down(a)
+                    backend.key_up(a)
+                elif op == OP_IF_PIXEL:
+                    if a.matches(a.sample()):
+                        pc = b
+                elif op == OP_IF_IMAGE:
+                    if a.locate() is not None:
+                        pc = b
+        except Exception as e:
+            engine_log.exception("执行动作脚本时发生错误: %s", e)
+            self.is_running = False
+            self.log(f"执行动作脚本时发生错误: {e}")
+            if self.on_error:
+                self.on_error(e)
+            return
         
-        # 2. 按下鼠标按键
-        inputs[1].type = INPUT_MOUSE
-        inputs[1].ii.mi.dx = abs_x
-        inputs[1].ii.mi.dy = abs_y
-        inputs[1].ii.mi.mouseData = 0
-        if button == 'left':
-            inputs[1].ii.mi.dwFlags = MOUSEEVENTF_LEFTDOWN | MOUSEEVENTF_ABSOLUTE
-        else:
-            inputs[1].ii.mi.dwFlags = MOUSEEVENTF_RIGHTDOWN | MOUSEEVENTF_ABSOLUTE
-        inputs[1].ii.mi.time = 0
-        inputs[1].ii.mi.dwExtraInfo = None
+        if self.is_running:
+            self.log(f"动作脚本执行完成（{steps}条指令，点击{self.clicks}次）")
+            self.is_running = False
+            if self.on_done:
+                self.on_done()
+    
+    def stop(self):
+        """设置停止标志，点击线程在等待中立即唤醒并退出"""
+        self.is_running = False
+        self.stop_event.set()
+    
+    def update_config(self, config):
+        """发布新的配置快照，在下一次点击时生效"""
+        self.config = config
+    
+    def join(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+    
+    def log(self, message, key=None, summary=None):
+        if self.on_log:
+            self.on_log(message, key, summary)
+    
+    def run(self):
+        """点击循环（在单独线程中运行）"""
+        position_index = 0
+        reported_missed = 0
         
-        # 3. 释放鼠标按键
-        inputs[2].type = INPUT_MOUSE
-        inputs[2].ii.mi.dx = abs_x
-        inputs[2].ii.mi.dy = abs_y
-        inputs[2].ii.mi.mouseData = 0
-        if button == 'left':
-            inputs[2].ii.mi.dwFlags = MOUSEEVENTF_LEFTUP | MOUSEEVENTF_ABSOLUTE
-        else:
-            inputs[2].ii.mi.dwFlags = MOUSEEVENTF_RIGHTUP | MOUSEEVENTF_ABSOLUTE
-        inputs[2].ii.mi.time = 0
-        inputs[2].ii.mi.dwExtraInfo = None
+        config = None
+        scheduler = DeadlineScheduler(self.config.interval, self.config.catch_up_policy,
+                                      self.stop_event)
+        self.scheduler = scheduler
+        scheduler.start()
+        timer_resolution = False
         
-        # 发送输入事件
-        result = user32.SendInput(3, inputs, ctypes.sizeof(INPUT))
-        return result == 3  # 成功发送3个事件
+        while self.is_running:
+            try:
+                # 读取最新的配置快照（界面可能在连点过程中发布新的快照）
+                if config is not self.config:
+                    config = self.config
+                    scheduler.set_interval(config.interval)
+                    if config.target_cps > 0:
+                        controller = RateController(config.target_cps, config.interval)
+                        if self.rate_controller and self.rate_controller.target_cps == config.target_cps:
+                            controller.scale = self.rate_controller.scale  # 目标不变时保留已收敛的系数
+                        scheduler.set_interval(controller.interval())
+                        self.rate_controller = controller
+                    else:
+                        self.rate_controller = None
+                    scheduler.policy = config.catch_up_policy
+                    scheduler.set_precision(config.precision_mode, config.cpu_budget)
+                    if config.precision_mode != timer_resolution:
+                        timer_resolution = config.precision_mode
+                        set_timer_resolution(timer_resolution)
+                    self.motion.mode = config.motion_mode
+                    self.motion.duration = config.motion_duration
+                    self.motion.steps = config.motion_steps
+                
+                # 等待到下一个截止时间，停止时立即返回0
+                runs = scheduler.wait()
+                
+                # 报告错过的截止时间
+                if scheduler.missed != reported_missed:
+                    missed_msg = (f"错过 {scheduler.missed - reported_missed} 次点击时间"
+                                  f"（策略: {CATCH_UP_POLICIES[scheduler.policy]}）")
+                    reported_missed = scheduler.missed
+                    self.log(missed_msg)
+                
+                for _ in range(runs):
+                    # 在每次点击前检查停止标志
+                    if not self.is_running:
+                        break
+                    # 每轮开始时检查显示器配置，变化后按新的虚拟桌面重新编译点击计划
+                    if (position_index == 0 or config.burst_mode) and config.plan.geometry_changed():
+                        config = self.rebuild_plan(config)
+                    position_index = self.click_tick(config, position_index)
+                
+                # 次/秒模式：根据实际点击速率调整间隔
+                controller = self.rate_controller
+                if controller:
+                    interval = controller.observe(time.perf_counter(), self.clicks, scheduler.missed)
+                    if interval is not None:
+                        scheduler.set_interval(interval)
+                
+            except Exception as e:
+                engine_log.exception("点击过程中发生错误: %s", e)
+                # 发生错误时停止点击并记录日志
+                self.is_running = False
+                self.log(f"点击过程中发生错误: {e}")
+                if self.on_error:
+                    self.on_error(e)
+                break
         
-    except Exception as e:
-        print(f"Windows API点击失败: {e}")
-        return False
+        if timer_resolution:
+            set_timer_resolution(False)
+    
+    def rebuild_plan(self, config):
+        """显示器配置变化后重新编译点击计划，并作为新的配置快照发布"""
+        rebuilt = config._replace(plan=config.plan.rebuild())
+        if self.config is config:
+            self.config = rebuilt
+        self.log("显示器配置已变化，已重新编译点击计划")
+        return rebuilt
+    
+    def click_tick(self, config, position_index):
+        """按配置快照执行一次点击（连发模式下为一整轮），返回下一个位置索引"""
+        plan = config.plan
+        if not len(plan):
+            return 0
+        
+        if config.burst_mode:
+            # 连发模式：整轮位置一次发送
+            click_success = plan.click_cycle(config.burst_chunk_size, self.stop_event,
+                                             wait_cpu_budget(config))
+            if plan.watchers:
+                # 已经等过画面变化，下一轮立即开始
+                self.scheduler.resume_now()
+            if not click_success:
+                self.log(f"连发失败: {len(plan)}个位置, 方法: {plan.backend.name}", key="cycle",
+                         summary=f"连发失败: {len(plan)}个位置")
+                return position_index
+            self.clicks += plan.total_clicks
+            
+            if self.on_click:
+                self.on_click(config.positions)
+            
+            log_msg = f"已连发一轮: {len(plan)}个位置, 按键: {config.button}, 方法: {plan.backend.name}, 等待间隔: {config.interval}秒"
+            self.log(log_msg, key="cycle", summary=f"已连发一轮: {len(plan)}个位置")
+            
+            if engine_log.isEnabledFor(logging.DEBUG):
+                engine_log.debug("已连发一轮: %d个位置", len(plan))
+            return position_index
+        
+        position_index %= len(plan)
+        x, y = config.positions[position_index]
+        pos_name = config.names[position_index]
+        
+        # 按设定的移动方式移动鼠标（默认瞬移，由点击事件完成移动）
+        self.motion.move(x, y)
+        
+        # 在点击前最后一次检查停止标志
+        if not self.is_running:
+            return position_index
+        
+        # 执行点击 - 使用预编译的点击计划
+        click_success = plan.click(position_index, self.stop_event, wait_cpu_budget(config))
+        if position_index in plan.watchers:
+            # 等待画面变化代替固定间隔：变化（或超时）后立即点击下一个位置
+            self.scheduler.resume_now()
+        if click_success is None:
+            # 图像/颜色触发位置：这次没找到目标或颜色没有出现，不点击
+            self.log(f"条件未满足，跳过: {pos_name}", key=("click", position_index),
+                     summary=f"跳过 {pos_name}")
+            return (position_index + 1) % len(plan)
+        if not click_success:
+            self.log(f"点击失败: {pos_name} ({x}, {y}), 方法: {plan.backend.name}", key=("click", position_index),
+                     summary=f"点击失败 {pos_name}")
+            return (position_index + 1) % len(plan)
+        self.clicks += plan.repeats[position_index]
+        
+        if self.on_click:
+            self.on_click(((x, y),))
+        
+        # 添加日志 - 由日志汇聚器合并后在主线程中显示
+        log_msg = f"已点击位置: {pos_name} ({x}, {y}), 按键: {config.button}, 方法: {plan.backend.name}, 等待间隔: {config.interval}秒"
+        self.log(log_msg, key=("click", position_index), summary=f"已点击 {pos_name} ({x}, {y})")
+        
+        if engine_log.isEnabledFor(logging.DEBUG):
+            engine_log.debug("已点击位置: %s (%d, %d), 按键: %s", pos_name, x, y, config.button)
+        
+        # 切换到下一个位置（循环）
+        return (position_index + 1) % len(plan)
 
-def fallback_click(x, y, button='left'):
-    """备用点击方法，使用pyautogui"""
-    try:
-        if button == 'left':
-            pyautogui.leftClick(x, y)
+# 宏事件类型
+MACRO_MOVE = 0        # x, y 为光标位置
+MACRO_DOWN = 1        # x, y 为光标位置，data 为按键序号（MACRO_BUTTONS）
+MACRO_UP = 2
+MACRO_SCROLL = 3      # x, y 为水平/垂直滚动格数
+MACRO_KEY_DOWN = 4    # data 为键码
+MACRO_KEY_UP = 5
+
+MACRO_BUTTONS = ('left', 'right', 'middle')
+
+class MacroBuffer:
+    """录制的宏：每个字段一个紧凑数组，每个事件约21字节，不为每个事件创建对象
+    
+    times为相对录制开始的秒数（perf_counter精度）。
+    """
+    
+    def __init__(self):
+        self.times = array('d')
+        self.kinds = array('b')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.data = array('i')
+    
+    def append(self, t, kind, x=0, y=0, data=0):
+        self.times.append(t)
+        self.kinds.append(kind)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.data.append(data)
+    
+    def truncate(self, count):
+        """只保留前count个事件"""
+        for field in (self.times, self.kinds, self.xs, self.ys, self.data):
+            del field[count:]
+    
+    def __len__(self):
+        return len(self.times)
+    
+    def __iter__(self):
+        """依次产生 (t, 类型, x, y, data)"""
+        return zip(self.times, self.kinds, self.xs, self.ys, self.data)
+    
+    def duration(self):
+        return self.times[-1] if self.times else 0.0
+    
+    def nbytes(self):
+        return sum(field.itemsize * len(field) 
+                   for field in (self.times, self.kinds, self.xs, self.ys, self.data))
+
+def macro_key_code(key):
+    """把pynput的按键转换为宏中的键码，无法识别时返回None"""
+    vk = getattr(key, 'vk', None)
+    if vk is None and hasattr(key, 'value'):
+        vk = getattr(key.value, 'vk', None)
+    if vk is not None:
+        return vk
+    char = getattr(key, 'char', None)
+    if char:
+        return ord(char) | KEY_CHAR_FLAG
+    return None
+
+class MacroRecorder:
+    """用pynput监听器录制鼠标移动、点击、滚轮和按键，写入MacroBuffer
+    
+    监听器回调在各自的线程中执行，写入时加锁。Esc键不录制（用于停止录制）。
+    """
+    
+    def __init__(self):
+        self.buffer = MacroBuffer()
+        self.lock = threading.Lock()
+        self.start_time = None
+        self.mouse_listener = None
+        self.keyboard_listener = None
+        self.is_recording = False
+    
+    def start(self):
+        """开始新的录制"""
+        if mouse is None or keyboard is None:
+            raise RuntimeError("pynput不可用，无法录制宏")
+        self.buffer = MacroBuffer()
+        self.start_time = time.perf_counter()
+        self.is_recording = True
+        self.mouse_listener = mouse.Listener(on_move=self.on_move, on_click=self.on_click, 
+                                             on_scroll=self.on_scroll)
+        self.keyboard_listener = keyboard.Listener(on_press=self.on_press, on_release=self.on_release)
+        self.mouse_listener.start()
+        self.keyboard_listener.start()
+    
+    def stop(self, drop_last_click=False):
+        """停止录制并返回宏；drop_last_click为True时去掉最后一次点击（点击停止按钮产生的）"""
+        self.is_recording = False
+        for listener in (self.mouse_listener, self.keyboard_listener):
+            if listener:
+                listener.stop()
+        self.mouse_listener = self.keyboard_listener = None
+        
+        with self.lock:
+            buffer = self.buffer
+            if drop_last_click:
+                kinds = buffer.kinds
+                for index in range(len(kinds) - 1, -1, -1):
+                    if kinds[index] == MACRO_DOWN:
+                        buffer.truncate(index)
+                        break
+        return buffer
+    
+    def record(self, kind, x=0, y=0, data=0):
+        if not self.is_recording:
+            return
+        t = time.perf_counter() - self.start_time
+        with self.lock:
+            self.buffer.append(t, kind, x, y, data)
+    
+    def on_move(self, x, y):
+        self.record(MACRO_MOVE, int(x), int(y))
+    
+    def on_click(self, x, y, button, pressed):
+        name = getattr(button, 'name', 'left')
+        data = MACRO_BUTTONS.index(name) if name in MACRO_BUTTONS else 0
+        self.record(MACRO_DOWN if pressed else MACRO_UP, int(x), int(y), data)
+    
+    def on_scroll(self, x, y, dx, dy):
+        self.record(MACRO_SCROLL, int(dx), int(dy))
+    
+    def on_press(self, key):
+        if key == keyboard.Key.esc:
+            return
+        code = macro_key_code(key)
+        if code is not None:
+            self.record(MACRO_KEY_DOWN, data=code)
+    
+    def on_release(self, key):
+        if key == keyboard.Key.esc:
+            return
+        code = macro_key_code(key)
+        if code is not None:
+            self.record(MACRO_KEY_UP, data=code)
+
+# 二进制宏文件：文件头 + 定长记录 (t, 类型, x, y, data)，小端序
+MACRO_FILE_MAGIC = b"DDDMACRO"
+MACRO_FILE_VERSION = 1             # 定长记录
+MACRO_FILE_VERSION_PACKED = 2      # 压缩编码
+MACRO_FILE_EXT = ".ddm"
+MACRO_HEADER = struct.Struct("<8sHHIQ")   # 魔数, 版本, 记录长度, 保留, 事件数
+MACRO_RECORD = struct.Struct("<db3xiii")  # t(秒), 类型, 填充, x, y, data
+MACRO_PACKED_HEADER = struct.Struct("<Q")  # 压缩格式在文件头后追加：总时长（微秒）
+MACRO_WRITE_CHUNK = 65536                 # 每次写入的事件数
+
+# 压缩编码中指针事件（移动/按下/松开）的坐标相对上一个指针事件差分
+MACRO_POINTER_KINDS = (MACRO_MOVE, MACRO_DOWN, MACRO_UP)
+
+def write_varint(out, value):
+    """把非负整数按7位一组（低位在前）追加到bytearray"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def zigzag(value):
+    """有符号整数映射为非负整数：0,-1,1,-2... -> 0,1,2,3..."""
+    return (value << 1) if value >= 0 else ((-value) << 1) - 1
+
+def encode_macro_events(events):
+    """把 (t, 类型, x, y, data) 压缩编码，每积累一批产生一个bytearray
+    
+    每个事件：1字节头（低3位类型，第4位表示有data）+ 时间戳（微秒）的二阶差分
+    + 坐标（指针事件为相对上一指针事件的差分）+ 可选的data，整数均为zigzag变长编码。
+    录制的鼠标路径dt稳定、位移小，通常每个移动事件只需4字节（定长记录为24字节）。
+    """
+    out = bytearray()
+    last_t = last_dt = 0
+    last_x = last_y = 0
+    for t, kind, x, y, data in events:
+        t_us = int(round(t * 1e6))
+        dt = t_us - last_t
+        out.append(kind | (0x08 if data else 0))
+        write_varint(out, zigzag(dt - last_dt))
+        last_t, last_dt = t_us, dt
+        if kind in MACRO_POINTER_KINDS:
+            write_varint(out, zigzag(x - last_x))
+            write_varint(out, zigzag(y - last_y))
+            last_x, last_y = x, y
         else:
-            pyautogui.rightClick(x, y)
-        return True
-    except Exception as e:
-        print(f"备用点击失败: {e}")
-        return False
+            write_varint(out, zigzag(x))
+            write_varint(out, zigzag(y))
+        if data:
+            write_varint(out, zigzag(data))
+        if len(out) >= MACRO_RECORD.size * MACRO_WRITE_CHUNK:
+            yield out
+            out = bytearray()
+    if out:
+        yield out
 
-def enhanced_click(x, y, button='left'):
-    """增强的点击函数，优先使用Windows API，失败时使用备用方法"""
-    # 首先尝试Windows API
-    if windows_api_click(x, y, button):
-        return True
+def decode_macro_events(buffer, count):
+    """从压缩编码的缓冲区（bytes/memoryview/mmap）中逐条解码 (t, 类型, x, y, data)"""
+    pos = 0
+    t_us = dt = 0
+    last_x = last_y = 0
+    pointer_kinds = MACRO_POINTER_KINDS
+    for _ in range(count):
+        head = buffer[pos]
+        pos += 1
+        kind = head & 0x07
+        
+        # 依次读取二阶差分、x、y（和data）四个变长整数
+        values = []
+        for _ in range(4 if head & 0x08 else 3):
+            value = shift = 0
+            while True:
+                byte = buffer[pos]
+                pos += 1
+                value |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            values.append((value >> 1) ^ -(value & 1))
+        
+        dt += values[0]
+        t_us += dt
+        x, y = values[1], values[2]
+        if kind in pointer_kinds:
+            x += last_x
+            y += last_y
+            last_x, last_y = x, y
+        yield t_us / 1e6, kind, x, y, (values[3] if len(values) == 4 else 0)
+
+def save_macro_file(path, macro, packed=False):
+    """把宏（MacroBuffer、MacroFile或任意(t, 类型, x, y, data)序列）写入二进制宏文件
     
-    print("Windows API点击失败，使用备用方法...")
-    # 备用方法：pyautogui
-    return fallback_click(x, y, button)
+    packed为True时使用压缩编码（版本2），否则使用定长记录（版本1）。
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        if packed:
+            # 先占位，写完后回填事件数和总时长
+            f.write(MACRO_HEADER.pack(MACRO_FILE_MAGIC, MACRO_FILE_VERSION_PACKED, 0, 0, 0))
+            f.write(MACRO_PACKED_HEADER.pack(0))
+            end_time = [0.0]
+            
+            def counted(events):
+                nonlocal count
+                for event in events:
+                    count += 1
+                    end_time[0] = event[0]
+                    yield event
+            
+            for chunk in encode_macro_events(counted(macro)):
+                f.write(chunk)
+            f.seek(0)
+            f.write(MACRO_HEADER.pack(MACRO_FILE_MAGIC, MACRO_FILE_VERSION_PACKED, 0, 0, count))
+            f.write(MACRO_PACKED_HEADER.pack(int(round(end_time[0] * 1e6))))
+            return count
+        
+        f.write(MACRO_HEADER.pack(MACRO_FILE_MAGIC, MACRO_FILE_VERSION, MACRO_RECORD.size, 0, 0))
+        chunk = bytearray(MACRO_RECORD.size * MACRO_WRITE_CHUNK)
+        offset = 0
+        for event in macro:
+            MACRO_RECORD.pack_into(chunk, offset, *event)
+            offset += MACRO_RECORD.size
+            count += 1
+            if offset == len(chunk):
+                f.write(chunk)
+                offset = 0
+        f.write(memoryview(chunk)[:offset])
+        # 写完后再回填事件数
+        f.seek(0)
+        f.write(MACRO_HEADER.pack(MACRO_FILE_MAGIC, MACRO_FILE_VERSION, MACRO_RECORD.size, 0, count))
+    return count
+
+class MacroFile:
+    """以mmap只读打开的二进制宏文件
+    
+    迭代时直接从映射的内存中逐条解包（压缩格式逐条解码），不把文件读入内存，
+    数GB的宏也能立即开始回放，内存占用不随文件大小增长。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = None
+        try:
+            header = self.file.read(MACRO_HEADER.size)
+            if len(header) < MACRO_HEADER.size:
+                raise ValueError("宏文件不完整")
+            magic, version, record_size, _, count = MACRO_HEADER.unpack(header)
+            if magic != MACRO_FILE_MAGIC:
+                raise ValueError("不是点点点宏文件")
+            
+            size = os.fstat(self.file.fileno()).st_size
+            self.packed = version == MACRO_FILE_VERSION_PACKED
+            if self.packed:
+                extra = self.file.read(MACRO_PACKED_HEADER.size)
+                if len(extra) < MACRO_PACKED_HEADER.size:
+                    raise ValueError("宏文件不完整")
+                self.data_start = MACRO_HEADER.size + MACRO_PACKED_HEADER.size
+                self.data_end = size
+                self.count = count
+                self.end_time = MACRO_PACKED_HEADER.unpack(extra)[0] / 1e6
+            elif version == MACRO_FILE_VERSION and record_size == MACRO_RECORD.size:
+                # 事件数以文件实际长度为上限；写入中断的文件事件数仍为0，按文件长度读取已写入的部分
+                self.data_start = MACRO_HEADER.size
+                available = (size - MACRO_HEADER.size) // MACRO_RECORD.size
+                self.count = min(count, available) if count else available
+                self.data_end = self.data_start + self.count * MACRO_RECORD.size
+            else:
+                raise ValueError(f"不支持的宏文件版本: {version}")
+            
+            if self.count:
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        """依次产生 (t, 类型, x, y, data)"""
+        if not self.count:
+            return iter(())
+        data = memoryview(self.map)[self.data_start:self.data_end]
+        if self.packed:
+            return decode_macro_events(data, self.count)
+        return MACRO_RECORD.iter_unpack(data)
+    
+    def duration(self):
+        if not self.count:
+            return 0.0
+        if self.packed:
+            return self.end_time
+        return MACRO_RECORD.unpack_from(self.map, self.data_end - MACRO_RECORD.size)[0]
+    
+    def nbytes(self):
+        return self.data_end - self.data_start
+    
+    def close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # 仍有回放中的迭代器引用映射，由垃圾回收关闭
+        self.file.close()
+
+# 路径简化的默认参数
+SIMPLIFY_TOLERANCE = 1.0      # 允许偏离原路径的像素数（0表示不简化）
+SIMPLIFY_MAX_INTERVAL = 0.05  # 保留的相邻移动事件最多相隔的秒数
+
+def simplify_anchor_mask(kinds, times, max_interval):
+    """必须保留的事件：非移动事件、每段连续移动的首尾、停顿前后的点和每个时间片的第一个点
+    
+    返回与事件等长的布尔列表（或numpy数组）。
+    """
+    count = len(kinds)
+    if np is not None:
+        is_move = np.asarray(kinds) == MACRO_MOVE
+        t = np.asarray(times)
+        anchor = ~is_move
+        anchor[0] = anchor[-1] = True
+        # 连续移动的首尾（前一个或后一个事件不是移动）
+        anchor[1:] |= ~is_move[:-1]
+        anchor[:-1] |= ~is_move[1:]
+        if max_interval > 0:
+            gaps = np.diff(t) > max_interval
+            anchor[1:] |= gaps
+            anchor[:-1] |= gaps
+            buckets = np.floor(t / max_interval)
+            anchor[1:] |= buckets[1:] != buckets[:-1]
+        return anchor
+    
+    anchor = [kind != MACRO_MOVE for kind in kinds]
+    anchor[0] = anchor[-1] = True
+    for i in range(1, count):
+        if kinds[i - 1] != MACRO_MOVE or kinds[i] != MACRO_MOVE:
+            anchor[i - 1] = anchor[i] = True
+        elif max_interval > 0:
+            if times[i] - times[i - 1] > max_interval:
+                anchor[i - 1] = anchor[i] = True
+            elif math.floor(times[i] / max_interval) != math.floor(times[i - 1] / max_interval):
+                anchor[i] = True
+    return anchor
+
+def rdp_mask_numpy(xs, ys, anchor, tolerance):
+    """在相邻锚点之间按层并行执行Ramer–Douglas–Peucker，返回保留掩码
+    
+    每一层把所有待处理线段的内部点拼在一起一次计算到线段的距离，
+    用reduceat取各线段的最大值，超过容差的在最远点处分裂，直到没有线段需要分裂。
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    keep = np.array(anchor, dtype=bool)
+    anchors = np.flatnonzero(keep)
+    starts, ends = anchors[:-1], anchors[1:]
+    tolerance_sq = tolerance * tolerance
+    
+    while True:
+        lengths = ends - starts - 1
+        active = lengths > 0
+        starts, ends, lengths = starts[active], ends[active], lengths[active]
+        if not len(starts):
+            return keep
+        
+        # 所有线段的内部点下标和所属线段
+        bounds = np.cumsum(lengths) - lengths
+        segment = np.repeat(np.arange(len(starts)), lengths)
+        index = np.arange(lengths.sum()) - np.repeat(bounds, lengths) + np.repeat(starts + 1, lengths)
+        
+        x0, y0 = xs[starts][segment], ys[starts][segment]
+        dx, dy = xs[ends][segment] - x0, ys[ends][segment] - y0
+        px, py = xs[index] - x0, ys[index] - y0
+        length_sq = dx * dx + dy * dy
+        # 到线段距离的平方：投影参数限制在[0, 1]，路径折返时超出端点的部分按到端点的距离计算；
+        # 首尾重合时即到起点距离的平方
+        t = np.clip((px * dx + py * dy) / np.where(length_sq > 0, length_sq, 1.0), 0.0, 1.0)
+        ex, ey = px - t * dx, py - t * dy
+        score = ex * ex + ey * ey
+        
+        seg_max = np.maximum.reduceat(score, bounds)
+        split = seg_max > tolerance_sq
+        if not split.any():
+            return keep
+        
+        # 每个需要分裂的线段取第一个最远点
+        candidates = np.flatnonzero((score == seg_max[segment]) & split[segment])
+        _, first = np.unique(segment[candidates], return_index=True)
+        split_index = index[candidates[first]]
+        keep[split_index] = True
+        
+        starts, ends = (np.concatenate((starts[split], split_index)), 
+                        np.concatenate((split_index, ends[split])))
+
+def rdp_mask_python(xs, ys, anchor, tolerance):
+    """rdp_mask_numpy()的纯Python实现（没有numpy时使用）"""
+    keep = list(anchor)
+    anchors = [i for i, kept in enumerate(keep) if kept]
+    tolerance_sq = tolerance * tolerance
+    stack = [(a, b) for a, b in zip(anchors, anchors[1:]) if b - a > 1]
+    while stack:
+        start, end = stack.pop()
+        x0, y0 = xs[start], ys[start]
+        dx, dy = xs[end] - x0, ys[end] - y0
+        length_sq = dx * dx + dy * dy
+        best, best_index = -1.0, -1
+        for i in range(start + 1, end):
+            px, py = xs[i] - x0, ys[i] - y0
+            t = min(1.0, max(0.0, (px * dx + py * dy) / length_sq)) if length_sq else 0.0
+            ex, ey = px - t * dx, py - t * dy
+            score = ex * ex + ey * ey
+            if score > best:
+                best, best_index = score, i
+        if best > tolerance_sq:
+            keep[best_index] = True
+            if best_index - start > 1:
+                stack.append((start, best_index))
+            if end - best_index > 1:
+                stack.append((best_index, end))
+    return keep
+
+def simplify_macro(macro, tolerance=SIMPLIFY_TOLERANCE, max_interval=SIMPLIFY_MAX_INTERVAL):
+    """简化宏中的鼠标移动路径，返回新的MacroBuffer
+    
+    只删除连续移动中的点：按下、松开、滚轮和按键事件及其坐标原样保留；
+    保留的点使用原来的时间戳，停顿前后的点和每max_interval秒内的第一个点总是保留，
+    回放时的速度变化和停顿与录制时一致。
+    """
+    if isinstance(macro, MacroBuffer):
+        source = macro
+    else:
+        source = MacroBuffer()
+        for event in macro:
+            source.append(*event)
+    if len(source) < 3 or tolerance <= 0:
+        return source
+    
+    anchor = simplify_anchor_mask(source.kinds, source.times, max_interval)
+    if np is not None:
+        keep = rdp_mask_numpy(source.xs, source.ys, anchor, tolerance)
+        result = MacroBuffer()
+        for name in ('times', 'kinds', 'xs', 'ys', 'data'):
+            field = getattr(source, name)
+            kept = np.frombuffer(field, dtype=field.typecode)[keep]
+            getattr(result, name).frombytes(kept.tobytes())
+        return result
+    
+    keep = rdp_mask_python(source.xs, source.ys, anchor, tolerance)
+    result = MacroBuffer()
+    for event, kept in zip(source, keep):
+        if kept:
+            result.append(*event)
+    return result
+
+# 位置数达到该值时，预设中的位置列表以压缩编码保存
+PACK_POSITIONS_THRESHOLD = 1000
+
+def pack_positions(positions):
+    """把位置列表压缩为 {"count", "xy", "extra"}
+    
+    xy为坐标差分的zigzag变长编码（base64），名称为默认的"位置N"时不保存，
+    其余名称和连击、长按、拖动等字段按索引保存在extra中。
+    """
+    out = bytearray()
+    extra = {}
+    last_x = last_y = 0
+    for index, pos in enumerate(positions):
+        x, y = position_xy(pos)
+        write_varint(out, zigzag(x - last_x))
+        write_varint(out, zigzag(y - last_y))
+        last_x, last_y = x, y
+        if isinstance(pos, dict):
+            fields = {key: value for key, value in pos.items() if key not in ('x', 'y')}
+            if fields.get('name') == f"位置{index + 1}":
+                del fields['name']
+            if fields:
+                extra[str(index)] = fields
+    return {
+        "count": len(positions),
+        "xy": base64.b64encode(bytes(out)).decode('ascii'),
+        "extra": extra,
+    }
+
+def unpack_positions(packed):
+    """pack_positions()的逆过程，返回位置字典列表"""
+    count = packed["count"]
+    events = decode_varints(base64.b64decode(packed["xy"]), count * 2)
+    extra = packed.get("extra", {})
+    positions = []
+    x = y = 0
+    for index in range(count):
+        x += next(events)
+        y += next(events)
+        pos = {"name": f"位置{index + 1}", "x": x, "y": y}
+        pos.update(extra.get(str(index), {}))
+        positions.append(pos)
+    return positions
+
+def decode_varints(buffer, count):
+    """逐个解码count个zigzag变长整数"""
+    pos = 0
+    for _ in range(count):
+        value = shift = 0
+        while True:
+            byte = buffer[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        yield (value >> 1) ^ -(value & 1)
+
+def preset_positions(preset):
+    """取出预设中的位置列表（兼容压缩保存的位置）"""
+    if "positions_packed" in preset:
+        return unpack_positions(preset["positions_packed"])
+    return list(preset.get("positions", []))
+
+def preset_interval(preset):
+    """从预设的频率设置计算点击间隔（秒）"""
+    frequency = float(preset.get("frequency", 1.0))
+    unit = preset.get("frequency_unit", "秒/次")
+    if unit == "毫秒/次":
+        return frequency / 1000.0
+    if unit == "次/秒":
+        return 1.0 / frequency
+    return frequency
+
+def positions_to_macro(positions, interval, button='left'):
+    """把位置列表转换为宏：每隔interval秒访问一个位置（含连击、长按和拖动）"""
+    macro = MacroBuffer()
+    data = MACRO_BUTTONS.index(button) if button in MACRO_BUTTONS else 0
+    for index, pos in enumerate(positions):
+        t = index * interval
+        x, y = position_xy(pos)
+        action = position_action_path(pos)
+        if action:
+            points, step_interval, hold_time = action
+            macro.append(t, MACRO_MOVE, x, y)
+            macro.append(t, MACRO_DOWN, x, y, data)
+            for k, (px, py) in enumerate(points[1:], 1):
+                macro.append(t + k * step_interval, MACRO_MOVE, px, py)
+            end_x, end_y = points[-1]
+            macro.append(t + (len(points) - 1) * step_interval + hold_time, MACRO_UP, end_x, end_y, data)
+            continue
+        
+        clicks, gap = position_repeat(pos)
+        macro.append(t, MACRO_MOVE, x, y)
+        for k in range(clicks):
+            macro.append(t + k * gap, MACRO_DOWN, x, y, data)
+            macro.append(t + k * gap, MACRO_UP, x, y, data)
+    return macro
+
+def macro_to_positions(macro, hold_threshold=0.2):
+    """把宏中的每次按下-松开转换为一个位置，返回 (位置列表, 点击间隔秒数, 按键)
+    
+    按住期间有移动的转换为拖动（折线），按住超过hold_threshold秒的转换为长按，
+    其余为点击；点击间隔取相邻两次按下的时间间隔中位数。
+    """
+    positions = []
+    down_times = []
+    buttons = []
+    down = None
+    path = []
+    for t, kind, x, y, data in macro:
+        if kind == MACRO_DOWN and down is None:
+            down = (t, x, y)
+            path = []
+            down_times.append(t)
+            buttons.append(data)
+        elif kind == MACRO_MOVE and down is not None:
+            if [x, y] != (path[-1] if path else [down[1], down[2]]):
+                path.append([x, y])
+        elif kind == MACRO_UP and down is not None:
+            t0, x0, y0 = down
+            down = None
+            pos = {"name": f"宏位置{len(positions) + 1}", "x": x0, "y": y0}
+            if path:
+                pos.update(action="drag", path=path, duration_ms=int(round((t - t0) * 1000)))
+            elif t - t0 >= hold_threshold:
+                pos.update(action="hold", hold_ms=int(round((t - t0) * 1000)))
+            positions.append(pos)
+    
+    gaps = sorted(b - a for a, b in zip(down_times, down_times[1:]))
+    interval = gaps[len(gaps) // 2] if gaps else 1.0
+    button = MACRO_BUTTONS[max(set(buttons), key=buttons.count)] if buttons else 'left'
+    return positions, interval, button
+
+class ClickSequence:
+    """多序列引擎中的一个独立点击序列：自己的位置、间隔、启停状态和统计"""
+    
+    def __init__(self, name, plan, interval, positions=None):
+        self.name = name
+        self.plan = plan             # ClickPlan，可在运行中整体替换
+        self.interval = interval     # 点击间隔（秒）
+        self.positions = list(positions) if positions is not None else list(plan.points)
+        self.active = False
+        self.generation = 0          # 每次启停加1，堆中旧的条目随之失效
+        self.position_index = 0
+        self.clicks = 0
+        self.missed = 0
+        self.started_at = None
+        self.active_time = 0.0       # 之前各次运行的累计时长
+    
+    def running_time(self):
+        """累计运行时长（秒）"""
+        if self.active and self.started_at is not None:
+            return self.active_time + time.perf_counter() - self.started_at
+        return self.active_time
+    
+    def clicks_per_second(self):
+        elapsed = self.running_time()
+        return self.clicks / elapsed if elapsed > 0 else 0.0
+    
+    def to_dict(self):
+        """序列化为预设中保存的格式"""
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "button": self.plan.button,
+            "positions": self.positions,
+        }
+
+class MultiSequenceEngine:
+    """多序列引擎：一个调度线程按截止时间小顶堆驱动任意数量的序列
+    
+    堆中条目为 (截止时间, 序号, 代数, 序列)。启停序列时只修改代数，
+    旧条目在弹出时被丢弃，不需要在堆中查找删除。
+    所有序列共用一个线程，点击时需要等待的位置（见ClickPlan.blocking_indices）
+    会卡住其他序列，不能加入序列。
+    """
+    
+    def __init__(self, on_log=None, on_error=None):
+        self.on_log = on_log
+        self.on_error = on_error
+        self.sequences = []
+        self.heap = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()  # 关闭时打断点击中的等待
+        self.running = False
+        self.thread = None
+    
+    def log(self, message):
+        if self.on_log:
+            self.on_log(message)
+    
+    def check_plan(self, plan):
+        """检查计划能否作为序列运行，有需要等待的位置时抛出ValueError"""
+        blocking = plan.blocking_indices()
+        if blocking:
+            raise ValueError(f"第{blocking[0] + 1}个位置点击时需要等待（点击图像、颜色触发、等待画面变化、"
+                             f"长按/拖动或带间隔的连击），多序列中不能使用")
+    
+    def add_sequence(self, sequence):
+        self.check_plan(sequence.plan)
+        with self.lock:
+            self.sequences.append(sequence)
+        return sequence
+    
+    def remove_sequence(self, sequence):
+        self.stop_sequence(sequence)
+        with self.lock:
+            if sequence in self.sequences:
+                self.sequences.remove(sequence)
+    
+    def start_sequence(self, sequence):
+        """启动序列，第一次点击立即执行"""
+        with self.lock:
+            if sequence.active:
+                return
+            sequence.active = True
+            sequence.generation += 1
+            sequence.started_at = time.perf_counter()
+            heapq.heappush(self.heap, (sequence.started_at, next(self.counter), 
+                                       sequence.generation, sequence))
+        self.ensure_thread()
+        self.wakeup.set()
+        self.log(f"序列已启动: {sequence.name}")
+    
+    def stop_sequence(self, sequence):
+        with self.lock:
+            if not sequence.active:
+                return
+            sequence.active = False
+            sequence.generation += 1
+            sequence.active_time += time.perf_counter() - sequence.started_at
+            sequence.started_at = None
+        self.wakeup.set()
+        self.log(f"序列已停止: {sequence.name}")
+    
+    def stop_all(self):
+        for sequence in list(self.sequences):
+            self.stop_sequence(sequence)
+    
+    def active_count(self):
+        return sum(1 for sequence in self.sequences if sequence.active)
+    
+    def ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.running = True
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+    
+    def shutdown(self):
+        self.stop_all()
+        self.running = False
+        self.stop_event.set()
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(1.0)
+    
+    def run(self):
+        """调度循环（在单独线程中运行）"""
+        heap = self.heap
+        while self.running:
+            with self.lock:
+                # 丢弃已失效的条目
+                while heap and heap[0][2] != heap[0][3].generation:
+                    heapq.heappop(heap)
+                timeout = heap[0][0] - time.perf_counter() if heap else None
+            
+            if timeout is None or timeout > 0:
+                # 等待到最近的截止时间；启停序列时被唤醒重新计算
+                self.wakeup.wait(timeout)
+                self.wakeup.clear()
+                continue
+            
+            with self.lock:
+                deadline, _, generation, sequence = heapq.heappop(heap)
+                if generation != sequence.generation:
+                    continue
+            
+            try:
+                plan = sequence.plan
+                if len(plan):
+                    index = sequence.position_index % len(plan)
+                    if index == 0 and plan.geometry_changed():
+                        # 显示器配置变化：按新的虚拟桌面重新编译
+                        sequence.plan = plan = plan.rebuild()
+                    if plan.click(index, self.stop_event):
+                        # 没找到图像或点击失败时不计数
+                        sequence.clicks += plan.repeats[index]
+                    sequence.position_index = index + 1
+            except Exception as e:
+                engine_log.exception("序列 %s 点击失败: %s", sequence.name, e)
+                self.log(f"序列 {sequence.name} 点击失败: {e}")
+                self.stop_sequence(sequence)
+                if self.on_error:
+                    self.on_error(e)
+                continue
+            
+            # 计算下一个截止时间，错过的截止时间直接跳过（保持节拍）
+            interval = sequence.interval
+            next_deadline = deadline + interval
+            now = time.perf_counter()
+            if next_deadline <= now and interval > 0:
+                skipped = int((now - next_deadline) // interval) + 1
+                sequence.missed += skipped
+                next_deadline += skipped * interval
+            
+            with self.lock:
+                if generation == sequence.generation:
+                    heapq.heappush(heap, (next_deadline, next(self.counter), generation, sequence))
 
 class AutoClicker:
     def __init__(self):
@@ -176,7 +3662,31 @@ class AutoClicker:
         
         # 初始化变量
         self.is_clicking = False
-        self.click_thread = None
+        self.click_plan = None  # 预编译的点击计划
+        self.poll_snapshot = None  # 颜色轮询统计的上一次快照 (时间, 轮询次数, 截取耗时)
+        
+        # 输入后端：启动时按设置探测一次，之后点击不再逐次判断和回退
+        self.input_backend_name = self.load_input_backend_setting()
+        self.input_backend = create_input_backend(self.input_backend_name)
+        
+        # 多序列引擎（所有序列共用一个调度线程）
+        self.sequence_engine = MultiSequenceEngine(on_log=self.add_log)
+        self.sequence_window = None
+        
+        # 动作脚本（随预设保存）
+        self.script_text = ""
+        self.script_window = None
+        
+        # 连点引擎（在单独线程中运行，只读取配置快照）
+        self.engine = ClickEngine(on_log=self.add_log, 
+                                  on_click=self.on_engine_click, 
+                                  on_error=self.on_engine_error,
+                                  backend=self.input_backend,
+                                  on_done=self.on_engine_done)
+        
+        # 宏录制（录制结果可通过连点引擎回放）
+        self.macro_recorder = MacroRecorder()
+        self.macro = None
         self.positions = []
         self.current_preset = None
         self.presets_file = "presets.json"
@@ -256,7 +3766,7 @@ class AutoClicker:
                 self.click_icon = None
                 
         except Exception as e:
-            print(f"加载图标失败: {e}")
+            ui_log.warning("加载图标失败: %s", e)
             self.click_icon = None
 
     def toggle_topmost(self):
@@ -280,7 +3790,7 @@ class AutoClicker:
             self.add_log(f"窗口置顶已{status} (Ctrl+T)")
             
         except Exception as e:
-            print(f"切换置顶状态失败: {e}")
+            ui_log.warning("切换置顶状态失败: %s", e)
             self.add_log(f"置顶设置失败: {e}")
     
     def save_topmost_setting(self, is_topmost):
@@ -305,7 +3815,7 @@ class AutoClicker:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
                 
         except Exception as e:
-            print(f"保存置顶设置失败: {e}")
+            presets_log.warning("保存置顶设置失败: %s", e)
     
     def load_topmost_setting(self):
         """加载置顶设置"""
@@ -325,10 +3835,71 @@ class AutoClicker:
                     self.add_log("窗口置顶已开启")
                     
         except Exception as e:
-            print(f"加载置顶设置失败: {e}")
+            presets_log.warning("加载置顶设置失败: %s", e)
             # 默认不置顶
             self.is_topmost = False
     
+    def load_input_backend_setting(self):
+        """加载输入后端设置（auto/sendinput/pyautogui/null）"""
+        try:
+            if os.path.exists(SETTINGS_FILE):
+                with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+                name = settings.get('input_backend', 'auto')
+                if name in INPUT_BACKENDS:
+                    return name
+        except Exception as e:
+            presets_log.warning("加载输入后端设置失败: %s", e)
+        return 'auto'
+    
+    def load_macro_simplify_setting(self):
+        """加载录制宏的路径简化设置，返回 (容差像素, 最大间隔秒数)，容差为0时不简化"""
+        try:
+            if os.path.exists(SETTINGS_FILE):
+                with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                    settings = json.load(f).get('macro_simplify', {})
+                return (max(0.0, float(settings.get('tolerance_px', SIMPLIFY_TOLERANCE))), 
+                        max(0.0, float(settings.get('max_interval_ms', SIMPLIFY_MAX_INTERVAL * 1000))) / 1000.0)
+        except Exception as e:
+            presets_log.warning("加载路径简化设置失败: %s", e)
+        return SIMPLIFY_TOLERANCE, SIMPLIFY_MAX_INTERVAL
+    
+    def save_input_backend_setting(self, name):
+        """保存输入后端设置到文件"""
+        try:
+            settings = {}
+            if os.path.exists(SETTINGS_FILE):
+                try:
+                    with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                        settings = json.load(f)
+                except:
+                    settings = {}
+            
+            settings['input_backend'] = name
+            
+            with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            presets_log.warning("保存输入后端设置失败: %s", e)
+    
+    def change_input_backend(self, event=None):
+        """切换输入后端"""
+        label = self.input_backend_var.get()
+        name = next((key for key, value in INPUT_BACKENDS.items() if value == label), 'auto')
+        if name == self.input_backend_name:
+            return
+        
+        self.input_backend_name = name
+        self.input_backend = create_input_backend(name)
+        self.engine.motion.backend = self.input_backend
+        self.save_input_backend_setting(name)
+        self.backend_status_label.config(text=f"当前: {self.input_backend.name}")
+        self.add_log(f"输入方式: {INPUT_BACKENDS[name]}（使用 {self.input_backend.name}）")
+        
+        # 点击计划与后端绑定，连点中切换时重新编译
+        self.on_run_config_changed()
+        self.rebuild_sequence_plans()
+    
     def setup_style(self):
         """设置灰色简洁主题界面样式"""
         style = ttk.Style()
@@ -404,6 +3975,12 @@ class AutoClicker:
                        foreground=text_black,
                        focuscolor="none")
         
+        # 复选框样式
+        style.configure("TCheckbutton",
+                       background=bg_light,
+                       foreground=text_black,
+                       focuscolor="none")
+        
         # 列表框和文本框样式
         self.listbox_style = {
             'bg': bg_white,
@@ -438,7 +4015,7 @@ class AutoClicker:
             self.update_window_title()
             
         except Exception as e:
-            print(f"设置系统功能失败: {e}")
+            ui_log.warning("设置系统功能失败: %s", e)
     
     def update_window_title(self):
         """更新窗口标题，显示置顶状态"""
@@ -537,7 +4114,7 @@ class AutoClicker:
         # 单位选择
         self.freq_unit = tk.StringVar(value="秒/次")
         unit_combo = ttk.Combobox(freq_input_frame, textvariable=self.freq_unit, 
-                                values=["秒/次", "毫秒/次"], width=8, state="readonly")
+                                values=["秒/次", "毫秒/次", "次/秒"], width=8, state="readonly")
         unit_combo.pack(side=tk.LEFT, padx=(2, 0))
         unit_combo.bind("<<ComboboxSelected>>", self.update_frequency_unit)
         
@@ -553,9 +4130,96 @@ class AutoClicker:
         ttk.Label(button_frame, text="鼠标按键:").pack(side=tk.LEFT)
         self.mouse_button = tk.StringVar(value="left")
         ttk.Radiobutton(button_frame, text="左键", variable=self.mouse_button, 
-                       value="left").pack(side=tk.LEFT, padx=(10, 5))
+                       value="left", command=self.on_run_config_changed).pack(side=tk.LEFT, padx=(10, 5))
         ttk.Radiobutton(button_frame, text="右键", variable=self.mouse_button, 
-                       value="right").pack(side=tk.LEFT)
+                       value="right", command=self.on_run_config_changed).pack(side=tk.LEFT)
+        
+        # 输入方式（后端）
+        backend_frame = ttk.Frame(settings_frame)
+        backend_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(backend_frame, text="输入方式:").pack(side=tk.LEFT)
+        self.input_backend_var = tk.StringVar(value=INPUT_BACKENDS[self.input_backend_name])
+        backend_combo = ttk.Combobox(backend_frame, textvariable=self.input_backend_var, 
+                                    values=list(INPUT_BACKENDS.values()), width=14, 
+                                    state="readonly")
+        backend_combo.pack(side=tk.LEFT, padx=(10, 5))
+        backend_combo.bind("<<ComboboxSelected>>", self.change_input_backend)
+        self.backend_status_label = ttk.Label(backend_frame, text=f"当前: {self.input_backend.name}", 
+                                             font=("微软雅黑", 8), foreground="gray")
+        self.backend_status_label.pack(side=tk.LEFT)
+        
+        # 追赶策略：点击耗时超过间隔、错过截止时间时的处理方式
+        policy_frame = ttk.Frame(settings_frame)
+        policy_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(policy_frame, text="追赶策略:").pack(side=tk.LEFT)
+        self.catch_up_policy = tk.StringVar(value=CATCH_UP_POLICIES["skip"])
+        policy_combo = ttk.Combobox(policy_frame, textvariable=self.catch_up_policy, 
+                                   values=list(CATCH_UP_POLICIES.values()), width=8, 
+                                   state="readonly")
+        policy_combo.pack(side=tk.LEFT, padx=(10, 5))
+        policy_combo.bind("<<ComboboxSelected>>", self.on_run_config_changed)
+        ttk.Label(policy_frame, text="跳过=保持节拍 补发=补上错过的点击 顺延=重新计时", 
+                 font=("微软雅黑", 8), foreground="gray").pack(side=tk.LEFT)
+        
+        # 移动方式
+        motion_frame = ttk.Frame(settings_frame)
+        motion_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(motion_frame, text="移动方式:").pack(side=tk.LEFT)
+        self.motion_mode = tk.StringVar(value=MOTION_MODES["teleport"])
+        motion_combo = ttk.Combobox(motion_frame, textvariable=self.motion_mode, 
+                                   values=list(MOTION_MODES.values()), width=14, 
+                                   state="readonly")
+        motion_combo.pack(side=tk.LEFT, padx=(10, 5))
+        motion_combo.bind("<<ComboboxSelected>>", self.on_run_config_changed)
+        
+        self.motion_steps_entry = ttk.Entry(motion_frame, width=4)
+        self.motion_steps_entry.pack(side=tk.RIGHT)
+        self.motion_steps_entry.insert(0, "10")
+        self.motion_steps_entry.bind('<Return>', self.on_run_config_changed)
+        self.motion_steps_entry.bind('<FocusOut>', self.on_run_config_changed)
+        ttk.Label(motion_frame, text="步数:").pack(side=tk.RIGHT, padx=(5, 2))
+        
+        self.motion_duration_entry = ttk.Entry(motion_frame, width=5)
+        self.motion_duration_entry.pack(side=tk.RIGHT)
+        self.motion_duration_entry.insert(0, "100")
+        self.motion_duration_entry.bind('<Return>', self.on_run_config_changed)
+        self.motion_duration_entry.bind('<FocusOut>', self.on_run_config_changed)
+        ttk.Label(motion_frame, text="动画时长(毫秒):").pack(side=tk.RIGHT, padx=(0, 2))
+        
+        # 连发模式：每次把所有位置的点击一次性发送
+        burst_frame = ttk.Frame(settings_frame)
+        burst_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.burst_mode = tk.BooleanVar(value=False)
+        ttk.Checkbutton(burst_frame, text="连发模式（每次点击整轮位置）", 
+                       variable=self.burst_mode, 
+                       command=self.on_run_config_changed).pack(side=tk.LEFT)
+        
+        self.burst_chunk_entry = ttk.Entry(burst_frame, width=6)
+        self.burst_chunk_entry.pack(side=tk.RIGHT)
+        self.burst_chunk_entry.insert(0, "0")
+        self.burst_chunk_entry.bind('<Return>', self.on_run_config_changed)
+        self.burst_chunk_entry.bind('<FocusOut>', self.on_run_config_changed)
+        ttk.Label(burst_frame, text="每批位置数(0=全部):").pack(side=tk.RIGHT, padx=(0, 2))
+        
+        # 高精度模式：睡眠到截止时间前再自旋等待，毫秒模式可输入0.1起的小数
+        precision_frame = ttk.Frame(settings_frame)
+        precision_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.precision_mode = tk.BooleanVar(value=False)
+        ttk.Checkbutton(precision_frame, text="高精度模式（可低至0.1毫秒）", 
+                       variable=self.precision_mode, 
+                       command=self.on_precision_mode_changed).pack(side=tk.LEFT)
+        
+        self.cpu_budget_entry = ttk.Entry(precision_frame, width=4)
+        self.cpu_budget_entry.pack(side=tk.RIGHT)
+        self.cpu_budget_entry.insert(0, "50")
+        self.cpu_budget_entry.bind('<Return>', self.on_run_config_changed)
+        self.cpu_budget_entry.bind('<FocusOut>', self.on_run_config_changed)
+        ttk.Label(precision_frame, text="CPU预算(%):").pack(side=tk.RIGHT, padx=(0, 2))
     
     def create_position_management(self, parent):
         """创建位置管理区域"""
@@ -598,6 +4262,30 @@ class AutoClicker:
         self.delete_pos_btn.grid(row=0, column=2, sticky="ew", padx=(2, 0))
         self.delete_pos_btn.config(command=self.delete_selected_position_btn)
         
+        self.repeat_pos_btn = ttk.Button(btn_frame, text="🔁 连击设置（每次点击数/间隔）")
+        self.repeat_pos_btn.grid(row=1, column=0, columnspan=2, sticky="ew", padx=(0, 2), pady=(5, 0))
+        self.repeat_pos_btn.config(command=self.set_selected_position_repeat)
+        
+        self.action_pos_btn = ttk.Button(btn_frame, text="✋ 长按/拖动")
+        self.action_pos_btn.grid(row=1, column=2, sticky="ew", padx=(2, 0), pady=(5, 0))
+        self.action_pos_btn.config(command=self.set_selected_position_action)
+        
+        self.image_pos_btn = ttk.Button(btn_frame, text="🖼 记录图像位置（按图像定位点击）")
+        self.image_pos_btn.grid(row=2, column=0, columnspan=2, sticky="ew", padx=(0, 2), pady=(5, 0))
+        self.image_pos_btn.config(command=self.record_image_position)
+        
+        self.alt_image_btn = ttk.Button(btn_frame, text="➕ 备选图像")
+        self.alt_image_btn.grid(row=2, column=2, sticky="ew", padx=(2, 0), pady=(5, 0))
+        self.alt_image_btn.config(command=self.add_alternative_template)
+        
+        self.color_pos_btn = ttk.Button(btn_frame, text="🎨 记录颜色触发位置（颜色出现时点击）")
+        self.color_pos_btn.grid(row=3, column=0, columnspan=2, sticky="ew", padx=(0, 2), pady=(5, 0))
+        self.color_pos_btn.config(command=self.record_color_position)
+        
+        self.wait_change_btn = ttk.Button(btn_frame, text="⚡ 等待画面变化")
+        self.wait_change_btn.grid(row=3, column=2, sticky="ew", padx=(2, 0), pady=(5, 0))
+        self.wait_change_btn.config(command=self.set_selected_position_wait_change)
+        
         # 位置列表
         list_frame = ttk.Frame(pos_frame)
         list_frame.pack(fill=tk.BOTH, expand=True)
@@ -669,6 +4357,30 @@ class AutoClicker:
                                  state=tk.DISABLED)
         self.stop_btn.grid(row=0, column=1, sticky="ew", padx=(5, 0))
         self.stop_btn.config(command=self.stop_clicking)
+        
+        self.sequence_btn = ttk.Button(control_frame, text="🧩 多序列管理")
+        self.sequence_btn.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.sequence_btn.config(command=self.open_sequence_window)
+        
+        self.record_macro_btn = ttk.Button(control_frame, text="⏺ 录制宏")
+        self.record_macro_btn.grid(row=2, column=0, sticky="ew", padx=(0, 5), pady=(5, 0))
+        self.record_macro_btn.config(command=self.toggle_macro_recording)
+        
+        self.play_macro_btn = ttk.Button(control_frame, text="▶ 回放宏", state=tk.DISABLED)
+        self.play_macro_btn.grid(row=2, column=1, sticky="ew", padx=(5, 0), pady=(5, 0))
+        self.play_macro_btn.config(command=self.play_macro)
+        
+        self.save_macro_btn = ttk.Button(control_frame, text="💾 保存宏", state=tk.DISABLED)
+        self.save_macro_btn.grid(row=3, column=0, sticky="ew", padx=(0, 5), pady=(5, 0))
+        self.save_macro_btn.config(command=self.save_macro)
+        
+        self.open_macro_btn = ttk.Button(control_frame, text="📂 打开宏")
+        self.open_macro_btn.grid(row=3, column=1, sticky="ew", padx=(5, 0), pady=(5, 0))
+        self.open_macro_btn.config(command=self.open_macro)
+        
+        self.script_btn = ttk.Button(control_frame, text="📜 动作脚本")
+        self.script_btn.grid(row=4, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.script_btn.config(command=self.open_script_window)
     
     def create_test_area(self, parent):
         """创建连点测试区域"""
@@ -707,9 +4419,15 @@ class AutoClicker:
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.config(command=self.log_text.yview)
         
-        # 日志消息列表，最多保留20条
-        self.log_messages = []
-        self.max_log_messages = 20
+        # 日志汇聚器，最多保留20条，每秒最多刷新10次
+        self.log_sink = LogSink(max_messages=20, flushes_per_second=10)
+        self.log_sink.start(self.root, self.log_text)
+        
+        # 实时计时统计（连点时每0.5秒刷新）
+        self.timing_label = ttk.Label(status_frame, text="", 
+                                     font=("微软雅黑", 8), foreground="gray")
+        self.timing_label.pack(anchor=tk.W, pady=(5, 0))
+        self.update_timing_status()
         
         # 使用说明
         help_text = "💡 使用提示：双击位置列表删除 | 可重命名位置方便识别 | Alt+R记录位置 | Esc停止连点"
@@ -723,6 +4441,59 @@ class AutoClicker:
         # 强制更新界面以确保显示
         self.root.update_idletasks()
 
+    def update_timing_status(self):
+        """刷新实时计时统计：唤醒抖动的p50/p99/最大值"""
+        try:
+            scheduler = self.engine.scheduler
+            if self.is_clicking and scheduler:
+                jitter = scheduler.jitter.summary()
+                mode = "高精度" if scheduler.precision else "普通"
+                if jitter:
+                    p50, p99, worst = (value * 1e6 for value in jitter)
+                    text = f"⏱ {mode}计时 抖动 p50 {p50:.0f}µs | p99 {p99:.0f}µs | 最大 {worst:.0f}µs"
+                else:
+                    text = f"⏱ {mode}计时 等待数据..."
+                if scheduler.missed:
+                    text += f" | 错过 {scheduler.missed}"
+                controller = self.engine.rate_controller
+                if controller:
+                    text += (f"\n🎯 目标 {controller.target_cps:g} 次/秒 | 实际 {controller.actual_cps:.1f} | "
+                             f"误差 {controller.error * 100:+.1f}%")
+                    if controller.saturated:
+                        text += " | ⚠ 已饱和（后端无法更快）"
+                text += self.poll_status_text()
+                self.timing_label.config(text=text)
+        except Exception as e:
+            ui_log.debug("刷新计时统计失败: %s", e)
+        self.root.after(500, self.update_timing_status)
+    
+    def poll_status_text(self):
+        """颜色触发的轮询统计（每秒轮询次数、平均每次截取耗时）和画面响应时间"""
+        plan = self.click_plan
+        text = ""
+        watchers = plan.watchers.values() if plan is not None else ()
+        waits = sum(watcher.waits for watcher in watchers)
+        if waits:
+            timeouts = sum(watcher.timeouts for watcher in watchers)
+            reacted = waits - timeouts
+            average = sum(watcher.reaction_time for watcher in watchers) / reacted * 1000 if reacted else 0.0
+            text = f"\n⚡ 画面响应 平均 {average:.0f}ms | 超时 {timeouts}/{waits}"
+        
+        triggers = plan.triggers.values() if plan is not None else ()
+        if not triggers:
+            self.poll_snapshot = None
+            return text
+        now = time.perf_counter()
+        polls = sum(trigger.polls for trigger in triggers)
+        capture_time = sum(trigger.capture_time for trigger in triggers)
+        previous, self.poll_snapshot = self.poll_snapshot, (now, polls, capture_time)
+        if previous is None or now <= previous[0]:
+            return text + "\n🎨 颜色轮询 等待数据..."
+        count = polls - previous[1]
+        rate = count / (now - previous[0])
+        cost = (capture_time - previous[2]) / count * 1e6 if count else 0.0
+        return text + f"\n🎨 颜色轮询 {rate:.0f} 次/秒 | 截取 {cost:.0f}µs/次"
+    
     def check_status_display(self):
         """检查状态显示区域是否正常"""
         try:
@@ -731,47 +4502,14 @@ class AutoClicker:
                 # 添加一条测试日志来验证显示
                 self.add_log("状态信息区域已就绪")
         except Exception as e:
-            print(f"状态显示检查失败: {e}")
-
-    def add_log(self, message):
-        """添加日志消息"""
-        try:
-            import datetime
-            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-            log_entry = f"[{timestamp}] {message}"
-            
-            # 添加到消息列表
-            self.log_messages.append(log_entry)
-            
-            # 如果超过最大数量，删除最早的消息
-            if len(self.log_messages) > self.max_log_messages:
-                self.log_messages.pop(0)
-            
-            # 更新文本框显示
-            self.update_log_display()
-            
-        except Exception as e:
-            print(f"添加日志失败: {e}")
-    
-    def update_log_display(self):
-        """更新日志显示"""
-        try:
-            if not hasattr(self, 'log_text') or not self.log_text:
-                return
-                
-            self.log_text.config(state=tk.NORMAL)
-            self.log_text.delete(1.0, tk.END)
-            
-            # 显示所有日志消息
-            for message in self.log_messages:
-                self.log_text.insert(tk.END, message + "\n")
-            
-            # 自动滚动到底部
-            self.log_text.see(tk.END)
-            self.log_text.config(state=tk.DISABLED)
-            
+            ui_log.warning("状态显示检查失败: %s", e)
+
+    def add_log(self, message, key=None, summary=None):
+        """添加日志消息（可在任意线程中调用），key相同的消息会合并显示"""
+        try:
+            self.log_sink.post(message, key, summary)
         except Exception as e:
-            print(f"更新日志显示失败: {e}")
+            ui_log.warning("添加日志失败: %s", e)
 
     def update_frequency_from_scale(self, value):
         """从滑块更新频率"""
@@ -783,10 +4521,16 @@ class AutoClicker:
             freq_ms = int(freq * 100)  # 0.1-10.0 -> 10-1000
             self.frequency_entry.delete(0, tk.END)
             self.frequency_entry.insert(0, str(freq_ms))
+        elif unit == "次/秒":
+            # 次/秒模式：0.1-10.0 -> 1-100次/秒
+            self.frequency_entry.delete(0, tk.END)
+            self.frequency_entry.insert(0, str(max(1, int(round(freq * 10)))))
         else:
             # 秒模式：直接使用滑块值
             self.frequency_entry.delete(0, tk.END)
             self.frequency_entry.insert(0, f"{freq:.1f}")
+        
+        self.on_run_config_changed()
     
     def update_frequency_from_entry(self, event=None):
         """从输入框更新频率"""
@@ -801,6 +4545,26 @@ class AutoClicker:
                     messagebox.showwarning("警告", "秒/次模式下频率必须在0.1-10.0之间！")
                     self.frequency_entry.delete(0, tk.END)
                     self.frequency_entry.insert(0, f"{self.frequency_var.get():.1f}")
+            elif unit == "次/秒":
+                # 高精度模式可达10000次/秒（0.1毫秒间隔）
+                max_cps = 1 / MIN_PRECISION_INTERVAL if self.precision_mode.get() else 1000
+                if 0.1 <= freq <= max_cps:
+                    self.frequency_var.set(min(10.0, max(0.1, freq / 10.0)))
+                    self.frequency_entry.delete(0, tk.END)
+                    self.frequency_entry.insert(0, f"{freq:g}")
+                else:
+                    messagebox.showwarning("警告", f"次/秒模式下频率必须在0.1-{max_cps:g}之间！")
+                    self.frequency_entry.delete(0, tk.END)
+                    self.frequency_entry.insert(0, "10")
+            elif self.precision_mode.get():  # 毫秒/次，高精度模式接受小数
+                if MIN_PRECISION_INTERVAL * 1000 <= freq <= 1000:
+                    self.frequency_var.set(max(0.1, freq / 100.0))
+                    self.frequency_entry.delete(0, tk.END)
+                    self.frequency_entry.insert(0, f"{freq:g}")
+                else:
+                    messagebox.showwarning("警告", "高精度模式下毫秒/次必须在0.1-1000之间！")
+                    self.frequency_entry.delete(0, tk.END)
+                    self.frequency_entry.insert(0, "100")
             else:  # 毫秒/次
                 freq_int = int(freq)
                 if 1 <= freq_int <= 1000:
@@ -818,9 +4582,18 @@ class AutoClicker:
             if self.freq_unit.get() == "秒/次":
                 self.frequency_entry.delete(0, tk.END)
                 self.frequency_entry.insert(0, f"{self.frequency_var.get():.1f}")
+            elif self.freq_unit.get() == "次/秒":
+                self.frequency_entry.delete(0, tk.END)
+                self.frequency_entry.insert(0, "10")
             else:
                 self.frequency_entry.delete(0, tk.END)
                 self.frequency_entry.insert(0, "100")
+        
+        self.on_run_config_changed()
+    
+    def on_precision_mode_changed(self):
+        """切换高精度模式：重新校验频率（关闭时小数毫秒取整）"""
+        self.update_frequency_from_entry()
     
     def update_frequency_unit(self, event=None):
         """更新频率单位"""
@@ -830,11 +4603,18 @@ class AutoClicker:
             self.frequency_entry.delete(0, tk.END)
             self.frequency_entry.insert(0, "100")
             self.frequency_var.set(1.0)  # 对应100毫秒
+        elif unit == "次/秒":
+            # 切换到次/秒模式（闭环控制实际速率）
+            self.frequency_entry.delete(0, tk.END)
+            self.frequency_entry.insert(0, "10")
+            self.frequency_var.set(1.0)  # 对应10次/秒
         else:
             # 切换到秒模式
             self.frequency_entry.delete(0, tk.END)
             self.frequency_entry.insert(0, "1.0")
             self.frequency_var.set(1.0)
+        
+        self.on_run_config_changed()
     
     def get_click_interval(self):
         """获取点击间隔（秒）"""
@@ -845,12 +4625,72 @@ class AutoClicker:
             if unit == "秒/次":
                 # 每X秒点击一次
                 return freq_value
+            elif unit == "次/秒":
+                # 每秒点击X次
+                return 1.0 / freq_value
             else:  # 毫秒/次
                 # 每X毫秒点击一次
                 return freq_value / 1000.0
         except:
             return 1.0  # 默认1秒间隔
     
+    def get_target_cps(self):
+        """获取次/秒目标（不是次/秒模式时返回0）"""
+        if self.freq_unit.get() != "次/秒":
+            return 0.0
+        try:
+            return max(0.0, float(self.frequency_entry.get()))
+        except:
+            return 0.0
+    
+    def get_catch_up_policy(self):
+        """获取追赶策略（skip/burst/shift）"""
+        label = self.catch_up_policy.get()
+        for policy, policy_label in CATCH_UP_POLICIES.items():
+            if policy_label == label:
+                return policy
+        return "skip"
+    
+    def get_motion_mode(self):
+        """获取移动方式（teleport/skip_if_there/animated）"""
+        label = self.motion_mode.get()
+        for mode, mode_label in MOTION_MODES.items():
+            if mode_label == label:
+                return mode
+        return "teleport"
+    
+    def get_motion_duration_ms(self):
+        """获取动画移动时长（毫秒）"""
+        try:
+            return max(0, int(self.motion_duration_entry.get()))
+        except:
+            return 100
+    
+    def get_motion_steps(self):
+        """获取动画移动步数"""
+        try:
+            return max(1, int(self.motion_steps_entry.get()))
+        except:
+            return 10
+    
+    def get_cpu_budget(self):
+        """获取高精度模式的CPU预算（0.01-1.0）"""
+        try:
+            return min(100.0, max(1.0, float(self.cpu_budget_entry.get()))) / 100.0
+        except:
+            return 0.5
+    
+    def get_wait_cpu_budget(self):
+        """宏回放和动作脚本等待时允许自旋的比例：高精度模式为CPU预算，普通模式为0（只睡眠）"""
+        return self.get_cpu_budget() if self.precision_mode.get() else 0.0
+    
+    def get_burst_chunk_size(self):
+        """获取连发模式每批发送的位置数（0表示一次发送全部）"""
+        try:
+            return max(0, int(self.burst_chunk_entry.get()))
+        except:
+            return 0
+    
     def start_hotkey_listener(self):
         """启动快捷键监听"""
         try:
@@ -868,7 +4708,7 @@ class AutoClicker:
             if hotkey_map:
                 self.hotkey_listener = keyboard.GlobalHotKeys(hotkey_map)
                 self.hotkey_listener.start()
-                print(f"快捷键监听已启动: 记录位置({self.current_hotkey})")
+                hotkeys_log.info("快捷键监听已启动: 记录位置(%s)", self.current_hotkey)
             
             # 单独启动Esc键监听
             self.start_esc_listener()
@@ -877,7 +4717,7 @@ class AutoClicker:
             self.add_log(f"快捷键已启动: 记录位置({self.current_hotkey}), 停止连点(Esc)")
                 
         except Exception as e:
-            print(f"快捷键监听启动失败: {e}")
+            hotkeys_log.error("快捷键监听启动失败: %s", e)
             self.add_log(f"快捷键启动失败: {e}")
     
     def start_esc_listener(self):
@@ -888,11 +4728,17 @@ class AutoClicker:
             
             def on_press(key):
                 try:
+                    if key == keyboard.Key.esc and self.macro_recorder.is_recording:
+                        self.root.after(0, self.stop_macro_recording)
+                    if key == keyboard.Key.esc and self.sequence_engine.active_count():
+                        self.sequence_engine.stop_all()
+                        self.add_log("检测到Esc键，停止所有序列")
                     if key == keyboard.Key.esc and self.is_clicking:
-                        print("检测到Esc键，停止连点")
+                        hotkeys_log.info("检测到Esc键，停止连点")
                         self.add_log("检测到Esc键，停止连点")
                         # 立即设置停止标志，防止额外点击
                         self.is_clicking = False
+                        self.engine.stop()
                         # 在主线程中执行停止操作和窗口置顶
                         self.root.after(0, self.stop_clicking_and_focus)
                 except:
@@ -900,16 +4746,16 @@ class AutoClicker:
             
             self.esc_listener = keyboard.Listener(on_press=on_press)
             self.esc_listener.start()
-            print("Esc键监听已启动")
+            hotkeys_log.info("Esc键监听已启动")
             
         except Exception as e:
-            print(f"Esc键监听启动失败: {e}")
+            hotkeys_log.error("Esc键监听启动失败: %s", e)
             self.add_log(f"Esc键监听启动失败: {e}")
     
     def hotkey_stop_clicking(self):
         """快捷键触发停止连点"""
         if self.is_clicking:
-            print("快捷键触发停止连点")
+            hotkeys_log.info("快捷键触发停止连点")
             self.root.after(0, self.stop_clicking)
     
     def hotkey_start_stop_clicking(self):
@@ -944,7 +4790,7 @@ class AutoClicker:
                 elif hotkey_str == 'Esc':
                     return '<esc>'
                 else:
-                    print(f"无法转换单个按键: {hotkey_str}")
+                    hotkeys_log.warning("无法转换单个按键: %s", hotkey_str)
                     return None
             
             parts = hotkey_str.split('+')
@@ -970,15 +4816,15 @@ class AutoClicker:
                 elif len(part) == 1 and (part.isalpha() or part.isdigit()):
                     converted_parts.append(part.lower())
                 else:
-                    print(f"无法转换的按键部分: {part}")
+                    hotkeys_log.warning("无法转换的按键部分: %s", part)
                     return None
             
             result = '+'.join(converted_parts)
-            print(f"快捷键转换: {hotkey_str} -> {result}")
+            hotkeys_log.debug("快捷键转换: %s -> %s", hotkey_str, result)
             return result
             
         except Exception as e:
-            print(f"快捷键格式转换失败: {e}")
+            hotkeys_log.warning("快捷键格式转换失败: %s", e)
             return None
     
     def convert_hotkey_format(self, hotkey_str):
@@ -1042,7 +4888,7 @@ class AutoClicker:
             return '+'.join(converted_parts)
             
         except Exception as e:
-            print(f"快捷键格式转换失败: {e}")
+            hotkeys_log.warning("快捷键格式转换失败: %s", e)
             return None
     
     def hotkey_record_position(self):
@@ -1125,7 +4971,7 @@ class AutoClicker:
             )
             self.key_listener.start()
         except Exception as e:
-            print(f"键盘监听启动失败: {e}")
+            hotkeys_log.error("键盘监听启动失败: %s", e)
     
     def capture_hotkey(self):
         """开始或取消捕获快捷键"""
@@ -1161,7 +5007,7 @@ class AutoClicker:
                     # 实时更新按钮显示
                     self.update_capture_display()
             except Exception as e:
-                print(f"按键处理错误: {e}")
+                hotkeys_log.warning("按键处理错误: %s", e)
     
     def on_key_release(self, key):
         """键盘释放事件"""
@@ -1193,7 +5039,7 @@ class AutoClicker:
                     self.update_capture_display()
                     
             except Exception as e:
-                print(f"快捷键应用错误: {e}")
+                hotkeys_log.warning("快捷键应用错误: %s", e)
     
     def update_capture_display(self):
         """更新捕获过程中的显示"""
@@ -1473,23 +5319,19 @@ class AutoClicker:
                 elif char.isdigit():
                     return char
                 else:
-                    print(f"不支持的字符键: '{char}' (ASCII: {ord(char)})")
+                    hotkeys_log.debug("不支持的字符键: '%s' (ASCII: %d)", char, ord(char))
                     return "无效按键"
                 
             # 调试信息 - 帮助识别未知按键
-            print(f"未识别的按键: {key}")
-            print(f"  类型: {type(key)}")
-            if hasattr(key, 'name'):
-                print(f"  名称: {key.name}")
-            if hasattr(key, 'char'):
-                print(f"  字符: {key.char} (ASCII: {ord(key.char) if key.char else 'None'})")
-            if hasattr(key, 'vk'):
-                print(f"  VK码: {key.vk}")
+            if hotkeys_log.isEnabledFor(logging.DEBUG):
+                hotkeys_log.debug("未识别的按键: %s, 类型: %s, 名称: %s, 字符: %s, VK码: %s",
+                                  key, type(key), getattr(key, 'name', None),
+                                  getattr(key, 'char', None), getattr(key, 'vk', None))
             
             # 其他按键返回"无效按键"标记
             return "无效按键"
         except Exception as e:
-            print(f"get_key_name异常: {e}")
+            hotkeys_log.warning("get_key_name异常: %s", e)
             return "无效按键"
     
     def format_hotkey(self, keys):
@@ -1570,7 +5412,11 @@ class AutoClicker:
     def record_position(self):
         """记录当前鼠标位置"""
         # 获取当前鼠标位置
-        x, y = pyautogui.position()
+        cursor = read_cursor_position()
+        if cursor is None:
+            messagebox.showerror("错误", "无法读取鼠标位置！")
+            return
+        x, y = cursor
         
         # 询问用户给位置命名
         name = simpledialog.askstring("位置命名", f"请为位置 ({x}, {y}) 命名:", 
@@ -1585,9 +5431,201 @@ class AutoClicker:
             # 更新界面显示
             self.update_position_list()
             
-            # 添加日志
-            self.add_log(f"已记录位置: {name} ({x}, {y}) - 共 {len(self.positions)} 个位置")
-            print(f"记录位置: {name} ({x}, {y}), 总位置数: {len(self.positions)}")  # 调试信息
+            # 添加日志（多显示器时注明位置所在的显示器）
+            where = ""
+            display = getattr(self.input_backend, 'display', None)
+            if display is not None and len(display.monitors) > 1:
+                index, monitor = display.monitor_at(x, y)
+                if monitor is not None:
+                    where = f" [显示器{index + 1}, 缩放{monitor.scale * 100:.0f}%]"
+            self.add_log(f"已记录位置: {name} ({x}, {y}){where} - 共 {len(self.positions)} 个位置")
+            ui_log.debug("记录位置: %s (%d, %d), 总位置数: %d", name, x, y, len(self.positions))
+    
+    def capture_template_later(self, callback):
+        """倒计时后以鼠标位置为中心截取模板，再调用callback(模板, x, y)"""
+        if np is None:
+            messagebox.showerror("错误", "点击图像需要安装numpy！")
+            return
+        capture = default_screen_capture()
+        if capture is None:
+            messagebox.showerror("错误", "当前环境无法截取屏幕！")
+            return
+        
+        def grab():
+            cursor = read_cursor_position()
+            if cursor is None:
+                messagebox.showerror("错误", "无法读取鼠标位置！")
+                return
+            x, y = cursor
+            left, top = x - TEMPLATE_SIZE // 2, y - TEMPLATE_SIZE // 2
+            pixels = capture.grab(left, top, TEMPLATE_SIZE, TEMPLATE_SIZE)
+            if pixels is None:
+                messagebox.showerror("错误", "截取模板失败，请把鼠标移到离屏幕边缘远一些的位置！")
+                return
+            callback(ImageTemplate.from_bgra(pixels, TEMPLATE_SIZE, TEMPLATE_SIZE), x, y)
+        
+        # 点击按钮时鼠标在本程序窗口上，留出时间移到目标图像上
+        self.add_log(f"请在{IMAGE_CAPTURE_DELAY_MS / 1000:g}秒内把鼠标移到目标图像的中心...")
+        self.root.after(IMAGE_CAPTURE_DELAY_MS, grab)
+    
+    def record_image_position(self):
+        """截取鼠标处的模板，记录为“点击图像”位置"""
+        self.capture_template_later(self.add_image_position)
+    
+    def add_image_position(self, template, x, y):
+        """设置搜索区域和名称，添加“点击图像”位置"""
+        # 默认搜索区域：以模板为中心，限制在虚拟桌面内
+        region_width, region_height = TEMPLATE_REGION_SIZE
+        display = getattr(self.input_backend, 'display', None)
+        if display is not None:
+            v_left, v_top, v_width, v_height = display.rect()
+            region_width, region_height = min(region_width, v_width), min(region_height, v_height)
+            region_left = min(max(x - region_width // 2, v_left), v_left + v_width - region_width)
+            region_top = min(max(y - region_height // 2, v_top), v_top + v_height - region_height)
+        else:
+            region_left, region_top = max(0, x - region_width // 2), max(0, y - region_height // 2)
+        
+        text = simpledialog.askstring("点击图像", "搜索区域 左,上,宽,高（区域越小定位越快）:",
+                                      initialvalue=f"{region_left},{region_top},{region_width},{region_height}")
+        if text is None:
+            return
+        try:
+            region = [int(v) for v in text.split(',')]
+            if len(region) != 4 or region[2] < TEMPLATE_SIZE or region[3] < TEMPLATE_SIZE:
+                raise ValueError(text)
+        except ValueError:
+            messagebox.showerror("错误", f"区域格式应为 左,上,宽,高，且宽高不小于{TEMPLATE_SIZE}！")
+            return
+        
+        name = simpledialog.askstring("位置命名", f"请为图像位置 ({x}, {y}) 命名:",
+                                      initialvalue=f"图像{len(self.positions)+1}")
+        if not name:
+            return
+        
+        self.positions.append({
+            "name": name, "x": x, "y": y,
+            "action": "image",
+            "template": template.to_dict(),
+            "region": region,
+            "threshold": TEMPLATE_THRESHOLD,
+        })
+        self.update_position_list()
+        self.add_log(f"已记录图像位置: {name} ({x}, {y}), 搜索区域 {region[2]}×{region[3]}"
+                     f" - 共 {len(self.positions)} 个位置")
+    
+    def record_color_position(self):
+        """倒计时后记录鼠标处的坐标和颜色，添加颜色触发位置"""
+        capture = default_screen_capture()
+        if capture is None:
+            messagebox.showerror("错误", "当前环境无法截取屏幕！")
+            return
+        self.add_log(f"请在{IMAGE_CAPTURE_DELAY_MS / 1000:g}秒内把鼠标移到要检测颜色的位置...")
+        self.root.after(IMAGE_CAPTURE_DELAY_MS, self.add_color_position)
+    
+    def add_color_position(self):
+        cursor = read_cursor_position()
+        if cursor is None:
+            messagebox.showerror("错误", "无法读取鼠标位置！")
+            return
+        x, y = cursor
+        current = ColorTrigger(x, y, (0, 0, 0)).sample()
+        initial = "#{:02X}{:02X}{:02X}".format(*current) if current else ""
+        text = simpledialog.askstring("颜色触发", f"位置 ({x}, {y}) 当前颜色为 {initial or '未知'}\n"
+                                      "目标颜色（#RRGGBB 或 r,g,b），出现该颜色时点击:", initialvalue=initial)
+        if not text:
+            return
+        try:
+            color = parse_color(text)
+        except ValueError:
+            messagebox.showerror("错误", "颜色格式应为 #RRGGBB 或 r,g,b！")
+            return
+        tolerance = simpledialog.askinteger("颜色触发", "每个颜色通道允许的差值（0-255）:",
+                                            initialvalue=COLOR_TOLERANCE, minvalue=0, maxvalue=255)
+        if tolerance is None:
+            return
+        poll_hz = simpledialog.askinteger("颜色触发", "每秒检查次数（与点击间隔无关）:",
+                                          initialvalue=COLOR_POLL_HZ, minvalue=1, maxvalue=COLOR_POLL_MAX_HZ)
+        if poll_hz is None:
+            return
+        name = simpledialog.askstring("位置命名", f"请为颜色触发位置 ({x}, {y}) 命名:",
+                                      initialvalue=f"位置{len(self.positions)+1}")
+        if not name:
+            return
+        
+        self.positions.append({
+            "name": name, "x": x, "y": y,
+            "action": "color",
+            "color": list(color),
+            "tolerance": tolerance,
+            "poll_hz": poll_hz,
+        })
+        self.update_position_list()
+        self.add_log(f"已记录颜色触发位置: {name} ({x}, {y}) 颜色 {text.strip()}"
+                     f" - 共 {len(self.positions)} 个位置")
+    
+    def set_selected_position_wait_change(self):
+        """设置选中位置点击后等待画面变化：区域变化后立即点击下一个位置，代替固定间隔"""
+        selection = self.position_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("提示", "请先选择要设置的位置！")
+            return
+        
+        index = selection[0]
+        pos = self.positions[index]
+        if not isinstance(pos, dict):
+            # 旧格式转换为新格式
+            pos = {"name": f"位置{index+1}", "x": pos[0], "y": pos[1]}
+        
+        wait = pos.get('wait_change') or {}
+        default = wait.get('region') or [pos['x'] - 100, pos['y'] - 100, 200, 200]
+        tile_size = CHANGE_TILE * CHANGE_DOWNSAMPLE
+        text = simpledialog.askstring("等待画面变化", 
+                                      "点击后监视的区域 左,上,宽,高（留空为取消等待）:",
+                                      initialvalue=",".join(str(v) for v in default))
+        if text is None:
+            return
+        if not text.strip():
+            pos.pop('wait_change', None)
+            self.positions[index] = pos
+            self.update_position_list()
+            self.add_log(f"'{pos['name']}' 已取消等待画面变化")
+            return
+        try:
+            region = [int(v) for v in text.split(',')]
+            if len(region) != 4 or region[2] < tile_size or region[3] < tile_size:
+                raise ValueError(text)
+        except ValueError:
+            messagebox.showerror("错误", f"区域格式应为 左,上,宽,高，且宽高不小于{tile_size}！")
+            return
+        timeout_ms = simpledialog.askinteger("等待画面变化", "最多等待（毫秒），超时后照常继续:",
+                                             initialvalue=wait.get('timeout_ms', int(CHANGE_TIMEOUT * 1000)),
+                                             minvalue=1, maxvalue=600000)
+        if timeout_ms is None:
+            return
+        
+        pos['wait_change'] = {"region": region, "timeout_ms": timeout_ms}
+        self.positions[index] = pos
+        self.update_position_list()
+        self.add_log(f"'{pos['name']}' 点击后等待区域 {region[2]}×{region[3]} 变化（最多{timeout_ms}毫秒）")
+    
+    def add_alternative_template(self):
+        """为选中的图像位置截取一个备选模板（同一目标的其他状态）"""
+        selection = self.position_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("提示", "请先选择一个图像位置！")
+            return
+        index = selection[0]
+        pos = self.positions[index]
+        if not isinstance(pos, dict) or pos.get('action') != 'image':
+            messagebox.showwarning("提示", "只能为图像位置添加备选图像！")
+            return
+        
+        def add(template, x, y):
+            pos.setdefault('alternatives', []).append(template.to_dict())
+            self.update_position_list()
+            self.add_log(f"已为 '{pos['name']}' 添加备选图像，共 {len(pos['alternatives']) + 1} 个模板")
+        
+        self.capture_template_later(add)
     
     def update_position_list(self):
         """更新位置列表显示"""
@@ -1595,10 +5633,79 @@ class AutoClicker:
         for i, pos in enumerate(self.positions):
             if isinstance(pos, dict):
                 # 新格式：字典
-                self.position_listbox.insert(tk.END, f"{i+1}. {pos['name']} - ({pos['x']}, {pos['y']})")
+                clicks, gap = position_repeat(pos)
+                repeat_text = f" ×{clicks}" + (f" 间隔{gap * 1000:g}ms" if gap else "") if clicks > 1 else ""
+                action = pos.get('action', 'click')
+                if action == 'hold':
+                    repeat_text = f" 长按{pos.get('hold_ms', 500)}ms"
+                elif action == 'drag' and pos.get('path'):
+                    repeat_text = f" 拖动折线{len(pos['path']) + 1}点"
+                elif action == 'drag':
+                    repeat_text = f" 拖动→({pos['to'][0]}, {pos['to'][1]})"
+                elif action == 'image':
+                    repeat_text = (f" 图像{pos['template']['width']}×{pos['template']['height']}"
+                                   f" 区域{pos['region'][2]}×{pos['region'][3]}")
+                    if pos.get('alternatives'):
+                        repeat_text += f" +{len(pos['alternatives'])}备选"
+                elif action == 'color':
+                    r, g, b = pos['color']
+                    repeat_text = f" 颜色#{r:02X}{g:02X}{b:02X}±{pos.get('tolerance', COLOR_TOLERANCE)}时点击"
+                if pos.get('wait_change'):
+                    repeat_text += " ⚡等变化"
+                self.position_listbox.insert(tk.END, f"{i+1}. {pos['name']} - ({pos['x']}, {pos['y']}){repeat_text}")
             else:
                 # 旧格式兼容：元组
                 self.position_listbox.insert(tk.END, f"{i+1}. 位置 - ({pos[0]}, {pos[1]})")
+        
+        # 连点过程中修改位置时，同步更新配置快照
+        self.on_run_config_changed()
+    
+    def prepare_click_plan(self, button):
+        """准备点击计划，只有位置、按键、后端或屏幕分辨率变化时才重新编译"""
+        if (self.click_plan is None or 
+            not self.click_plan.matches(self.positions, button, self.input_backend)):
+            self.click_plan = ClickPlan(self.positions, button, self.input_backend)
+        return self.click_plan
+    
+    def build_run_config(self):
+        """从界面读取当前设置，生成配置快照（在主线程中调用）"""
+        button = 'left' if self.mouse_button.get() == "left" else 'right'
+        plan = self.prepare_click_plan(button)
+        
+        names = []
+        for i, pos in enumerate(self.positions):
+            names.append(pos['name'] if isinstance(pos, dict) else f"位置{i+1}")
+        
+        # 次/秒模式下目标按实际点击数计算：连发模式每次点击整轮，连击位置每次点击多下
+        interval = self.get_click_interval()
+        target_cps = self.get_target_cps()
+        if target_cps > 0 and plan.points:
+            if self.burst_mode.get():
+                interval *= plan.total_clicks
+            else:
+                interval *= plan.total_clicks / len(plan.points)
+        
+        return RunConfig(
+            interval=interval,
+            button=button,
+            positions=plan.points,
+            names=tuple(names),
+            plan=plan,
+            catch_up_policy=self.get_catch_up_policy(),
+            burst_mode=self.burst_mode.get(),
+            burst_chunk_size=self.get_burst_chunk_size(),
+            motion_mode=self.get_motion_mode(),
+            motion_duration=self.get_motion_duration_ms() / 1000.0,
+            motion_steps=self.get_motion_steps(),
+            precision_mode=self.precision_mode.get(),
+            cpu_budget=self.get_cpu_budget(),
+            target_cps=target_cps,
+        )
+    
+    def on_run_config_changed(self, event=None):
+        """设置变化时发布新的配置快照，连点线程在下一次点击时生效"""
+        if self.is_clicking:
+            self.engine.update_config(self.build_run_config())
     
     def delete_selected_position_btn(self):
         """删除选中的位置（按钮触发）"""
@@ -1657,12 +5764,115 @@ class AutoClicker:
         else:
             messagebox.showwarning("提示", "请先选择要重命名的位置！")
     
+    def set_selected_position_repeat(self):
+        """设置选中位置每次访问的点击数（双击/三击/N击）和连击间隔"""
+        selection = self.position_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("提示", "请先选择要设置连击的位置！")
+            return
+        
+        index = selection[0]
+        pos = self.positions[index]
+        if not isinstance(pos, dict):
+            # 旧格式转换为新格式
+            pos = {"name": f"位置{index+1}", "x": pos[0], "y": pos[1]}
+        clicks, gap = position_repeat(pos)
+        
+        new_clicks = simpledialog.askinteger("连击设置", f"'{pos['name']}' 每次点击数（1=单击，2=双击）:", 
+                                             initialvalue=clicks, minvalue=1, maxvalue=100)
+        if new_clicks is None:
+            return
+        new_gap = 0
+        if new_clicks > 1:
+            new_gap = simpledialog.askinteger("连击设置", "连击间隔（毫秒，0=一次发送全部）:", 
+                                              initialvalue=int(gap * 1000), minvalue=0, maxvalue=1000)
+            if new_gap is None:
+                return
+        
+        pos['clicks'] = new_clicks
+        pos['click_gap_ms'] = new_gap
+        self.positions[index] = pos
+        self.update_position_list()
+        self.add_log(f"已设置 '{pos['name']}' 每次点击 {new_clicks} 下，间隔 {new_gap} 毫秒")
+    
+    def set_selected_position_action(self):
+        """把选中位置设置为点击、长按或拖动（直线A→B或折线）"""
+        selection = self.position_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("提示", "请先选择要设置动作的位置！")
+            return
+        
+        index = selection[0]
+        pos = self.positions[index]
+        if not isinstance(pos, dict):
+            # 旧格式转换为新格式
+            pos = {"name": f"位置{index+1}", "x": pos[0], "y": pos[1]}
+        
+        action_label = simpledialog.askstring("动作设置", "动作类型（点击/长按/拖动）:", 
+                                              initialvalue=POSITION_ACTIONS.get(pos.get('action', 'click'), "点击"))
+        if action_label is None:
+            return
+        action = None
+        for name, label in POSITION_ACTIONS.items():
+            if action_label.strip() in (name, label):
+                action = name
+        if action is None:
+            messagebox.showerror("错误", "动作类型必须是 点击、长按 或 拖动！")
+            return
+        
+        if action == 'hold':
+            hold_ms = simpledialog.askinteger("长按设置", "按住时长（毫秒）:", 
+                                              initialvalue=pos.get('hold_ms', 500), minvalue=0, maxvalue=60000)
+            if hold_ms is None:
+                return
+            pos['hold_ms'] = hold_ms
+        elif action == 'drag':
+            # 一个点为直线终点，多个点为折线（不含起点）
+            default = pos.get('path') or [pos.get('to', (pos['x'] + 100, pos['y']))]
+            text = simpledialog.askstring("拖动设置", "终点坐标 x,y（多个点用空格分隔表示折线）:", 
+                                          initialvalue=" ".join(f"{x},{y}" for x, y in default))
+            if text is None:
+                return
+            try:
+                points = [tuple(int(v) for v in item.split(',')) for item in text.split()]
+                if not points or any(len(point) != 2 for point in points):
+                    raise ValueError(text)
+            except ValueError:
+                messagebox.showerror("错误", "坐标格式应为 x,y，多个点用空格分隔！")
+                return
+            duration_ms = simpledialog.askinteger("拖动设置", "拖动时长（毫秒）:", 
+                                                  initialvalue=pos.get('duration_ms', 200), 
+                                                  minvalue=0, maxvalue=60000)
+            if duration_ms is None:
+                return
+            pos['duration_ms'] = duration_ms
+            pos.pop('path', None)
+            pos.pop('to', None)
+            if len(points) == 1:
+                steps = simpledialog.askinteger("拖动设置", "插值步数:", 
+                                                initialvalue=pos.get('steps', 10), minvalue=1, maxvalue=1000)
+                if steps is None:
+                    return
+                pos['to'] = list(points[0])
+                pos['steps'] = steps
+            else:
+                pos['path'] = [list(point) for point in points]
+        
+        pos['action'] = action
+        self.positions[index] = pos
+        self.update_position_list()
+        self.add_log(f"已将 '{pos['name']}' 设置为{POSITION_ACTIONS[action]}")
+    
     def save_preset(self):
         """保存当前设置为预设"""
         if not self.positions:
             messagebox.showwarning("警告", "请先添加至少一个点击位置！")
             return
         
+        # 脚本窗口中尚未运行的修改也一起保存
+        if self.script_window and self.script_window.window.winfo_exists():
+            self.script_text = self.script_window.get_text()
+        
         name = simpledialog.askstring("保存预设", "请输入预设名称:")
         if name:
             preset_data = {
@@ -1670,11 +5880,25 @@ class AutoClicker:
                 "frequency": float(self.frequency_entry.get()),
                 "frequency_unit": self.freq_unit.get(),
                 "mouse_button": self.mouse_button.get(),
+                "burst_mode": self.burst_mode.get(),
+                "burst_chunk_size": self.get_burst_chunk_size(),
+                "catch_up_policy": self.get_catch_up_policy(),
+                "motion_mode": self.get_motion_mode(),
+                "motion_duration_ms": self.get_motion_duration_ms(),
+                "motion_steps": self.get_motion_steps(),
+                "precision_mode": self.precision_mode.get(),
+                "cpu_budget": int(self.get_cpu_budget() * 100),
                 "positions": self.positions.copy(),  # 现在支持新的字典格式
+                "sequences": [seq.to_dict() for seq in self.sequence_engine.sequences],
+                "script": self.script_text,
                 "hotkey": self.current_hotkey,
                 "window_topmost": self.is_topmost  # 保存置顶设置
             }
             
+            # 位置很多时以压缩编码保存
+            if len(self.positions) >= PACK_POSITIONS_THRESHOLD:
+                preset_data["positions_packed"] = pack_positions(preset_data.pop("positions"))
+            
             # 保存到文件
             self.save_preset_to_file(preset_data)
             
@@ -1734,7 +5958,7 @@ class AutoClicker:
                 with open(self.presets_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
-                print(f"加载预设文件失败: {e}")
+                presets_log.warning("加载预设文件失败: %s", e)
         return {}
     
     def load_presets(self):
@@ -1765,14 +5989,31 @@ class AutoClicker:
             frequency_unit = preset.get("frequency_unit", "秒/次")
             
             # 更新频率设置
+            self.precision_mode.set(preset.get("precision_mode", False))
+            self.cpu_budget_entry.delete(0, tk.END)
+            self.cpu_budget_entry.insert(0, str(preset.get("cpu_budget", 50)))
             self.frequency_entry.delete(0, tk.END)
-            self.frequency_entry.insert(0, f"{frequency:.1f}")
+            if frequency_unit == "次/秒" or (frequency_unit == "毫秒/次" and self.precision_mode.get()):
+                self.frequency_entry.insert(0, f"{frequency:g}")
+            else:
+                self.frequency_entry.insert(0, f"{frequency:.1f}")
             self.freq_unit.set(frequency_unit)
             self.frequency_var.set(frequency)
             
             # 更新其他设置
             self.mouse_button.set(preset.get("mouse_button", "left"))
-            self.positions = preset.get("positions", []).copy()
+            self.burst_mode.set(preset.get("burst_mode", False))
+            self.burst_chunk_entry.delete(0, tk.END)
+            self.burst_chunk_entry.insert(0, str(preset.get("burst_chunk_size", 0)))
+            self.catch_up_policy.set(CATCH_UP_POLICIES.get(preset.get("catch_up_policy", "skip"), 
+                                                           CATCH_UP_POLICIES["skip"]))
+            self.motion_mode.set(MOTION_MODES.get(preset.get("motion_mode", "teleport"), 
+                                                  MOTION_MODES["teleport"]))
+            self.motion_duration_entry.delete(0, tk.END)
+            self.motion_duration_entry.insert(0, str(preset.get("motion_duration_ms", 100)))
+            self.motion_steps_entry.delete(0, tk.END)
+            self.motion_steps_entry.insert(0, str(preset.get("motion_steps", 10)))
+            self.positions = preset_positions(preset)
             
             # 更新快捷键（如果有保存）
             if "hotkey" in preset:
@@ -1790,6 +6031,18 @@ class AutoClicker:
                 # 同时保存到全局设置
                 self.save_topmost_setting(is_topmost)
             
+            # 恢复多序列（如果有保存）
+            if "sequences" in preset:
+                self.load_sequences(preset["sequences"])
+                if self.sequence_window and self.sequence_window.window.winfo_exists():
+                    self.sequence_window.refresh()
+            
+            # 恢复动作脚本（如果有保存）
+            if "script" in preset:
+                self.script_text = preset["script"]
+                if self.script_window and self.script_window.window.winfo_exists():
+                    self.script_window.set_text(self.script_text)
+            
             # 更新界面
             self.update_position_list()
             
@@ -1831,9 +6084,8 @@ class AutoClicker:
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
         
-        # 启动点击线程
-        self.click_thread = threading.Thread(target=self.clicking_loop, daemon=True)
-        self.click_thread.start()
+        # 生成配置快照（同时编译点击计划）并启动点击线程
+        self.engine.start(self.build_run_config())
         
         # 添加日志
         self.add_log("开始连点...")
@@ -1841,11 +6093,16 @@ class AutoClicker:
     def stop_clicking(self):
         """停止自动点击"""
         self.is_clicking = False
+        self.engine.stop()
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         
         # 添加日志
-        self.add_log("停止连点")
+        scheduler = self.engine.scheduler
+        if scheduler and scheduler.missed:
+            self.add_log(f"停止连点（共错过 {scheduler.missed} 次点击时间）")
+        else:
+            self.add_log("停止连点")
     
     def stop_clicking_and_focus(self):
         """停止连点并将窗口置顶"""
@@ -1859,80 +6116,144 @@ class AutoClicker:
             self.root.after(100, lambda: self.root.attributes('-topmost', False))  # 100ms后取消置顶
             self.root.focus_force()  # 强制获得焦点
         except Exception as e:
-            print(f"窗口置顶失败: {e}")
+            ui_log.warning("窗口置顶失败: %s", e)
     
-    def clicking_loop(self):
-        """点击循环（在单独线程中运行）"""
-        position_index = 0
+    def on_engine_click(self, points):
+        """点击线程每次点击后的回调：测试窗口打开时显示点击动画"""
+        if self.test_window:
+            self.root.after(0, self.show_test_click_animation, points)
+    
+    def on_engine_done(self):
+        """宏回放或动作脚本结束后的回调：在主线程中恢复按钮状态"""
+        self.root.after(0, self.stop_clicking)
+    
+    def toggle_macro_recording(self):
+        """开始/停止录制宏"""
+        if self.macro_recorder.is_recording:
+            # 通过按钮停止时，最后一次点击是点在停止按钮上的，不录制
+            self.stop_macro_recording(drop_last_click=True)
+            return
         
-        while self.is_clicking:
-            try:
-                # 在每次循环开始时检查停止标志
-                if not self.is_clicking:
-                    break
-                
-                # 获取当前要点击的位置
-                if self.positions:
-                    pos = self.positions[position_index]
-                    
-                    # 兼容新旧格式
-                    if isinstance(pos, dict):
-                        x, y = pos['x'], pos['y']
-                        pos_name = pos['name']
-                    else:
-                        x, y = pos
-                        pos_name = f"位置{position_index+1}"
-                    
-                    # 再次检查停止标志，防止在移动鼠标时停止
-                    if not self.is_clicking:
-                        break
-                    
-                    # 先移动鼠标到目标位置（使用pyautogui获取位置信息）
-                    pyautogui.moveTo(x, y, duration=0.1)
-                    
-                    # 在点击前最后一次检查停止标志
-                    if not self.is_clicking:
-                        break
-                    
-                    # 执行点击 - 使用增强的点击方法
-                    button_type = 'left' if self.mouse_button.get() == "left" else 'right'
-                    click_success = enhanced_click(x, y, button_type)
-                    
-                    # 如果测试窗口存在，显示点击动画
-                    if (hasattr(self, 'test_window') and self.test_window and 
-                        hasattr(self.test_window, 'window') and self.test_window.window.winfo_exists()):
-                        self.root.after(0, lambda: self.test_window.show_click_animation(x, y))
-                    
-                    # 获取等待间隔
-                    interval = self.get_click_interval()
-                    
-                    # 添加日志 - 在主线程中执行
-                    click_method = "Windows API" if click_success else "备用方法"
-                    log_msg = f"已点击位置: {pos_name} ({x}, {y}), 按键: {self.mouse_button.get()}, 方法: {click_method}, 等待间隔: {interval}秒"
-                    self.root.after(0, lambda msg=log_msg: self.add_log(msg))
-                    
-                    print(f"已点击位置: {pos_name} ({x}, {y}), 按键: {self.mouse_button.get()}")  # 调试信息
-                    
-                    # 切换到下一个位置（循环）
-                    position_index = (position_index + 1) % len(self.positions)
-                
-                # 等待指定间隔，但要分段检查停止标志
-                print(f"等待间隔: {interval}秒")  # 调试信息
-                
-                # 将等待时间分成小段，每100ms检查一次停止标志
-                wait_time = 0
-                sleep_interval = 0.1  # 每次睡眠100ms
-                while wait_time < interval and self.is_clicking:
-                    time.sleep(sleep_interval)
-                    wait_time += sleep_interval
-                
-            except Exception as e:
-                print(f"点击过程中发生错误: {e}")
-                # 发生错误时停止点击并记录日志
-                error_msg = f"点击过程中发生错误: {e}"
-                self.root.after(0, lambda msg=error_msg: self.add_log(msg))
-                self.root.after(0, self.stop_clicking)
-                break
+        if self.is_clicking:
+            messagebox.showwarning("警告", "请先停止连点！")
+            return
+        try:
+            self.macro_recorder.start()
+        except Exception as e:
+            ui_log.error("宏录制启动失败: %s", e)
+            messagebox.showerror("错误", f"宏录制启动失败: {e}")
+            return
+        self.record_macro_btn.config(text="⏹ 停止录制（Esc）")
+        self.play_macro_btn.config(state=tk.DISABLED)
+        self.add_log("开始录制宏（鼠标移动、点击、滚轮和按键），按Esc停止")
+    
+    def stop_macro_recording(self, drop_last_click=False):
+        """停止录制宏（在主线程中调用）"""
+        if not self.macro_recorder.is_recording:
+            return
+        macro = self.macro_recorder.stop(drop_last_click)
+        self.record_macro_btn.config(text="⏺ 录制宏")
+        
+        # 简化鼠标移动路径，减少回放时注入的事件数
+        tolerance, max_interval = self.load_macro_simplify_setting()
+        if tolerance > 0 and len(macro):
+            recorded = len(macro)
+            macro = simplify_macro(macro, tolerance, max_interval)
+            self.add_log(f"路径简化（容差 {tolerance:g} 像素）: {recorded} → {len(macro)} 个事件")
+        
+        if len(macro):
+            self.set_macro(macro)
+            self.add_log(f"宏录制完成: {len(macro)}个事件, {macro.duration():.1f}秒, "
+                         f"{macro.nbytes() / 1024:.1f}KB")
+        else:
+            self.add_log("宏录制结束，未录制到事件")
+            self.play_macro_btn.config(state=tk.NORMAL if self.macro else tk.DISABLED)
+    
+    def set_macro(self, macro):
+        """替换当前宏，关闭之前打开的宏文件"""
+        if isinstance(self.macro, MacroFile) and self.macro is not macro:
+            self.macro.close()
+        self.macro = macro
+        state = tk.NORMAL if macro else tk.DISABLED
+        self.play_macro_btn.config(state=state)
+        self.save_macro_btn.config(state=state)
+    
+    def save_macro(self):
+        """把当前宏保存为二进制宏文件"""
+        if not self.macro:
+            return
+        path = filedialog.asksaveasfilename(title="保存宏", defaultextension=MACRO_FILE_EXT, 
+                                            filetypes=[("点点点宏", f"*{MACRO_FILE_EXT}")])
+        if not path:
+            return
+        if isinstance(self.macro, MacroFile) and os.path.abspath(path) == os.path.abspath(self.macro.path):
+            return  # 已经是这个文件
+        try:
+            count = save_macro_file(path, self.macro, packed=True)
+            self.add_log(f"宏已保存: {os.path.basename(path)} ({count}个事件)")
+        except Exception as e:
+            ui_log.error("保存宏失败: %s", e)
+            messagebox.showerror("错误", f"保存宏失败: {e}")
+    
+    def open_macro(self):
+        """打开二进制宏文件（内存映射，回放时逐条读取）"""
+        if self.is_clicking:
+            messagebox.showwarning("警告", "请先停止连点或回放！")
+            return
+        path = filedialog.askopenfilename(title="打开宏", 
+                                          filetypes=[("点点点宏", f"*{MACRO_FILE_EXT}"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            macro = MacroFile(path)
+        except Exception as e:
+            ui_log.error("打开宏失败: %s", e)
+            messagebox.showerror("错误", f"打开宏失败: {e}")
+            return
+        self.set_macro(macro)
+        self.add_log(f"已打开宏: {os.path.basename(path)} ({len(macro)}个事件, {macro.duration():.1f}秒)")
+    
+    def play_macro(self):
+        """通过连点引擎按录制的时间回放宏，Esc或停止按钮可中止"""
+        if not self.macro or self.is_clicking or self.macro_recorder.is_recording:
+            return
+        
+        self.is_clicking = True
+        self.start_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.NORMAL)
+        self.engine.start_macro(self.macro, cpu_budget=self.get_wait_cpu_budget())
+        self.add_log(f"开始回放宏: {len(self.macro)}个事件, {self.macro.duration():.1f}秒")
+    
+    def compile_script(self, text):
+        """按当前的位置列表和按键编译动作脚本，有语法错误时抛出ValueError"""
+        button = 'left' if self.mouse_button.get() == "left" else 'right'
+        return ActionScript(text, self.input_backend, self.positions, button)
+    
+    def run_script(self, text):
+        """编译并通过连点引擎执行动作脚本，Esc或停止按钮可中止；返回是否已开始"""
+        if self.is_clicking or self.macro_recorder.is_recording:
+            return False
+        
+        script = self.compile_script(text)
+        self.script_text = text
+        self.is_clicking = True
+        self.start_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.NORMAL)
+        self.engine.start_script(script, self.get_wait_cpu_budget())
+        self.add_log(f"开始执行动作脚本: {len(script)}条指令")
+        return True
+    
+    def on_engine_error(self, error):
+        """点击线程发生错误后的回调：在主线程中停止连点"""
+        self.root.after(0, self.stop_clicking)
+    
+    def show_test_click_animation(self, points):
+        """在测试窗口中显示点击动画（在主线程中调用）"""
+        test_window = self.test_window
+        if (test_window and hasattr(test_window, 'window') and 
+            test_window.window.winfo_exists()):
+            for x, y in points:
+                test_window.show_click_animation(x, y)
     
     def save_version_info(self):
         """保存版本信息"""
@@ -1947,6 +6268,16 @@ class AutoClicker:
         if self.is_clicking:
             self.stop_clicking()
         
+        # 停止所有序列和调度线程
+        self.sequence_engine.shutdown()
+        
+        # 停止宏录制
+        if self.macro_recorder.is_recording:
+            self.macro_recorder.stop()
+        
+        # 关闭多模板匹配进程池并释放共享内存
+        shutdown_match_pool()
+        
         # 停止快捷键监听
         if self.hotkey_listener:
             try:
@@ -1985,6 +6316,69 @@ class AutoClicker:
         # 创建新的测试窗口
         self.test_window = TestWindow(self)
         self.add_log("已打开连点测试窗口")
+    
+    def open_sequence_window(self):
+        """打开多序列管理窗口"""
+        if self.sequence_window and self.sequence_window.window.winfo_exists():
+            self.sequence_window.window.lift()
+            self.sequence_window.window.focus_force()
+            return
+        
+        self.sequence_window = SequenceWindow(self)
+    
+    def open_script_window(self):
+        """打开动作脚本窗口"""
+        if self.script_window and self.script_window.window.winfo_exists():
+            self.script_window.window.lift()
+            self.script_window.window.focus_force()
+            return
+        
+        self.script_window = ScriptWindow(self)
+    
+    def create_sequence_from_current(self):
+        """用当前的位置、频率和按键新建一个序列"""
+        if not self.positions:
+            messagebox.showwarning("警告", "请先添加至少一个点击位置！")
+            return None
+        
+        button = 'left' if self.mouse_button.get() == "left" else 'right'
+        plan = ClickPlan(self.positions, button, self.input_backend)
+        try:
+            self.sequence_engine.check_plan(plan)
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+            return None
+        
+        name = simpledialog.askstring("新建序列", "请输入序列名称:", 
+                                      initialvalue=f"序列{len(self.sequence_engine.sequences)+1}")
+        if not name:
+            return None
+        
+        sequence = ClickSequence(name, plan, self.get_click_interval(), 
+                                 [dict(pos) if isinstance(pos, dict) else pos for pos in self.positions])
+        self.sequence_engine.add_sequence(sequence)
+        self.add_log(f"已新建序列: {name} ({len(plan)}个位置, 每{sequence.interval}秒)")
+        return sequence
+    
+    def load_sequences(self, sequence_data):
+        """从预设数据恢复序列（恢复后处于停止状态）"""
+        self.sequence_engine.stop_all()
+        for sequence in list(self.sequence_engine.sequences):
+            self.sequence_engine.remove_sequence(sequence)
+        
+        for data in sequence_data:
+            plan = ClickPlan(data.get("positions", []), data.get("button", "left"), self.input_backend)
+            sequence = ClickSequence(data.get("name", "序列"), plan, 
+                                     data.get("interval", 1.0), data.get("positions", []))
+            try:
+                self.sequence_engine.add_sequence(sequence)
+            except ValueError as e:
+                self.add_log(f"未恢复序列 {sequence.name}: {e}")
+    
+    def rebuild_sequence_plans(self):
+        """输入后端变化后重新编译所有序列的点击计划"""
+        for sequence in self.sequence_engine.sequences:
+            sequence.plan = ClickPlan(sequence.positions, sequence.plan.button, self.input_backend)
 
 class TestWindow:
     """连点测试窗口类"""
@@ -2137,6 +6531,177 @@ class TestWindow:
         self.window.destroy()
         self.main_app.add_log("已关闭连点测试窗口")
 
+class SequenceWindow:
+    """多序列管理窗口：新建、启停、删除序列并显示各序列的统计"""
+    
+    def __init__(self, main_app):
+        self.main_app = main_app
+        self.engine = main_app.sequence_engine
+        
+        self.window = tk.Toplevel(main_app.root)
+        self.window.title("多序列管理")
+        self.window.geometry("560x360")
+        self.window.configure(bg="#eaeaea")
+        self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # 操作按钮
+        btn_frame = ttk.Frame(self.window, padding="10")
+        btn_frame.pack(fill=tk.X)
+        for column in range(4):
+            btn_frame.columnconfigure(column, weight=1)
+        
+        ttk.Button(btn_frame, text="➕ 用当前设置新建", 
+                   command=self.add_sequence).grid(row=0, column=0, sticky="ew", padx=(0, 2))
+        ttk.Button(btn_frame, text="▶ 启动", 
+                   command=self.start_selected).grid(row=0, column=1, sticky="ew", padx=2)
+        ttk.Button(btn_frame, text="⏹️ 停止", 
+                   command=self.stop_selected).grid(row=0, column=2, sticky="ew", padx=2)
+        ttk.Button(btn_frame, text="🗑 删除", 
+                   command=self.delete_selected).grid(row=0, column=3, sticky="ew", padx=(2, 0))
+        
+        # 序列列表和统计
+        columns = ("name", "positions", "interval", "state", "clicks", "rate", "missed")
+        headings = ("名称", "位置数", "间隔(秒)", "状态", "点击数", "实际次/秒", "错过")
+        widths = (110, 55, 70, 55, 70, 80, 55)
+        self.tree = ttk.Treeview(self.window, columns=columns, show="headings", height=10)
+        for column, heading, width in zip(columns, headings, widths):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor=tk.CENTER)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        self.refresh()
+        self.update_stats()
+    
+    def selected_sequences(self):
+        sequences = self.engine.sequences
+        result = []
+        for item in self.tree.selection():
+            index = int(item)
+            if index < len(sequences):
+                result.append(sequences[index])
+        return result
+    
+    def refresh(self):
+        """重建列表"""
+        self.tree.delete(*self.tree.get_children())
+        for index, sequence in enumerate(self.engine.sequences):
+            self.tree.insert("", tk.END, iid=str(index), values=self.row_values(sequence))
+    
+    def row_values(self, sequence):
+        return (sequence.name, len(sequence.plan), f"{sequence.interval:g}",
+                "运行中" if sequence.active else "已停止", sequence.clicks,
+                f"{sequence.clicks_per_second():.1f}", sequence.missed)
+    
+    def update_stats(self):
+        """每500毫秒刷新一次统计"""
+        if not self.window.winfo_exists():
+            return
+        for index, sequence in enumerate(self.engine.sequences):
+            if self.tree.exists(str(index)):
+                self.tree.item(str(index), values=self.row_values(sequence))
+        self.window.after(500, self.update_stats)
+    
+    def add_sequence(self):
+        if self.main_app.create_sequence_from_current():
+            self.refresh()
+    
+    def start_selected(self):
+        for sequence in self.selected_sequences():
+            self.engine.start_sequence(sequence)
+    
+    def stop_selected(self):
+        for sequence in self.selected_sequences():
+            self.engine.stop_sequence(sequence)
+    
+    def delete_selected(self):
+        sequences = self.selected_sequences()
+        if not sequences:
+            messagebox.showwarning("提示", "请先选择要删除的序列！", parent=self.window)
+            return
+        names = "、".join(sequence.name for sequence in sequences)
+        if messagebox.askyesno("确认删除", f"确定要删除序列 '{names}' 吗？", parent=self.window):
+            for sequence in sequences:
+                self.engine.remove_sequence(sequence)
+            self.refresh()
+    
+    def on_closing(self):
+        """关闭窗口（序列继续在后台运行）"""
+        self.main_app.sequence_window = None
+        self.window.destroy()
+
+class ScriptWindow:
+    """动作脚本窗口：编辑、检查和运行动作脚本，脚本随预设保存"""
+    
+    def __init__(self, main_app):
+        self.main_app = main_app
+        
+        self.window = tk.Toplevel(main_app.root)
+        self.window.title("动作脚本")
+        self.window.geometry("480x420")
+        self.window.configure(bg="#eaeaea")
+        self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # 操作按钮
+        btn_frame = ttk.Frame(self.window, padding="10")
+        btn_frame.pack(fill=tk.X)
+        for column in range(3):
+            btn_frame.columnconfigure(column, weight=1)
+        
+        ttk.Button(btn_frame, text="✓ 检查", 
+                   command=self.check).grid(row=0, column=0, sticky="ew", padx=(0, 2))
+        ttk.Button(btn_frame, text="▶ 运行", 
+                   command=self.run).grid(row=0, column=1, sticky="ew", padx=2)
+        ttk.Button(btn_frame, text="⏹️ 停止", 
+                   command=self.stop).grid(row=0, column=2, sticky="ew", padx=(2, 0))
+        
+        # 脚本编辑区
+        self.text = tk.Text(self.window, height=16, wrap=tk.NONE, undo=True, 
+                            font=("Consolas", 10))
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.set_text(main_app.script_text or SCRIPT_EXAMPLE)
+        
+        self.status_label = ttk.Label(self.window, text="指令: click、key、wait、repeat/end、"
+                                      "label/goto、if-pixel、if-image", padding="10")
+        self.status_label.pack(fill=tk.X)
+    
+    def get_text(self):
+        return self.text.get("1.0", "end-1c")
+    
+    def set_text(self, text):
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", text)
+    
+    def check(self):
+        """只编译不执行，显示指令数或错误位置"""
+        try:
+            script = self.main_app.compile_script(self.get_text())
+        except ValueError as e:
+            self.status_label.config(text=f"❌ {e}", foreground="red")
+            return
+        self.status_label.config(text=f"✓ 共{len(script)}条指令，{script.clicks}个点击", 
+                                 foreground="green")
+    
+    def run(self):
+        try:
+            started = self.main_app.run_script(self.get_text())
+        except ValueError as e:
+            self.status_label.config(text=f"❌ {e}", foreground="red")
+            return
+        if started:
+            self.status_label.config(text="▶ 执行中（Esc停止）", foreground="")
+        else:
+            self.status_label.config(text="请先停止连点或录制", foreground="red")
+    
+    def stop(self):
+        if self.main_app.is_clicking:
+            self.main_app.stop_clicking()
+    
+    def on_closing(self):
+        """关闭窗口时保留脚本内容（脚本继续在后台运行）"""
+        self.main_app.script_text = self.get_text()
+        self.main_app.script_window = None
+        self.window.destroy()
+
 class ClickAnimation:
     """点击动画效果类"""
     
@@ -2189,6 +6754,7 @@ class ClickAnimation:
 def main():
     """主函数"""
     try:
+        setup_logging()
         app = AutoClicker()
         app.run()
     except Exception as e:
@@ -2196,4 +6762,6 @@ def main():
         input("按回车键退出...")
 
 if __name__ == "__main__":
+    if freeze_support is not None:
+        freeze_support()  # 打包成exe后进程池的工作进程需要
     main()
\ No newline at end of file